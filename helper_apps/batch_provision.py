@@ -0,0 +1,59 @@
+import argparse
+import io
+import os
+import zipfile
+
+from requests import Session
+
+from nvflops.utils.cert_utils import SimpleCert, create_certs
+
+
+def write(out_dir: str, filename: str, s_crt, s_prv=None):
+    with open(os.path.join(out_dir, f"{filename}.cert.pem"), "wb") as f:
+        f.write(s_crt)
+    if s_prv is not None:
+        with open(os.path.join(out_dir, f"{filename}.key.pem"), "wb") as f:
+            f.write(s_prv)
+
+
+def provision_local(args):
+    with open(args.issuer_cert, "rb") as f:
+        s_crt = f.read()
+    with open(args.issuer_key, "rb") as f:
+        s_prv = f.read()
+    issuer = SimpleCert(args.issuer, s_crt=s_crt, s_prv=s_prv)
+    created = create_certs(issuer, args.subjects, type=args.type, key_type=args.key_type, max_workers=args.workers)
+    for subject, s_crt, s_prv in created:
+        write(args.out_dir, subject, s_crt, s_prv)
+
+
+def provision_remote(args):
+    payload = {"issuer": args.issuer, "subjects": args.subjects, "type": args.type, "key_type": args.key_type}
+    resp = Session().post(args.tracker_end_point + "/admin/provision/batch", json=payload)
+    resp.raise_for_status()
+    with zipfile.ZipFile(io.BytesIO(resp.content)) as zf:
+        zf.extractall(args.out_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("subjects", nargs="+", help="subjects to provision")
+    parser.add_argument("-i", "--issuer", type=str, required=True, help="issuer subject")
+    parser.add_argument("--type", type=str, default="client", help="certificate type (client, server or subca)")
+    parser.add_argument("--key_type", type=str, default="rsa", help="key algorithm (rsa, ecdsa or ed25519)")
+    parser.add_argument("-c", "--issuer_cert", type=str, help="issuer certificate, local mode")
+    parser.add_argument("-k", "--issuer_key", type=str, help="issuer private key, local mode")
+    parser.add_argument("-t", "--tracker_end_point", type=str, help="provision through the tracker instead")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="signing processes, local mode")
+    parser.add_argument("-o", "--out_dir", type=str, default="certs", help="output folder")
+    args = parser.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    if args.tracker_end_point:
+        provision_remote(args)
+    else:
+        provision_local(args)
+
+
+if __name__ == "__main__":
+    main()
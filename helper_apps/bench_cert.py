@@ -0,0 +1,93 @@
+import argparse
+import os
+import ssl
+import tempfile
+import time
+
+from nvflops.utils.cert_utils import KEY_TYPES, SimpleCert, generate_private_key
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def make_chain(key_type):
+    root = SimpleCert("root", key_type=key_type)
+    root.create_cert(type="root")
+    server = SimpleCert("localhost", key_type=key_type)
+    server.set_issuer_simple_cert(root)
+    server.create_cert(type="server")
+    client = SimpleCert("client", key_type=key_type)
+    client.set_issuer_simple_cert(root)
+    client.create_cert(type="client")
+    for sc in (root, server, client):
+        sc.serialize()
+    return root, server, client
+
+
+def write_pair(folder, sc):
+    crt_path = os.path.join(folder, f"{sc.subject}.crt")
+    key_path = os.path.join(folder, f"{sc.subject}.key")
+    with open(crt_path, "wb") as f:
+        f.write(sc.s_crt)
+    with open(key_path, "wb") as f:
+        f.write(sc.s_prv)
+    return crt_path, key_path
+
+
+def handshake(server_ctx, client_ctx):
+    c2s, s2c = ssl.MemoryBIO(), ssl.MemoryBIO()
+    server = server_ctx.wrap_bio(c2s, s2c, server_side=True)
+    client = client_ctx.wrap_bio(s2c, c2s, server_hostname="localhost")
+    done = [False, False]
+    while not all(done):
+        for i, conn in enumerate((client, server)):
+            if done[i]:
+                continue
+            try:
+                conn.do_handshake()
+                done[i] = True
+            except ssl.SSLWantReadError:
+                pass
+
+
+def mtls_contexts(folder, root, server, client):
+    root_path, _ = write_pair(folder, root)
+    server_ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    server_ctx.load_cert_chain(*write_pair(folder, server))
+    server_ctx.load_verify_locations(root_path)
+    server_ctx.verify_mode = ssl.CERT_REQUIRED
+    client_ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    client_ctx.load_cert_chain(*write_pair(folder, client))
+    client_ctx.load_verify_locations(root_path)
+    return server_ctx, client_ctx
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-r", "--repeat", type=int, default=20, help="runs per measurement")
+    args = parser.parse_args()
+
+    print(f"{'key type':<10}{'keygen ms':>12}{'sign ms':>10}{'mTLS handshake ms':>20}")
+    for key_type in KEY_TYPES:
+        keygen = timed(lambda: generate_private_key(key_type), args.repeat)
+        root, _, _ = make_chain(key_type)
+
+        def sign():
+            sc = SimpleCert("client", key_type=key_type)
+            sc.set_issuer_simple_cert(root)
+            sc.prv, sc.pub = root.prv, root.pub
+            sc._generate_cert(sc.subject, root, root.prv, type="client")
+
+        sign_ms = timed(sign, args.repeat)
+        with tempfile.TemporaryDirectory() as folder:
+            server_ctx, client_ctx = mtls_contexts(folder, *make_chain(key_type))
+            handshake_ms = timed(lambda: handshake(server_ctx, client_ctx), args.repeat)
+        print(f"{key_type:<10}{keygen:>12.2f}{sign_ms:>10.2f}{handshake_ms:>20.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import argparse
+import array
+import io
+import random
+import struct
+import time
+
+from nvflops.participant.codec import CompressedReader, available_codecs, decompress_stream, get_codec
+
+
+def dense_fp32(n):
+    return array.array("f", (random.gauss(0.0, 0.02) for _ in range(n))).tobytes()
+
+
+def dense_fp16(n):
+    return struct.pack(f"<{n}e", *(random.gauss(0.0, 0.02) for _ in range(n)))
+
+
+def sparse_fp16_delta(n, density=0.05):
+    return struct.pack(f"<{n}e", *(random.gauss(0.0, 1e-3) if random.random() < density else 0.0 for _ in range(n)))
+
+
+def bench(codec, payload, repeat):
+    compressed = b""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        compressed = CompressedReader(io.BytesIO(payload), codec).read()
+    compress_time = (time.perf_counter() - start) / repeat
+    start = time.perf_counter()
+    for _ in range(repeat):
+        restored = decompress_stream([compressed], codec)
+    decompress_time = (time.perf_counter() - start) / repeat
+    assert restored == payload
+    mb = len(payload) / 1e6
+    return len(payload) / max(len(compressed), 1), mb / compress_time, mb / decompress_time
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--elements", type=int, default=2_000_000, help="tensor elements per payload")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="runs per measurement")
+    args = parser.parse_args()
+
+    payloads = {
+        "dense_fp32": dense_fp32(args.elements),
+        "dense_fp16": dense_fp16(args.elements),
+        "sparse_fp16_delta": sparse_fp16_delta(args.elements),
+    }
+    print(f"{'payload':<20}{'codec':<8}{'ratio':>8}{'comp MB/s':>12}{'decomp MB/s':>14}")
+    for payload_name, payload in payloads.items():
+        for codec_name in available_codecs():
+            ratio, c_speed, d_speed = bench(get_codec(codec_name), payload, args.repeat)
+            print(f"{payload_name:<20}{codec_name:<8}{ratio:>8.2f}{c_speed:>12.1f}{d_speed:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
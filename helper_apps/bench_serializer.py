@@ -0,0 +1,71 @@
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from nvflops.tracker import create_app
+from nvflops.tracker.models import Submission
+from nvflops.tracker.serializer import serialize
+from nvflops.utils import wire
+
+
+def legacy_default(obj):
+    # CustomJSONEncoder before the per model serializers
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if hasattr(type(obj), "__table__"):
+        return {c.name: getattr(obj, c.name) for c in obj.__table__.columns}
+    return list(obj)
+
+
+def submission_rows(n):
+    now = datetime.utcnow()
+    return [
+        Submission(
+            id=str(uuid.uuid4()),
+            pct_id=i % 100,
+            exp_id=1,
+            state="uploaded",
+            blob_id=str(uuid.uuid4()),
+            codec="zstd",
+            base_blob_id=None,
+            created_at=now - timedelta(seconds=i),
+            updated_at=None,
+        )
+        for i in range(n)
+    ]
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        data = fn()
+    return (time.perf_counter() - start) / repeat * 1000, len(data)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--rows", type=int, default=100_000, help="submissions in the listing")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="runs per measurement")
+    args = parser.parse_args()
+
+    app = create_app("development")
+    payload = {"status": "success", "submission_list": submission_rows(args.rows)}
+    candidates = {
+        "CustomJSONEncoder": lambda: json.dumps(payload, default=legacy_default, separators=(",", ":")).encode("utf-8"),
+        "serializer+json": lambda: json.dumps(payload, default=serialize, separators=(",", ":")).encode("utf-8"),
+    }
+    if wire.orjson is not None:
+        candidates["serializer+orjson"] = lambda: wire.dumps(payload, default=serialize)
+    if wire.msgpack is not None:
+        candidates["serializer+msgpack"] = lambda: wire.dumps(payload, wire.MSGPACK_MIME, default=serialize)
+    with app.app_context():
+        print(f"{'encoder':<22}{'ms':>10}{'rows/s':>12}{'bytes':>12}")
+        for name, fn in candidates.items():
+            ms, size = timed(fn, args.repeat)
+            print(f"{name:<22}{ms:>10.1f}{args.rows / ms * 1000:>12.0f}{size:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import argparse
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from nvflops.utils.wire import available_formats, dumps, loads
+
+
+def submission_rows(n):
+    now = datetime.utcnow()
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "pct_id": random.randint(1, 100),
+            "exp_id": 1,
+            "state": random.choice(["registered", "uploaded"]),
+            "blob_id": str(uuid.uuid4()),
+            "codec": "zstd",
+            "base_blob_id": None,
+            "created_at": now - timedelta(seconds=i),
+            "updated_at": None,
+        }
+        for i in range(n)
+    ]
+
+
+def vital_signs(n):
+    now = datetime.utcnow()
+    return [
+        {
+            "created_at": (now - timedelta(seconds=i)).isoformat(),
+            "vital_sign": {
+                "cpu": random.uniform(0, 100),
+                "used_mem": random.getrandbits(34),
+                "free_mem": random.getrandbits(34),
+            },
+        }
+        for i in range(n)
+    ]
+
+
+def bench(payload, mimetype, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        data = dumps(payload, mimetype)
+    encode_time = (time.perf_counter() - start) / repeat
+    start = time.perf_counter()
+    for _ in range(repeat):
+        loads(data, mimetype)
+    decode_time = (time.perf_counter() - start) / repeat
+    return len(data), encode_time * 1000, decode_time * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--rows", type=int, default=10000, help="rows per payload")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="runs per measurement")
+    args = parser.parse_args()
+
+    payloads = {
+        "submission_list": {"status": "success", "submission_list": submission_rows(args.rows)},
+        "child_list": {"status": "success", "child_list": submission_rows(min(args.rows, 100))},
+        "vital_sign_list": {"vital_sign_list": vital_signs(min(args.rows, 600))},
+    }
+    print(f"{'payload':<18}{'format':<22}{'bytes':>10}{'encode ms':>12}{'decode ms':>12}")
+    for payload_name, payload in payloads.items():
+        for mimetype in available_formats():
+            size, encode_ms, decode_ms = bench(payload, mimetype, args.repeat)
+            print(f"{payload_name:<18}{mimetype:<22}{size:>10}{encode_ms:>12.2f}{decode_ms:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
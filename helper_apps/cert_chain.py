@@ -9,6 +9,8 @@ def write(filename: str, sc: SimpleCert):
         f.write(sc.s_crt)
     with open(f"certs/{key_name}", "wb") as f:
         f.write(sc.s_prv)
+    with open(f"certs/{filename}.chain.pem", "wb") as f:
+        f.write(sc.s_chain)
 
 
 rootCA = SimpleCert("ca")
@@ -33,7 +35,7 @@ write("subca2", subca2)
 client1 = SimpleCert("client1")
 client1.set_issuer_simple_cert(subca1)
 client1.create_cert(type="client")
-fp = client1.sha1_fingerprint.hex()
+fp = client1.sha1_fingerprint_str
 print(f"client1 fingerprint: {fp}")
 write("client1", client1)
 
@@ -42,9 +44,6 @@ client2.set_issuer_simple_cert(subca2)
 client2.create_cert(type="client")
 write("client2", client2)
 
-filenames = ["certs/subca1.cert.pem", "certs/subca2.cert.pem", "certs/ca.cert.pem"]
-
+# both sub CAs followed by the root, built from the serialized certificates already in memory
 with open("certs/ca-chain.cert.pem", "wb") as out_f:
-    for f in filenames:
-        with open(f, "rb") as in_f:
-            out_f.write(in_f.read())
+    out_f.write(subca1.s_crt + subca2.s_chain)
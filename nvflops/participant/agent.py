@@ -1,24 +1,83 @@
 import io
 import logging
+import os
+import random
 import time
+import uuid
+from collections import deque
+from datetime import datetime
 from pprint import pprint
 from threading import Event, Lock, Thread
 from typing import Any, Dict, Optional
 
-import minio
 import psutil
-from requests import Request, RequestException, Session, codes
-from requests.adapters import HTTPAdapter
+import urllib3
+from requests import Request, RequestException, codes
+
+from ..utils.wire import dumps, get_mimetype, loads, mimetype_of
+from .codec import CODEC_HEADER, CODEC_METADATA_KEY, DEFAULT_CHUNK_SIZE, CompressedReader, decompress_stream, get_codec
+from .delta import BASE_HEADER, BASE_METADATA_KEY, BlobCache, apply_delta, encode_delta
+from .journal import SubmissionJournal
+from .retry import CircuitOpenError, RetriesExhausted, RetryPolicy
+from .transport import Transport
+
+# minio requires a known part size when the object length is not known up front
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+# bounds on the heartbeat interval the tracker may ask for, and the random spread around it
+MIN_HEARTBEAT_INTERVAL = 1
+MAX_HEARTBEAT_INTERVAL = 600
+HEARTBEAT_JITTER = 0.1
+
+# request bodies below this size go out uncompressed
+REQUEST_COMPRESS_MIN_SIZE = 1400
+
+
+def heartbeat_interval_from(tracker_info, current):
+    interval = (tracker_info or {}).get("heartbeat_interval")
+    if not interval:
+        return current
+    return min(max(float(interval), MIN_HEARTBEAT_INTERVAL), MAX_HEARTBEAT_INTERVAL)
+
+
+def jittered(interval, jitter=HEARTBEAT_JITTER):
+    return interval * random.uniform(1 - jitter, 1 + jitter)
+
+
+def _write_private_file(path, text):
+    # written next to the target and renamed, so a reader never sees a half written file
+    tmp_path = path + ".tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
 
 
 class BaseAgent:
-    def __init__(self, api_endpoint, name: str, retry_delay=4, max_retries=1000):
+    def __init__(
+        self,
+        api_endpoint,
+        name: str,
+        retry_delay=4,
+        max_retries=1000,
+        retry_policy=None,
+        transport=None,
+        wire_format=None,
+        request_encoding="gzip",
+    ):
         self.api_endpoint = api_endpoint
         self._name = name
         self._retry_delay = retry_delay
         self._logger = logging.getLogger(self.__class__.__name__)
         self._stop_retrying = False
         self._max_retries = max_retries
+        # retry_delay is the backoff base, the actual delay is jittered and grows per attempt
+        self._retry_policy = retry_policy or RetryPolicy(base_delay=retry_delay, max_retries=max_retries)
+        self._transport = transport or Transport()
+        # request bodies and the preferred response format, "json" or "msgpack"
+        self._mimetype = get_mimetype(wire_format)
+        self._request_codec = get_codec(request_encoding) if request_encoding else None
+        self._base_headers = dict()
         self._exit = False
 
     def set_base_headers(self, headers):
@@ -28,60 +87,133 @@ class BaseAgent:
         resp = self._session.send(prepared)
         return resp
 
+    def _request(self, method, url, payload=None, headers=None):
+        # identity headers unless the caller passes its own
+        headers = dict(self._base_headers if headers is None else headers)
+        headers["Accept"] = self._mimetype
+        data = self._encode_body(payload, headers) if payload is not None else None
+        return Request(method, url, data=data, headers=headers)
+
+    def _encode_body(self, payload, headers):
+        data = dumps(payload, self._mimetype)
+        headers["Content-Type"] = self._mimetype
+        if self._request_codec is not None and len(data) >= REQUEST_COMPRESS_MIN_SIZE:
+            data = self._request_codec.compress(data)
+            headers["Content-Encoding"] = self._request_codec.name
+        return data
+
+    @staticmethod
+    def _decode(resp):
+        # the tracker answers JSON when it has no msgpack support
+        return loads(resp.content, mimetype_of(resp.headers.get("Content-Type")))
+
     def _try_send(
-        self, url, headers: Optional[Dict[str, Any]] = None, payload: Optional[Dict[str, Any]] = None
+        self, url, headers: Optional[Dict[str, Any]] = None, payload: Optional[Dict[str, Any]] = None, data=None
     ) -> Dict[str, Any]:
-        req = Request("POST", url, json=payload, headers=headers)
+        req = Request("POST", url, json=payload if data is None else None, data=data, headers=headers)
         prepared = self._session.prepare_request(req)
-        try_count = 0
-        while not self._stop_retrying:
-            try:
-                return self._send(prepared)
-            except RequestException as e:
-                if try_count >= self._max_retries:
-                    self._logger.warning(f"Unable to connect to {url} after reaching max tries {self._max_retries}.")
-                    break
-                try_count += 1
-                self._logger.info(f"tried: {try_count} with exception: {e}")
-                time.sleep(self._retry_delay)
+        try:
+            return self._send_with_retry(prepared)
+        except (RequestException, CircuitOpenError) as e:
+            self._logger.warning(f"Unable to send to {url}: {e}")
+        except RetriesExhausted as e:
+            return e.response
+
+    def _send_with_retry(self, prepared, wait_open=False):
+        return self._retry_policy.call(
+            lambda: self._send(prepared),
+            prepared.url,
+            retry_on=(RequestException,),
+            should_stop=lambda: self._stop_retrying,
+            wait_open=wait_open,
+        )
 
     def set_secure_context(self, ssl_context):
         self._ssl_context = ssl_context
 
     def prepare_connection(self):
-        self._session = Session()
-        adapter = HTTPAdapter(max_retries=1)
-        self._session.mount("http://", adapter)
-        self._session.mount("https://", adapter)
+        self._session = self._transport.session
 
 
 class VitalSignReporter(BaseAgent, Thread):
-    def __init__(self, api_endpoint, name: str, headers, heartbeat_interval=10):
-        BaseAgent.__init__(self, api_endpoint=api_endpoint, name=name)
+    """Samples vital signs every ``sample_interval`` into a ring buffer and ships the buffer once per heartbeat.
+
+    Samples taken while the tracker is unreachable are kept, up to ``buffer_size`` newest ones, and go
+    out with the next heartbeat that gets through.
+    """
+
+    def __init__(
+        self,
+        api_endpoint,
+        name: str,
+        headers,
+        heartbeat_interval=10,
+        retry_policy=None,
+        sample_interval=None,
+        buffer_size=600,
+        transport=None,
+        wire_format=None,
+        request_encoding="gzip",
+    ):
+        BaseAgent.__init__(
+            self,
+            api_endpoint=api_endpoint,
+            name=name,
+            retry_policy=retry_policy,
+            transport=transport,
+            wire_format=wire_format,
+            request_encoding=request_encoding,
+        )
         Thread.__init__(self)
         self.set_base_headers(headers)
         self._heartbeat_interval = heartbeat_interval
+        self._sample_interval = sample_interval or heartbeat_interval
+        self._samples = deque(maxlen=buffer_size)
 
     def _get_vital_signs(self):
         mem = psutil.virtual_memory()
         return {"cpu": psutil.cpu_percent(), "used_mem": mem.used, "free_mem": mem.free}
 
+    def _sample(self):
+        self._samples.append({"created_at": datetime.utcnow().isoformat(), "vital_sign": self._get_vital_signs()})
+
     def run(self):
         self.prepare_connection()
-        payload = dict()
+        # random phase, agents started together would otherwise heartbeat in lockstep
+        next_heartbeat = time.monotonic() + random.uniform(0, self._heartbeat_interval)
+        next_sample = time.monotonic()
         while not self._exit:
-            payload["vital_sign"] = self._get_vital_signs()
-            self._send_one_heartbeat(payload=payload)
-            time.sleep(self._heartbeat_interval)
+            now = time.monotonic()
+            if now >= next_sample:
+                self._sample()
+                next_sample = now + self._sample_interval
+            if now >= next_heartbeat:
+                self._send_one_heartbeat()
+                next_heartbeat = time.monotonic() + jittered(self._heartbeat_interval)
+            time.sleep(max(0, min(next_sample, next_heartbeat) - time.monotonic()))
+
+    def _send_with_retry(self, prepared, wait_open=False):
+        # one attempt per heartbeat, backing off here would stop the sampling the buffer is for
+        return self._retry_policy.call(
+            lambda: self._send(prepared), prepared.url, retry_on=(RequestException,), should_stop=lambda: True
+        )
 
-    def _send_one_heartbeat(self, payload):
-        resp = self._try_send(self.api_endpoint, headers=self._base_headers, payload=payload)
+    def _send_one_heartbeat(self):
+        batch = list(self._samples)
+        headers = dict(self._base_headers)
+        headers["Accept"] = self._mimetype
+        data = self._encode_body({"vital_sign_list": batch}, headers)
+        resp = self._try_send(self.api_endpoint, headers=headers, data=data)
         if resp is None:
             return
         if resp.status_code != codes.ok:
             return
-        self._tracker_info = resp.json()
+        # delivered, samples taken since stay for the next heartbeat
+        for _ in batch:
+            self._samples.popleft()
+        self._tracker_info = self._decode(resp)
         pprint(self._tracker_info)
+        self._heartbeat_interval = heartbeat_interval_from(self._tracker_info, self._heartbeat_interval)
         plan = self._tracker_info.get("plan")
         if plan:
             action = plan.get("action")
@@ -100,8 +232,21 @@ class TrackerAgent(BaseAgent):
         name: str,
         role,
         heartbeat_interval=5,
+        codec=None,
+        blob_cache_size=512 * 1024 * 1024,
+        presigned=False,
+        transport=None,
+        wire_format=None,
+        request_encoding="gzip",
+        journal_path=None,
+        journal_batch_size=50,
     ):
-        super().__init__(tracker_endpoint, name)
+        super().__init__(
+            tracker_endpoint, name, transport=transport, wire_format=wire_format, request_encoding=request_encoding
+        )
+        self._wire_format = wire_format
+        self._request_encoding = request_encoding
+        self._tracker_end_point = tracker_endpoint
         self._project = None
         self._study = None
         self._experiment = None
@@ -122,6 +267,17 @@ class TrackerAgent(BaseAgent):
         self.stop = False
         self._last_submission_id = ""
         self._tracker_info = None
+        self._codec = get_codec(codec)
+        self._part_size = MIN_PART_SIZE
+        self._blob_cache = BlobCache(blob_cache_size)
+        self._presigned = presigned
+        self._blob_client = None
+        # with a journal submit() only writes locally, a background thread registers and uploads
+        self._journal = SubmissionJournal(journal_path) if journal_path else None
+        self._journal_batch_size = journal_batch_size
+        self._drain_event = Event()
+        self._drain_lock = Lock()
+        self._drainer = None
 
     def set_secure_context(self, ca_path: str, cert_path: str = "", prv_key_path: str = ""):
         self._ca_path = ca_path
@@ -135,19 +291,69 @@ class TrackerAgent(BaseAgent):
     def prepare_connection(self):
         super().prepare_connection()
         if self._ca_path:
-            self._session.verify = self._ca_path
-            self._session.cert = (self._cert_path, self._prv_key_path)
-        self._blob_client = minio.Minio(self._blob_end_point, secure=False)
+            self._transport.set_secure_context(self._ca_path, self._cert_path, self._prv_key_path)
+        if not self._presigned:
+            import minio
+
+            self._blob_client = minio.Minio(
+                self._blob_end_point, secure=False, http_client=self._transport.pool_manager()
+            )
         self._base_headers = {"X-Project": self._project, "X-Study": self._study, "X-Pct": self._name}
         self._base_payload = {"experiment": self._experiment}
+        if self._journal is not None and self._drainer is None:
+            self._drainer = Thread(target=self._drain_loop, daemon=True)
+            self._drainer.start()
 
-    def start_reporting_vital_signs(self, update_callback=None, conditional_cb=False):
+    def start_reporting_vital_signs(self, update_callback=None, conditional_cb=False, sample_interval=None):
         self.conditional_cb = conditional_cb
-        self._vs_reporter = VitalSignReporter(self.api_endpoint + "/routine/vital_sign", self._name, self._base_headers)
+        self._vs_reporter = VitalSignReporter(
+            self.api_endpoint + "/routine/vital_sign",
+            self._name,
+            self._base_headers,
+            heartbeat_interval=self._heartbeat_interval,
+            retry_policy=self._retry_policy,
+            sample_interval=sample_interval,
+            transport=self._transport,
+            wire_format=self._wire_format,
+            request_encoding=self._request_encoding,
+        )
         self._vs_reporter.start()
         if update_callback:
             self._update_callback = update_callback
 
+    def refresh_credentials(self):
+        """Fetch a renewed client certificate from the tracker and switch to it without restarting."""
+        if not self._cert_path:
+            return False
+        api_end_point = self._tracker_end_point + "/routine/credential"
+        req = self._request("GET", api_end_point)
+        resp = self._send_with_retry(self._session.prepare_request(req))
+        if resp.status_code != codes.ok:
+            self._logger.warning(f"Tracker answered {resp.status_code} to the credential request")
+            return False
+        certificate = self._decode(resp).get("certificate")
+        if not certificate:
+            return False
+        _write_private_file(self._cert_path, certificate.get("cert"))
+        _write_private_file(self._prv_key_path, certificate.get("key"))
+        # the reporter thread shares the transport and switches along
+        self._transport.set_secure_context(self._ca_path, self._cert_path, self._prv_key_path)
+        self._transport.reset_connections()
+        self._logger.info(f"Switched to renewed certificate valid until {certificate.get('not_valid_after')}")
+        return True
+
+    def start_credential_refresh(self, interval=3600):
+        def _refresh_loop():
+            while not self._exit:
+                time.sleep(interval)
+                try:
+                    self.refresh_credentials()
+                except (RequestException, CircuitOpenError, RetriesExhausted, OSError) as e:
+                    self._logger.info(f"Unable to refresh credentials: {e}")
+
+        self._credential_refresher = Thread(target=_refresh_loop, daemon=True)
+        self._credential_refresher.start()
+
     def start_study(self):
         if self._role == "aggregator":
             self.submit([], {}, "starting_blob".encode("utf-8"))
@@ -174,43 +380,246 @@ class TrackerAgent(BaseAgent):
 
     def get_root(self):
         api_end_point = self._tracker_end_point + "/submission/root"
-        payload = self.get_base_payload()
-        req = Request("GET", api_end_point, json=payload, headers=None)
+        payload = self._get_base_payload()
+        req = self._request("GET", api_end_point, payload=payload)
         prepared = self._session.prepare_request(req)
-        resp = self._session.send(prepared).json()
+        resp = self._decode(self._send_with_retry(prepared, wait_open=True))
         if resp.get("status") == "error":
             return None
         else:
             return resp
 
-    def submit(self, parent_id_list, meta, blob):
-        resp = self.submit_meta(parent_id_list, meta)
-        self._last_submission = resp.get("submission")
-        blob_id = self._last_submission.get("blob_id")
-        self._blob_client.put_object(self._bucket_name, blob_id, io.BytesIO(blob), len(blob))
+    def submit(self, parent_id_list, meta, blob, codec=None, base_blob_id=None):
+        """Register a submission and upload its blob.
+
+        With ``base_blob_id`` only the delta against that (already uploaded) blob is stored,
+        typically the parent global model.  Readers get the full blob back from ``get_blob``.
+        With a journal the submission is written locally and returns at once, it reaches the
+        tracker when the journal drains.
+        """
+        codec = get_codec(codec) if codec else self._codec
+        if self._journal is not None:
+            if base_blob_id:
+                self._journal_submission(parent_id_list, meta, blob, codec, base_blob_id, encoded=False)
+            else:
+                self._journal_submission(parent_id_list, meta, codec.compress(blob), codec, None)
+            return
+        data = encode_delta(blob, self.get_blob(base_blob_id)) if base_blob_id else blob
+        if self._presigned:
+            data = codec.compress(data)
+            resp = self.submit_meta(
+                parent_id_list, meta, codec=codec.name, base_blob_id=base_blob_id, presign=True, blob_size=len(data)
+            )
+            self._last_submission = resp.get("submission")
+            self._put_presigned(self._last_submission.get("id"), data, resp.get("upload"))
+        else:
+            resp = self.submit_meta(parent_id_list, meta, codec=codec.name, base_blob_id=base_blob_id)
+            self._last_submission = resp.get("submission")
+            self._put_blob(self._last_submission.get("blob_id"), data, codec, base_blob_id=base_blob_id)
+        self._blob_cache.put(self._last_submission.get("blob_id"), blob)
         self._last_submission_id = self._last_submission.get("id")
 
+    def _journal_submission(self, parent_id_list, meta, data, codec, base_blob_id, encoded=True):
+        # the id is picked here so that children can name their parent before the tracker saw it
+        entry = dict(
+            id=str(uuid.uuid4()),
+            parent_id_list=parent_id_list,
+            custom_field=meta,
+            codec=codec.name,
+            base_blob_id=base_blob_id,
+            blob_size=len(data),
+        )
+        if not encoded:
+            entry["encoded"] = False
+        self._journal.append(entry, data)
+        self._last_submission = entry
+        self._last_submission_id = entry["id"]
+        self._drain_event.set()
+
+    def _drain_loop(self, interval=5):
+        while not self._exit:
+            self._drain_event.wait(interval)
+            self._drain_event.clear()
+            if not len(self._journal):
+                continue
+            try:
+                self.drain_journal()
+            except (RequestException, CircuitOpenError, RetriesExhausted, urllib3.exceptions.HTTPError) as e:
+                self._logger.info(f"Journal not drained, {len(self._journal)} submissions pending: {e}")
+            except Exception:
+                # S3 errors, a full disk and the like, the thread must outlive them to drain later
+                self._logger.exception(f"Journal drain failed, {len(self._journal)} submissions pending")
+
+    def drain_journal(self):
+        """Registers and uploads journaled submissions in journal order, returns how many were drained."""
+        drained = 0
+        api_end_point = self._tracker_end_point + "/submission/batch"
+        with self._drain_lock:
+            while True:
+                entry_list = self._journal.pending(self._journal_batch_size)
+                if not entry_list:
+                    break
+                entry_list = [self._encode_journaled(entry) for entry in entry_list]
+                payload = self._get_base_payload()
+                payload.update(presign=self._presigned, submission_list=entry_list)
+                req = self._request("POST", api_end_point, payload=payload, headers=self._base_headers)
+                resp = self._send_with_retry(self._session.prepare_request(req))
+                resp.raise_for_status()
+                result = self._decode(resp)
+                if result.get("status") != "success":
+                    self._logger.warning("Tracker refused the journaled submissions")
+                    break
+                for item in result.get("submission_list", []):
+                    self._upload_journaled(item.get("submission"), item.get("upload"))
+                    drained += 1
+                rejected = result.get("rejected")
+                if rejected:
+                    # its parent or experiment is unknown to the tracker, retrying will not help, and
+                    # its children are rejected in turn
+                    self._logger.error(f"Tracker rejected journaled submission {rejected}, moved to the dead letters")
+                    self._journal.dead_letter(rejected, reason="rejected")
+                elif not result.get("submission_list"):
+                    break
+            self._journal.compact()
+        return drained
+
+    def dead_letters(self):
+        """Journaled submissions the tracker rejected, with their blobs kept under ``<journal>/dead``."""
+        return self._journal.dead_letters() if self._journal is not None else []
+
+    def _encode_journaled(self, entry):
+        # deltas are encoded here rather than in submit(), the base may only be reachable now
+        if entry.get("encoded", True):
+            return entry
+        blob = self._journal.read_blob(entry["id"])
+        data = get_codec(entry["codec"]).compress(encode_delta(blob, self.get_blob(entry["base_blob_id"])))
+        entry = {k: v for k, v in entry.items() if k != "encoded"}
+        entry["blob_size"] = len(data)
+        self._journal.append(entry, data)
+        return entry
+
+    def _upload_journaled(self, submission, upload):
+        sub_id = submission.get("id")
+        # uploaded before an acknowledgement got lost
+        if submission.get("state") != "uploaded":
+            data = self._journal.read_blob(sub_id)
+            if self._presigned:
+                self._put_presigned(sub_id, data, upload)
+            else:
+                self._put_blob(
+                    submission.get("blob_id"),
+                    data,
+                    get_codec(submission.get("codec")),
+                    base_blob_id=submission.get("base_blob_id"),
+                    compressed=True,
+                )
+        self._journal.ack(sub_id)
+
+    def _put_presigned(self, sub_id, data, upload):
+        part_size = upload.get("part_size")
+        parts = list()
+        for part_number, url in enumerate(upload.get("urls"), start=1):
+            chunk = data[(part_number - 1) * part_size : part_number * part_size]
+            resp = self._retry_policy.call(
+                lambda: self._session.put(url, data=chunk), url, retry_on=(RequestException,), wait_open=True
+            )
+            resp.raise_for_status()
+            parts.append({"part_number": part_number, "etag": resp.headers.get("ETag")})
+        api_end_point = self._tracker_end_point + f"/submission/{sub_id}/blob"
+        payload = {"upload_id": upload.get("upload_id"), "parts": parts}
+        req = self._request("POST", api_end_point, payload=payload, headers=self._base_headers)
+        resp = self._send_with_retry(self._session.prepare_request(req), wait_open=True)
+        resp.raise_for_status()
+
+    def _put_blob(self, blob_id, blob, codec, base_blob_id=None, compressed=False):
+        metadata = {CODEC_METADATA_KEY: codec.name}
+        if base_blob_id:
+            metadata[BASE_METADATA_KEY] = base_blob_id
+        if codec.name == "none" or compressed:
+            self._call_blob_client(
+                lambda: self._blob_client.put_object(
+                    self._bucket_name, blob_id, io.BytesIO(blob), len(blob), metadata=metadata
+                )
+            )
+            return
+        streams = list()
+
+        def _put():
+            # a retry starts over with a fresh stream
+            streams.append(CompressedReader(io.BytesIO(blob), codec))
+            return self._blob_client.put_object(
+                self._bucket_name, blob_id, streams[-1], -1, part_size=self._part_size, metadata=metadata
+            )
+
+        self._call_blob_client(_put)
+        stream = streams[-1]
+        self._logger.debug(f"{blob_id=} uploaded with {codec.name}: {stream.raw_bytes} -> {stream.compressed_bytes}")
+
+    def _call_blob_client(self, func):
+        # connection level failures only, S3 errors are answers and are raised as is
+        return self._retry_policy.call(
+            func, self._blob_end_point, retry_on=(urllib3.exceptions.HTTPError,), wait_open=True
+        )
+
     def _get_base_payload(self):
         base_payload_copy = self._base_payload.copy()
         return base_payload_copy
 
-    def submit_meta(self, parent_id_list, custom_field, headers=None) -> Dict[str, Any]:
+    def submit_meta(
+        self, parent_id_list, custom_field, headers=None, codec="none", base_blob_id=None, presign=False, blob_size=0
+    ) -> Dict[str, Any]:
         payload = self._get_base_payload()
-        payload.update(dict(parent_id_list=parent_id_list, custom_field=custom_field))
+        payload.update(dict(parent_id_list=parent_id_list, custom_field=custom_field, codec=codec))
+        if base_blob_id:
+            payload["base_blob_id"] = base_blob_id
+        if presign:
+            payload.update(dict(presign=True, blob_size=blob_size))
         api_end_point = self._tracker_end_point + "/submission"
-        req = Request("POST", api_end_point, json=payload, headers=headers)
+        req = self._request("POST", api_end_point, payload=payload, headers=headers)
         prepared = self._session.prepare_request(req)
-        resp = self._session.send(prepared)
-        return resp.json()
+        resp = self._send_with_retry(prepared, wait_open=True)
+        return self._decode(resp)
 
     def get_submission(self):
         if self._last_submission_id == "":
             return self.get_root()
         api_end_point = self._tracker_end_point + f"/submission/{self._last_submission_id}/child"
-        req = Request("GET", api_end_point, json=self._base_payload, headers=None)
+        req = self._request("GET", api_end_point, payload=self._base_payload)
         prepared = self._session.prepare_request(req)
-        resp = self._session.send(prepared)
-        return resp.json()
+        resp = self._send_with_retry(prepared, wait_open=True)
+        return self._decode(resp)
 
     def get_blob(self, blob_id):
-        return self._blob_client.get_object(self._bucket_name, blob_id)
+        blob = self._blob_cache.get(blob_id)
+        if blob is not None:
+            return blob
+        if self._presigned:
+            blob, base_blob_id = self._get_presigned(blob_id)
+        else:
+            resp = self._call_blob_client(lambda: self._blob_client.get_object(self._bucket_name, blob_id))
+            try:
+                codec = get_codec(resp.headers.get(CODEC_HEADER))
+                base_blob_id = resp.headers.get(BASE_HEADER)
+                blob = decompress_stream(resp.stream(DEFAULT_CHUNK_SIZE), codec)
+            finally:
+                resp.close()
+                resp.release_conn()
+        if base_blob_id:
+            blob = apply_delta(blob, self.get_blob(base_blob_id))
+        self._blob_cache.put(blob_id, blob)
+        return blob
+
+    def _get_presigned(self, blob_id):
+        api_end_point = self._tracker_end_point + f"/submission/blob/{blob_id}"
+        req = self._request("GET", api_end_point, headers=self._base_headers)
+        download = self._decode(self._send_with_retry(self._session.prepare_request(req), wait_open=True)).get(
+            "download"
+        )
+        url = download.get("url")
+        resp = self._retry_policy.call(
+            lambda: self._session.get(url, stream=True), url, retry_on=(RequestException,), wait_open=True
+        )
+        with resp:
+            resp.raise_for_status()
+            blob = decompress_stream(resp.iter_content(DEFAULT_CHUNK_SIZE), get_codec(download.get("codec")))
+        return blob, download.get("base_blob_id")
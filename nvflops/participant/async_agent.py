@@ -0,0 +1,301 @@
+import asyncio
+import logging
+import random
+import ssl
+from typing import Any, Dict
+
+import psutil
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from .agent import _write_private_file, heartbeat_interval_from, jittered
+from .codec import DEFAULT_CHUNK_SIZE, get_codec
+from .delta import BlobCache, apply_delta, encode_delta
+from .retry import CircuitOpenError, RetriesExhausted, RetryPolicy
+
+
+class AsyncTrackerAgent:
+    """asyncio counterpart of TrackerAgent.
+
+    Heartbeats, submissions, polling for children and blob transfers all run as coroutines on the
+    caller's event loop, so one process can drive many participants.  Blobs move through presigned
+    URLs handed out by the tracker, the minio client is blocking and is not used here.  Pass a shared
+    ``aiohttp.ClientSession`` to pool connections across agents.
+    """
+
+    def __init__(
+        self,
+        tracker_endpoint,
+        name: str,
+        role,
+        project=None,
+        study=None,
+        experiment=None,
+        heartbeat_interval=5,
+        codec=None,
+        blob_cache_size=512 * 1024 * 1024,
+        retry_delay=4,
+        max_retries=1000,
+        retry_policy=None,
+    ):
+        if aiohttp is None:
+            raise RuntimeError("AsyncTrackerAgent requires the aiohttp package")
+        self._tracker_end_point = tracker_endpoint
+        self._name = name
+        self._role = role
+        self._project = project
+        self._study = study
+        self._experiment = experiment
+        self._heartbeat_interval = heartbeat_interval
+        self._codec = get_codec(codec)
+        self._blob_cache = BlobCache(blob_cache_size)
+        self._retry_policy = retry_policy or RetryPolicy(base_delay=retry_delay, max_retries=max_retries)
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._session = None
+        self._own_session = False
+        self._ssl_context = None
+        self._cert_path = None
+        self._prv_key_path = None
+        self._heartbeat_task = None
+        self._tracker_info = None
+        self._last_submission = None
+        self._last_submission_id = ""
+        self._asked_to_exit = False
+        self.go = False
+
+    def set_secure_context(self, ca_path: str, cert_path: str = "", prv_key_path: str = ""):
+        self._ssl_context = ssl.create_default_context(cafile=ca_path)
+        self._cert_path = cert_path
+        self._prv_key_path = prv_key_path
+        if cert_path:
+            self._ssl_context.load_cert_chain(cert_path, prv_key_path)
+
+    def set_insecure_content(self, project, study):
+        self._project = project
+        self._study = study
+
+    async def refresh_credentials(self):
+        """Fetch a renewed client certificate from the tracker and use it for new connections."""
+        if not self._cert_path:
+            return False
+        certificate = (await self._request("GET", "/routine/credential")).get("certificate")
+        if not certificate:
+            return False
+        _write_private_file(self._cert_path, certificate.get("cert"))
+        _write_private_file(self._prv_key_path, certificate.get("key"))
+        self._ssl_context.load_cert_chain(self._cert_path, self._prv_key_path)
+        self._logger.info(f"Switched to renewed certificate valid until {certificate.get('not_valid_after')}")
+        return True
+
+    @property
+    def _ssl_kwargs(self):
+        return {"ssl": self._ssl_context} if self._ssl_context else {}
+
+    @property
+    def base_headers(self):
+        return {"X-Project": self._project, "X-Study": self._study, "X-Pct": self._name}
+
+    async def prepare_connection(self, session=None):
+        if session is None:
+            session = aiohttp.ClientSession(raise_for_status=False)
+            self._own_session = True
+        self._session = session
+        self._base_payload = {"experiment": self._experiment}
+
+    async def close(self):
+        await self.stop_reporting_vital_signs()
+        if self._own_session and self._session is not None:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self):
+        if self._session is None:
+            await self.prepare_connection()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _with_retry(self, coro_func, url, wait_open=True):
+        return await self._retry_policy.acall(
+            coro_func, url, retry_on=(aiohttp.ClientConnectionError, asyncio.TimeoutError), wait_open=wait_open
+        )
+
+    async def _request(self, method, path, payload=None, wait_open=True) -> Dict[str, Any]:
+        url = self._tracker_end_point + path
+
+        async def _attempt():
+            async with self._session.request(
+                method, url, json=payload, headers=self.base_headers, **self._ssl_kwargs
+            ) as resp:
+                # the policy retries on these statuses
+                if resp.status in self._retry_policy.retry_statuses:
+                    return resp
+                resp.raise_for_status()
+                return await resp.json()
+
+        return await self._with_retry(_attempt, url, wait_open=wait_open)
+
+    def _get_vital_signs(self):
+        mem = psutil.virtual_memory()
+        return {"cpu": psutil.cpu_percent(), "used_mem": mem.used, "free_mem": mem.free}
+
+    def start_reporting_vital_signs(self):
+        self._heartbeat_task = asyncio.ensure_future(self._heartbeat_loop())
+        return self._heartbeat_task
+
+    async def stop_reporting_vital_signs(self):
+        if self._heartbeat_task is None:
+            return
+        self._heartbeat_task.cancel()
+        try:
+            await self._heartbeat_task
+        except asyncio.CancelledError:
+            pass
+        self._heartbeat_task = None
+
+    def next_heartbeat_delay(self):
+        return jittered(self._heartbeat_interval)
+
+    async def _heartbeat_loop(self):
+        # random phase, agents started together would otherwise heartbeat in lockstep
+        await asyncio.sleep(random.uniform(0, self._heartbeat_interval))
+        while not self._asked_to_exit:
+            try:
+                await self.send_one_heartbeat()
+            except (aiohttp.ClientError, asyncio.TimeoutError, CircuitOpenError, RetriesExhausted) as e:
+                self._logger.info(f"heartbeat failed: {e}")
+            await asyncio.sleep(self.next_heartbeat_delay())
+
+    async def send_one_heartbeat(self, vital_sign=None):
+        payload = {"vital_sign": vital_sign if vital_sign is not None else self._get_vital_signs()}
+        # heartbeats fail fast while the tracker is unreachable, the next one is due soon anyway
+        self._tracker_info = await self._request("POST", "/routine/vital_sign", payload=payload, wait_open=False)
+        self._heartbeat_interval = heartbeat_interval_from(self._tracker_info, self._heartbeat_interval)
+        plan = self._tracker_info.get("plan")
+        if plan:
+            action = plan.get("action")
+            if action == "go":
+                self.go = True
+            elif action == "exit":
+                self._asked_to_exit = True
+        return self._tracker_info
+
+    async def wait_for_go(self, poll_interval=1):
+        while not self.go and not self._asked_to_exit:
+            await asyncio.sleep(poll_interval)
+        return self.go
+
+    async def get_root(self):
+        resp = await self._request("GET", "/submission/root", payload=self._base_payload.copy())
+        if resp.get("status") == "error":
+            return None
+        return resp
+
+    async def get_submission(self):
+        if self._last_submission_id == "":
+            return await self.get_root()
+        return await self._request(
+            "GET", f"/submission/{self._last_submission_id}/child", payload=self._base_payload.copy()
+        )
+
+    async def wait_for_children(self, poll_interval=4):
+        """Poll until the last submission has children with uploaded blobs and return them."""
+        while not self._asked_to_exit:
+            child_list = (await self.get_submission() or {}).get("child_list", [])
+            # presigned uploads complete after the submission is registered
+            child_list = [child for child in child_list if child.get("state") == "uploaded"]
+            if child_list:
+                return child_list
+            await asyncio.sleep(poll_interval)
+        return []
+
+    async def submit_meta(self, parent_id_list, custom_field, codec="none", base_blob_id=None, blob_size=0):
+        payload = self._base_payload.copy()
+        payload.update(dict(parent_id_list=parent_id_list, custom_field=custom_field, codec=codec))
+        if base_blob_id:
+            payload["base_blob_id"] = base_blob_id
+        payload.update(dict(presign=True, blob_size=blob_size))
+        return await self._request("POST", "/submission", payload=payload)
+
+    async def submit(self, parent_id_list, meta, blob, codec=None, base_blob_id=None):
+        codec = get_codec(codec) if codec else self._codec
+        base = await self.get_blob(base_blob_id) if base_blob_id else None
+        loop = asyncio.get_running_loop()
+        # compression and delta encoding are CPU bound, keep them off the loop
+        data = await loop.run_in_executor(None, self._encode, blob, base, codec)
+        resp = await self.submit_meta(
+            parent_id_list, meta, codec=codec.name, base_blob_id=base_blob_id, blob_size=len(data)
+        )
+        self._last_submission = resp.get("submission")
+        await self._put_presigned(self._last_submission.get("id"), data, resp.get("upload"))
+        self._blob_cache.put(self._last_submission.get("blob_id"), blob)
+        self._last_submission_id = self._last_submission.get("id")
+        return self._last_submission
+
+    @staticmethod
+    def _encode(blob, base, codec):
+        data = encode_delta(blob, base) if base is not None else blob
+        return codec.compress(data)
+
+    async def _put_presigned(self, sub_id, data, upload):
+        part_size = upload.get("part_size")
+
+        async def _put_part(part_number, url):
+            chunk = data[(part_number - 1) * part_size : part_number * part_size]
+
+            async def _attempt():
+                async with self._session.put(url, data=chunk) as resp:
+                    if resp.status in self._retry_policy.retry_statuses:
+                        return resp
+                    resp.raise_for_status()
+                    return {"part_number": part_number, "etag": resp.headers.get("ETag")}
+
+            return await self._with_retry(_attempt, url)
+
+        parts = await asyncio.gather(
+            *[_put_part(part_number, url) for part_number, url in enumerate(upload.get("urls"), start=1)]
+        )
+        payload = {"upload_id": upload.get("upload_id"), "parts": list(parts)}
+        return await self._request("POST", f"/submission/{sub_id}/blob", payload=payload)
+
+    async def get_blob(self, blob_id):
+        blob = self._blob_cache.get(blob_id)
+        if blob is not None:
+            return blob
+        download = (await self._request("GET", f"/submission/blob/{blob_id}")).get("download")
+        codec = get_codec(download.get("codec"))
+        url = download.get("url")
+
+        async def _attempt():
+            chunk_list = list()
+            async with self._session.get(url) as resp:
+                if resp.status in self._retry_policy.retry_statuses:
+                    return resp
+                resp.raise_for_status()
+                async for chunk in resp.content.iter_chunked(DEFAULT_CHUNK_SIZE):
+                    chunk_list.append(chunk)
+            return chunk_list
+
+        chunk_list = await self._with_retry(_attempt, url)
+        loop = asyncio.get_running_loop()
+        # decompression and delta decoding are CPU bound, keep them off the loop
+        blob = await loop.run_in_executor(None, self._decompress, chunk_list, codec)
+        base_blob_id = download.get("base_blob_id")
+        if base_blob_id:
+            base = await self.get_blob(base_blob_id)
+            blob = await loop.run_in_executor(None, apply_delta, blob, base)
+        self._blob_cache.put(blob_id, blob)
+        return blob
+
+    @staticmethod
+    def _decompress(chunk_list, codec):
+        decompressor = codec.decompressor()
+        out = bytearray()
+        for chunk in chunk_list:
+            out += decompressor.decompress(chunk)
+        out += decompressor.flush()
+        return bytes(out)
@@ -0,0 +1,204 @@
+import io
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+# Object metadata key written next to every blob so that readers know how to decode it.
+# minio prefixes it with x-amz-meta- on upload.
+CODEC_METADATA_KEY = "nvflops-codec"
+CODEC_HEADER = "x-amz-meta-" + CODEC_METADATA_KEY
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+
+class Codec:
+    name = "none"
+
+    def compressor(self):
+        return _PassThrough()
+
+    def decompressor(self):
+        return _PassThrough()
+
+    def compress(self, data: bytes) -> bytes:
+        c = self.compressor()
+        return c.compress(data) + c.flush()
+
+    def decompress(self, data: bytes) -> bytes:
+        d = self.decompressor()
+        return d.decompress(data) + d.flush()
+
+
+class _PassThrough:
+    def compress(self, data):
+        return data
+
+    def decompress(self, data):
+        return data
+
+    def flush(self):
+        return b""
+
+
+class GzipCodec(Codec):
+    name = "gzip"
+
+    def __init__(self, level=6):
+        self._level = level
+
+    def compressor(self):
+        return zlib.compressobj(self._level, zlib.DEFLATED, 31)
+
+    def decompressor(self):
+        return zlib.decompressobj(31)
+
+
+class _ZstdDecompressor:
+    def __init__(self, dobj):
+        self._dobj = dobj
+
+    def decompress(self, data):
+        return self._dobj.decompress(data)
+
+    def flush(self):
+        return b""
+
+
+class ZstdCodec(Codec):
+    name = "zstd"
+
+    def __init__(self, level=3):
+        if zstandard is None:
+            raise RuntimeError("zstd codec requires the zstandard package")
+        self._level = level
+
+    def compressor(self):
+        return zstandard.ZstdCompressor(level=self._level).compressobj()
+
+    def decompressor(self):
+        return _ZstdDecompressor(zstandard.ZstdDecompressor().decompressobj())
+
+
+class _Lz4Compressor:
+    def __init__(self, cobj):
+        self._cobj = cobj
+        self._header = cobj.begin()
+
+    def compress(self, data):
+        header, self._header = self._header, b""
+        return header + self._cobj.compress(data)
+
+    def flush(self):
+        header, self._header = self._header, b""
+        return header + self._cobj.flush()
+
+
+class _Lz4Decompressor:
+    def __init__(self, dobj):
+        self._dobj = dobj
+
+    def decompress(self, data):
+        return self._dobj.decompress(data)
+
+    def flush(self):
+        return b""
+
+
+class Lz4Codec(Codec):
+    name = "lz4"
+
+    def __init__(self, level=0):
+        if lz4_frame is None:
+            raise RuntimeError("lz4 codec requires the lz4 package")
+        self._level = level
+
+    def compressor(self):
+        return _Lz4Compressor(lz4_frame.LZ4FrameCompressor(compression_level=self._level))
+
+    def decompressor(self):
+        return _Lz4Decompressor(lz4_frame.LZ4FrameDecompressor())
+
+
+_codecs = {"none": Codec, "gzip": GzipCodec, "zstd": ZstdCodec, "lz4": Lz4Codec}
+
+
+def available_codecs():
+    names = ["none", "gzip"]
+    if zstandard is not None:
+        names.append("zstd")
+    if lz4_frame is not None:
+        names.append("lz4")
+    return names
+
+
+def get_codec(name=None, **kwargs) -> Codec:
+    if isinstance(name, Codec):
+        return name
+    if not name:
+        name = "none"
+    codec_class = _codecs.get(name)
+    if codec_class is None:
+        raise ValueError(f"Unknown codec {name=}")
+    return codec_class(**kwargs)
+
+
+class CompressedReader(io.RawIOBase):
+    """Read-only stream that compresses ``source`` chunk by chunk as it is consumed.
+
+    Lets the blob client upload a compressed object without holding the compressed copy in memory.
+    """
+
+    def __init__(self, source, codec: Codec, chunk_size=DEFAULT_CHUNK_SIZE):
+        self._source = source
+        self._compressor = codec.compressor()
+        self._chunk_size = chunk_size
+        self._buffer = bytearray()
+        self._eof = False
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+
+    def readable(self):
+        return True
+
+    def _fill(self, size):
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            chunk = self._source.read(self._chunk_size)
+            if not chunk:
+                self._buffer += self._compressor.flush()
+                self._eof = True
+                break
+            self.raw_bytes += len(chunk)
+            self._buffer += self._compressor.compress(chunk)
+
+    def read(self, size=-1):
+        if size is None:
+            size = -1
+        self._fill(size)
+        if size < 0:
+            size = len(self._buffer)
+        out = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        self.compressed_bytes += len(out)
+        return out
+
+    def readinto(self, b):
+        data = self.read(len(b))
+        b[: len(data)] = data
+        return len(data)
+
+
+def decompress_stream(chunks, codec: Codec) -> bytes:
+    decompressor = codec.decompressor()
+    out = bytearray()
+    for chunk in chunks:
+        out += decompressor.decompress(chunk)
+    out += decompressor.flush()
+    return bytes(out)
@@ -0,0 +1,85 @@
+import struct
+import zlib
+from collections import OrderedDict
+from threading import Lock
+
+# Object metadata key holding the blob id a delta was computed against.
+BASE_METADATA_KEY = "nvflops-base"
+BASE_HEADER = "x-amz-meta-" + BASE_METADATA_KEY
+
+_MAGIC = b"NVFD"
+_VERSION = 1
+_HEADER = struct.Struct(">4sBQQI")
+
+
+def _xor(data: bytes, base: bytes) -> bytes:
+    n = len(data)
+    if len(base) < n:
+        base = base + bytes(n - len(base))
+    x = int.from_bytes(data, "little") ^ int.from_bytes(base[:n], "little")
+    return x.to_bytes(n, "little")
+
+
+def encode_delta(target: bytes, base: bytes) -> bytes:
+    """XOR ``target`` against ``base``.
+
+    Model updates keep the layout of their parent, so unchanged bytes become zeros and the
+    delta compresses far better than the full blob.  Apply a codec on top of the result.
+    """
+    header = _HEADER.pack(_MAGIC, _VERSION, len(base), len(target), zlib.crc32(base))
+    return header + _xor(target, base)
+
+
+def is_delta(data: bytes) -> bool:
+    return len(data) >= _HEADER.size and data[:4] == _MAGIC
+
+
+def apply_delta(delta: bytes, base: bytes) -> bytes:
+    if not is_delta(delta):
+        raise ValueError("Not a delta blob")
+    magic, version, base_len, target_len, base_crc = _HEADER.unpack_from(delta)
+    if version != _VERSION:
+        raise ValueError(f"Unsupported delta {version=}")
+    if len(base) != base_len or zlib.crc32(base) != base_crc:
+        raise ValueError("Delta does not match the supplied base blob")
+    body = delta[_HEADER.size :]
+    if len(body) != target_len:
+        raise ValueError("Truncated delta blob")
+    return _xor(body, base)
+
+
+class BlobCache:
+    """LRU cache of full (reconstructed) blobs bounded by total size in bytes."""
+
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        self._max_bytes = max_bytes
+        self._size = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, blob_id):
+        with self._lock:
+            blob = self._entries.get(blob_id)
+            if blob is not None:
+                self._entries.move_to_end(blob_id)
+            return blob
+
+    def put(self, blob_id, blob):
+        if len(blob) > self._max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(blob_id, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[blob_id] = blob
+            self._size += len(blob)
+            while self._size > self._max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def __contains__(self, blob_id):
+        with self._lock:
+            return blob_id in self._entries
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,190 @@
+import argparse
+import asyncio
+import heapq
+import logging
+import random
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from .async_agent import AsyncTrackerAgent
+from .retry import CircuitOpenError, RetriesExhausted, RetryPolicy
+
+
+class AgentHost:
+    """Runs many logical participants in one process.
+
+    All agents share one aiohttp connection pool and one heartbeat scheduler instead of running a
+    loop per agent.  The scheduler starts every participant at a random phase and follows the
+    interval the tracker returns to each of them.  Each agent still sends its own identity headers.
+    """
+
+    def __init__(self, tracker_endpoint, heartbeat_interval=5, connection_limit=100, **agent_kwargs):
+        if aiohttp is None:
+            raise RuntimeError("AgentHost requires the aiohttp package")
+        self._tracker_end_point = tracker_endpoint
+        self._heartbeat_interval = heartbeat_interval
+        self._connection_limit = connection_limit
+        self._agent_kwargs = agent_kwargs
+        self._logger = logging.getLogger(self.__class__.__name__)
+        # one policy for all participants, they share the tracker and back off together
+        self._agent_kwargs.setdefault("retry_policy", RetryPolicy())
+        self._session = None
+        self._heartbeat_task = None
+        # in-flight heartbeat requests, close() waits for them before the session goes away
+        self._heartbeat_sends = set()
+        self.agents = dict()
+
+    def add_participant(self, name, role, project=None, study=None, experiment=None, **kwargs):
+        agent_kwargs = dict(self._agent_kwargs)
+        agent_kwargs.update(kwargs)
+        agent = AsyncTrackerAgent(
+            self._tracker_end_point,
+            name,
+            role,
+            project=project,
+            study=study,
+            experiment=experiment,
+            heartbeat_interval=self._heartbeat_interval,
+            **agent_kwargs,
+        )
+        self.agents[name] = agent
+        return agent
+
+    async def start(self):
+        self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self._connection_limit))
+        for agent in self.agents.values():
+            await agent.prepare_connection(session=self._session)
+        self._heartbeat_task = asyncio.ensure_future(self._heartbeat_loop())
+
+    async def close(self):
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat_task = None
+        for task in self._heartbeat_sends:
+            task.cancel()
+        await asyncio.gather(*self._heartbeat_sends, return_exceptions=True)
+        self._heartbeat_sends.clear()
+        for agent in self.agents.values():
+            await agent.close()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _heartbeat_loop(self):
+        loop = asyncio.get_running_loop()
+        # every agent keeps its own, tracker adjusted interval, the queue orders them by due time
+        queue = [
+            (loop.time() + random.uniform(0, agent._heartbeat_interval), i, agent)
+            for i, agent in enumerate(self.agents.values())
+        ]
+        heapq.heapify(queue)
+        vital_sign, sampled_at = None, 0
+        while queue:
+            due, i, agent = queue[0]
+            if due > loop.time():
+                await asyncio.sleep(due - loop.time())
+                continue
+            heapq.heappop(queue)
+            if agent._asked_to_exit:
+                continue
+            # one sample a second serves every simulated participant of this process
+            if loop.time() - sampled_at >= 1:
+                vital_sign, sampled_at = agent._get_vital_signs(), loop.time()
+            task = asyncio.ensure_future(self._send_one_heartbeat(agent, vital_sign))
+            self._heartbeat_sends.add(task)
+            task.add_done_callback(self._heartbeat_sends.discard)
+            heapq.heappush(queue, (loop.time() + agent.next_heartbeat_delay(), i, agent))
+
+    async def _send_one_heartbeat(self, agent, vital_sign):
+        try:
+            await agent.send_one_heartbeat(vital_sign)
+        except (aiohttp.ClientError, asyncio.TimeoutError, CircuitOpenError, RetriesExhausted) as e:
+            self._logger.info(f"heartbeat of {agent._name} failed: {e}")
+
+    async def run(self, workflow, *args, timeout=None):
+        """Run ``workflow(agent, *args)`` for every participant concurrently.
+
+        Returns one result per participant, an exception for those that failed or did not finish in time.
+        """
+        task_list = [asyncio.ensure_future(workflow(agent, *args)) for agent in self.agents.values()]
+        _, pending = await asyncio.wait(task_list, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        return [asyncio.TimeoutError() if task in pending else task.exception() or task.result() for task in task_list]
+
+
+async def simulated_workflow(agent, rounds=5, max_train_time=5, poll_interval=4):
+    """start_study and the loop of client.py, with sleeps standing in for training."""
+    await agent.wait_for_go()
+    if agent._role == "aggregator":
+        await agent.submit([], {}, "starting_blob".encode("utf-8"))
+    else:
+        while True:
+            root_sub = (await agent.get_root() or {}).get("submission")
+            if root_sub is not None:
+                break
+            await asyncio.sleep(poll_interval)
+        await agent.submit([root_sub.get("id")], {}, "first_trained_blob".encode("utf-8"))
+    for _ in range(rounds):
+        if agent._asked_to_exit:
+            break
+        child_list = await agent.wait_for_children(poll_interval=poll_interval)
+        parent_id_list = list()
+        for sub in child_list:
+            await agent.get_blob(sub.get("blob_id"))
+            parent_id_list.append(sub.get("id"))
+        await asyncio.sleep(random.uniform(0, max_train_time))
+        fake_blob = (":".join(parent_id_list) * random.randint(1, 10)).encode("utf-8")
+        await agent.submit(parent_id_list=parent_id_list, meta={}, blob=fake_blob)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate many participants in one process")
+    parser.add_argument("-p", "--project", type=str, help="project name")
+    parser.add_argument("-s", "--study", type=str, default="fl_study", help="study name")
+    parser.add_argument("-e", "--experiment", type=str, help="experiment name")
+    parser.add_argument("-n", "--num_sites", type=int, default=100, help="number of simulated trainers")
+    parser.add_argument("--prefix", type=str, default="site", help="trainer names are prefix plus index")
+    parser.add_argument("-a", "--aggregator", type=str, help="name of a simulated aggregator, if any")
+    parser.add_argument(
+        "-t", "--tracker_end_point", type=str, default="http://192.168.1.96:8000/api/v1", help="tracker_end_point"
+    )
+    parser.add_argument("-r", "--rounds", type=int, default=5, help="rounds per participant")
+    parser.add_argument("-i", "--heartbeat_interval", type=float, default=5, help="heartbeat interval in seconds")
+    parser.add_argument("--timeout", type=float, help="stop participants still running after this many seconds")
+    parser.add_argument("-l", "--connection_limit", type=int, default=100, help="size of the shared connection pool")
+    args = parser.parse_args()
+
+    host = AgentHost(args.tracker_end_point, args.heartbeat_interval, args.connection_limit)
+    identity = dict(project=args.project, study=args.study, experiment=args.experiment)
+    if args.aggregator:
+        host.add_participant(args.aggregator, "aggregator", **identity)
+    for i in range(args.num_sites):
+        host.add_participant(f"{args.prefix}{i}", "trainer", **identity)
+
+    async def _run():
+        async with host:
+            results = await host.run(simulated_workflow, args.rounds, timeout=args.timeout)
+        failed = [r for r in results if isinstance(r, Exception)]
+        print(f"{len(results) - len(failed)} participants finished, {len(failed)} failed")
+
+    asyncio.run(_run())
+
+
+if __name__ == "__main__":
+    main()
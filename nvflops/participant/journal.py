@@ -0,0 +1,132 @@
+import json
+import os
+from collections import OrderedDict
+from threading import Lock
+
+
+class SubmissionJournal:
+    """Append-only on-disk log of submissions the tracker has not acknowledged yet.
+
+    ``append`` writes the encoded blob to ``blobs/<id>`` and then one JSON line with the submission
+    metadata, both fsynced, so an entry in the log always has its blob.  Appending an entry that is
+    still pending replaces it in place.  ``ack`` appends a done record.  Pending entries come back
+    in append order, which keeps parents ahead of their children.  A torn last line left by a
+    crash is ignored on load.  Entries the tracker will never take are moved to a dead letter log,
+    their blobs to ``dead/``, for an operator to inspect or replay.
+    """
+
+    LOG_NAME = "journal.log"
+    DEAD_LETTER_NAME = "dead_letter.log"
+
+    def __init__(self, path):
+        self.path = path
+        self._blob_dir = os.path.join(path, "blobs")
+        self._dead_dir = os.path.join(path, "dead")
+        os.makedirs(self._blob_dir, exist_ok=True)
+        os.makedirs(self._dead_dir, exist_ok=True)
+        self._log_path = os.path.join(path, self.LOG_NAME)
+        self._dead_letter_path = os.path.join(path, self.DEAD_LETTER_NAME)
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self._load()
+        self._log = open(self._log_path, "a", encoding="utf-8")
+
+    def _load(self):
+        if not os.path.exists(self._log_path):
+            return
+        with open(self._log_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("op") == "add":
+                    self._entries[record["entry"]["id"]] = record["entry"]
+                elif record.get("op") == "done":
+                    self._entries.pop(record.get("id"), None)
+
+    def _write(self, record):
+        self._log.write(json.dumps(record) + "\n")
+        self._log.flush()
+        os.fsync(self._log.fileno())
+
+    def _blob_path(self, sub_id):
+        return os.path.join(self._blob_dir, sub_id)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def append(self, entry, data: bytes):
+        sub_id = entry["id"]
+        tmp_path = self._blob_path(sub_id) + ".tmp"
+        # under the lock, compact() would otherwise take the blob for an orphan
+        with self._lock:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self._blob_path(sub_id))
+            self._write({"op": "add", "entry": entry})
+            self._entries[sub_id] = entry
+
+    def pending(self, limit=None):
+        with self._lock:
+            entries = list(self._entries.values())
+        return entries[:limit] if limit else entries
+
+    def read_blob(self, sub_id) -> bytes:
+        with open(self._blob_path(sub_id), "rb") as f:
+            return f.read()
+
+    def ack(self, sub_id):
+        with self._lock:
+            if self._entries.pop(sub_id, None) is None:
+                return
+            self._write({"op": "done", "id": sub_id})
+        try:
+            os.remove(self._blob_path(sub_id))
+        except FileNotFoundError:
+            pass
+
+    def dead_letter(self, sub_id, reason=None):
+        with self._lock:
+            entry = self._entries.pop(sub_id, None)
+            if entry is None:
+                return
+            with open(self._dead_letter_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"entry": entry, "reason": reason}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            # linked before the done record, a crash in between must not leave the entry without its blob
+            dead_path = os.path.join(self._dead_dir, sub_id)
+            if not os.path.exists(dead_path):
+                os.link(self._blob_path(sub_id), dead_path)
+            self._write({"op": "done", "id": sub_id})
+            os.remove(self._blob_path(sub_id))
+
+    def dead_letters(self):
+        if not os.path.exists(self._dead_letter_path):
+            return []
+        with open(self._dead_letter_path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def compact(self):
+        """Rewrites the log with the pending entries only and drops blobs no entry refers to."""
+        with self._lock:
+            tmp_path = self._log_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for entry in self._entries.values():
+                    f.write(json.dumps({"op": "add", "entry": entry}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._log.close()
+            os.replace(tmp_path, self._log_path)
+            self._log = open(self._log_path, "a", encoding="utf-8")
+            # blobs whose log line was never written, the process died in between
+            for name in os.listdir(self._blob_dir):
+                if name not in self._entries:
+                    os.remove(os.path.join(self._blob_dir, name))
+
+    def close(self):
+        with self._lock:
+            self._log.close()
@@ -0,0 +1,228 @@
+import asyncio
+import random
+import time
+from threading import Lock
+from urllib.parse import urlsplit
+
+# statuses worth another try, everything else is returned to the caller as is
+RETRY_STATUSES = frozenset([429, 502, 503, 504])
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending while the breaker of an endpoint is open."""
+
+    def __init__(self, endpoint, retry_after):
+        super().__init__(f"Circuit to {endpoint} is open, retry in {retry_after:.1f}s")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+class RetriesExhausted(Exception):
+    """Raised when a retryable status was still returned after the last attempt."""
+
+    def __init__(self, response):
+        status = getattr(response, "status_code", getattr(response, "status", None))
+        super().__init__(f"Giving up with status {status}")
+        self.response = response
+
+
+def endpoint_key(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}" if parts.netloc else url
+
+
+class CircuitBreaker:
+    """Consecutive failure breaker for one endpoint.
+
+    Opens after ``threshold`` failures in a row.  Once ``reset_timeout`` has passed a single trial
+    call is let through, its outcome closes the breaker or opens it again.
+    """
+
+    def __init__(self, threshold=5, reset_timeout=30):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = Lock()
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return "closed"
+        if self._trial or time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        """Returns 0 when the call may proceed, otherwise the seconds until it may."""
+        with self._lock:
+            if self._opened_at is None:
+                return 0
+            remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+            if remaining > 0 or self._trial:
+                return max(remaining, 0.1)
+            self._trial = True
+            return 0
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def release(self):
+        # the trial ended without telling anything about the endpoint, the next call gets one
+        with self._lock:
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+            self._trial = False
+
+
+class RetryBudget:
+    """Caps retries to a fraction of the calls made.
+
+    Every call deposits ``ratio`` tokens and every retry withdraws one, so retries stay at about
+    ``ratio`` of the traffic when an endpoint degrades instead of multiplying it.  ``min_tokens``
+    lets a quiet agent still retry a few times.
+    """
+
+    def __init__(self, ratio=0.2, min_tokens=10, max_tokens=100):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = float(min_tokens)
+        self._lock = Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    @property
+    def tokens(self):
+        return self._tokens
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, a circuit breaker per endpoint and a shared retry budget.
+
+    One policy is meant to be shared by everything an agent sends, heartbeats, submissions and blob
+    transfers, so that they back off together.
+    """
+
+    def __init__(
+        self,
+        base_delay=0.5,
+        max_delay=60,
+        max_retries=10,
+        budget=None,
+        breaker_threshold=5,
+        breaker_reset=30,
+        retry_statuses=RETRY_STATUSES,
+    ):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retries = max_retries
+        self.budget = budget if budget is not None else RetryBudget()
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        self.retry_statuses = retry_statuses
+        self._breakers = dict()
+        self._lock = Lock()
+
+    def backoff(self, attempt):
+        # full jitter, anywhere between 0 and the exponential ceiling
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+    def breaker(self, endpoint):
+        key = endpoint_key(endpoint)
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = self._breakers[key] = CircuitBreaker(self.breaker_threshold, self.breaker_reset)
+            return breaker
+
+    def _should_retry_response(self, response):
+        return getattr(response, "status_code", getattr(response, "status", None)) in self.retry_statuses
+
+    def _next_delay(self, attempt, breaker, error):
+        breaker.record_failure()
+        if attempt >= self.max_retries or not self.budget.withdraw():
+            raise error
+        return self.backoff(attempt)
+
+    def call(self, func, endpoint, retry_on=(Exception,), should_stop=None, wait_open=False):
+        """Calls ``func()`` until it succeeds, fails with a non retryable error or retries run out.
+
+        A response carrying a retryable status counts as a failure, after the last attempt
+        RetriesExhausted holds it.  While the breaker is open the call fails fast with
+        CircuitOpenError, or with ``wait_open`` sleeps until the breaker lets a trial through.
+        """
+        breaker = self.breaker(endpoint)
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            wait = breaker.allow()
+            if wait:
+                if not wait_open or (should_stop is not None and should_stop()):
+                    raise CircuitOpenError(endpoint_key(endpoint), wait)
+                time.sleep(wait + random.uniform(0, self.base_delay))
+                continue
+            try:
+                result = func()
+            except retry_on as e:
+                error = e
+            except BaseException:
+                # a non retryable error or a cancellation must not keep a half-open trial taken
+                breaker.release()
+                raise
+            else:
+                if not self._should_retry_response(result):
+                    breaker.record_success()
+                    return result
+                error = RetriesExhausted(result)
+            delay = self._next_delay(attempt, breaker, error)
+            if should_stop is not None and should_stop():
+                raise error
+            attempt += 1
+            time.sleep(delay)
+
+    async def acall(self, coro_func, endpoint, retry_on=(Exception,), wait_open=False):
+        """asyncio version of ``call``, ``coro_func()`` returns a new awaitable per attempt."""
+        breaker = self.breaker(endpoint)
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            wait = breaker.allow()
+            if wait:
+                if not wait_open:
+                    raise CircuitOpenError(endpoint_key(endpoint), wait)
+                await asyncio.sleep(wait + random.uniform(0, self.base_delay))
+                continue
+            try:
+                result = await coro_func()
+            except retry_on as e:
+                error = e
+            except BaseException:
+                # a non retryable error or a cancellation must not keep a half-open trial taken
+                breaker.release()
+                raise
+            else:
+                if not self._should_retry_response(result):
+                    breaker.record_success()
+                    return result
+                error = RetriesExhausted(result)
+            delay = self._next_delay(attempt, breaker, error)
+            attempt += 1
+            await asyncio.sleep(delay)
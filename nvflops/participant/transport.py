@@ -0,0 +1,104 @@
+import socket
+from threading import Lock
+
+import certifi
+import urllib3
+from requests import Session
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+
+
+def keepalive_socket_options(idle=60, interval=15, count=4):
+    """TCP keepalive on top of urllib3's defaults, so idle pooled connections survive NAT and proxies."""
+    options = list(HTTPConnection.default_socket_options) + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+    # the per socket tunables are not available everywhere, e.g. macOS lacks TCP_KEEPIDLE
+    for name, value in (("TCP_KEEPIDLE", idle), ("TCP_KEEPINTVL", interval), ("TCP_KEEPCNT", count)):
+        if hasattr(socket, name):
+            options.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+    return options
+
+
+class _PoolAdapter(HTTPAdapter):
+    def __init__(self, socket_options=None, **kwargs):
+        self._socket_options = socket_options
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self._socket_options is not None:
+            kwargs["socket_options"] = self._socket_options
+        return super().init_poolmanager(*args, **kwargs)
+
+
+class Transport:
+    """Connection pools shared by everything an agent sends.
+
+    TrackerAgent, its VitalSignReporter thread and the minio client all go through one transport, so
+    steady state requests reuse pooled keep-alive connections instead of paying a TCP and TLS handshake.
+    """
+
+    def __init__(self, pool_connections=4, pool_maxsize=16, pool_block=False, max_retries=1, keepalive=True):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.max_retries = max_retries
+        self.socket_options = keepalive_socket_options() if keepalive else None
+        self._session = None
+        self._pool_manager = None
+        self._lock = Lock()
+
+    @property
+    def session(self) -> Session:
+        with self._lock:
+            if self._session is None:
+                self._session = Session()
+                adapter = _PoolAdapter(
+                    socket_options=self.socket_options,
+                    pool_connections=self.pool_connections,
+                    pool_maxsize=self.pool_maxsize,
+                    pool_block=self.pool_block,
+                    max_retries=self.max_retries,
+                )
+                self._session.mount("http://", adapter)
+                self._session.mount("https://", adapter)
+            return self._session
+
+    def pool_manager(self, **kwargs):
+        """urllib3 pool for the minio client, sized and kept alive like the session."""
+        with self._lock:
+            if self._pool_manager is None:
+                if self.socket_options is not None:
+                    kwargs.setdefault("socket_options", self.socket_options)
+                # what minio would use on its own
+                kwargs.setdefault("timeout", urllib3.Timeout(connect=300, read=300))
+                kwargs.setdefault("cert_reqs", "CERT_REQUIRED")
+                kwargs.setdefault("ca_certs", certifi.where())
+                self._pool_manager = urllib3.PoolManager(
+                    num_pools=self.pool_connections,
+                    maxsize=self.pool_maxsize,
+                    block=self.pool_block,
+                    retries=urllib3.Retry(total=self.max_retries, backoff_factor=0.2),
+                    **kwargs,
+                )
+            return self._pool_manager
+
+    def set_secure_context(self, ca_path, cert_path="", prv_key_path=""):
+        session = self.session
+        session.verify = ca_path
+        if cert_path:
+            session.cert = (cert_path, prv_key_path)
+
+    def reset_connections(self):
+        # pooled connections were handshaked with the previous certificate
+        with self._lock:
+            if self._session is not None:
+                for adapter in self._session.adapters.values():
+                    adapter.close()
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+            if self._pool_manager is not None:
+                self._pool_manager.clear()
+                self._pool_manager = None
@@ -1,27 +1,22 @@
-from datetime import datetime
-
 from flask import Flask
 from flask.json import JSONEncoder
 from flask_sqlalchemy import SQLAlchemy
 
+from .blob import BlobStore
 from .config import config
+from .serializer import serialize
 
 db = SQLAlchemy()
+blob_store = BlobStore()
 
 
 class CustomJSONEncoder(JSONEncoder):
+    # for jsonify outside the API blueprints, which encode through wire.dumps
     def default(self, obj):
         try:
-            if isinstance(obj, datetime):
-                return obj.isoformat()
-            if isinstance(obj, db.Model):
-                return obj.asdict()
-            iterable = iter(obj)
+            return serialize(obj)
         except TypeError:
-            pass
-        else:
-            return list(iterable)
-        return JSONEncoder.default(self, obj)
+            return JSONEncoder.default(self, obj)
 
 
 def create_app(config_name):
@@ -31,11 +26,63 @@ def create_app(config_name):
     app.config.from_pyfile("./config.py")
     app.json_encoder = CustomJSONEncoder
     db.init_app(app)
+    blob_store.init_app(app)
+    from .caches import chain_cache, crl_cache, identity_cache, issuer_cache
+
+    crl_cache.valid_days = app.config["CRL_VALID_DAYS"]
+    issuer_cache.max_size = app.config["ISSUER_CACHE_SIZE"]
+    chain_cache.max_size = app.config["CHAIN_CACHE_SIZE"]
+    chain_cache.negative_ttl = app.config["CHAIN_NEGATIVE_TTL"]
+    identity_cache.max_size = app.config["IDENTITY_CACHE_SIZE"]
+    identity_cache.ttl = app.config["IDENTITY_CACHE_TTL"]
+    from .heartbeat import heartbeat_pacer
+
+    heartbeat_pacer.interval = app.config["HEARTBEAT_INTERVAL"]
+    heartbeat_pacer.idle_interval = app.config["HEARTBEAT_IDLE_INTERVAL"]
+    heartbeat_pacer.fast_interval = app.config["HEARTBEAT_FAST_INTERVAL"]
+    heartbeat_pacer.transition_window = app.config["HEARTBEAT_TRANSITION_WINDOW"]
+    heartbeat_pacer.target_rate = app.config["HEARTBEAT_TARGET_RATE"]
+    if app.config.get("TRACKER_MASTER_KEY"):
+        issuer_cache.password = app.config["TRACKER_MASTER_KEY"].encode("utf-8")
+    from .compression import compress_response
+
+    app.after_request(compress_response)
     with app.app_context():
-        from .apis import admin, routine, s3, submission
+        from .apis import admin, crl, routine, s3, submission
 
         app.register_blueprint(submission)
         app.register_blueprint(admin)
         app.register_blueprint(s3)
         app.register_blueprint(routine)
+        app.register_blueprint(crl)
+    if app.config.get("KEY_POOL_SIZE"):
+        from ..utils.cert_utils import SimpleCert
+        from ..utils.key_pool import KeyPool
+
+        SimpleCert.key_pool = KeyPool(
+            app.config["KEY_POOL_SIZE"],
+            key_type=app.config["KEY_POOL_KEY_TYPE"],
+            max_workers=app.config["KEY_POOL_WORKERS"],
+        ).start()
+    if app.config.get("RECONCILE_INTERVAL"):
+        from .workflow.reconciler import UploadReconciler
+
+        app.reconciler = UploadReconciler(
+            app,
+            app.config["RECONCILE_INTERVAL"],
+            grace=app.config["RECONCILE_GRACE"],
+            page_size=app.config["RECONCILE_PAGE_SIZE"],
+        )
+        app.reconciler.start()
+    if app.config.get("ROTATION_INTERVAL"):
+        from .workflow.rotation import CertRotator
+
+        app.rotator = CertRotator(
+            app,
+            app.config["ROTATION_INTERVAL"],
+            window_days=app.config["ROTATION_WINDOW_DAYS"],
+            batch_size=app.config["ROTATION_BATCH_SIZE"],
+            roles=app.config["ROTATION_ROLES"],
+        )
+        app.rotator.start()
     return app
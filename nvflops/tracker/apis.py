@@ -1,19 +1,36 @@
-from flask import Blueprint, jsonify, request
+import io
+import zipfile
 
+from flask import Blueprint, Response, abort, current_app, request, send_file
+
+from ..utils.cert_utils import REVOKE_REASONS
+from ..utils.wire import JSON_MIME, MSGPACK_MIME, available_formats, dumps, loads, mimetype_of
+from . import blob_store
+from .blob import blob_ids_from_events
+from .caches import chain_cache, crl_cache, identity_cache
+from .compression import inflate
+from .heartbeat import heartbeat_pacer
 from .managers import (
     CertAdm,
+    ExpAdm,
     PlanAdm,
     StudyAdm,
-    ExpAdm,
     SubmissionManager,
     SystemManager,
     VitalSignManager,
+    get_pct_id,
+    unwrap_key,
 )
+from .serializer import serialize
+from .workflow.gc import BlobCollector
+from .workflow.reconciler import UploadReconciler
+from .workflow.rotation import CertRotator
 
 submission = Blueprint("submission", __name__, url_prefix="/api/v1/submission")
 s3 = Blueprint("s3", __name__, url_prefix="/api/v1/s3")
 admin = Blueprint("admin", __name__, url_prefix="/api/v1/admin")
 routine = Blueprint("routine", __name__, url_prefix="/api/v1/routine")
+crl = Blueprint("crl", __name__, url_prefix="/api/v1/crl")
 
 
 def get_mandatory_headers(headers):
@@ -29,45 +46,196 @@ def get_mandatory_headers(headers):
     return (project, study, pct)
 
 
+def get_client_fingerprint(req):
+    # Set by the fronting nginx ($ssl_client_fingerprint) or nvflops.tracker.worker.ClientAuthWorker.
+    # Both overwrite the header, so it is only trusted when the tracker is deployed behind them.
+    if not current_app.config["TRUST_FINGERPRINT_HEADER"]:
+        return None
+    fingerprint = req.headers.get(current_app.config["FINGERPRINT_HEADER"])
+    if not fingerprint:
+        return None
+    return fingerprint.replace(":", "").lower()
+
+
+def get_request_json(req):
+    # batched uploads arrive compressed, agents may send msgpack instead of JSON
+    mimetype = mimetype_of(req.headers.get("Content-Type"))
+    if mimetype == MSGPACK_MIME and mimetype not in available_formats():
+        abort(415)
+    encoding = req.headers.get("Content-Encoding")
+    if not encoding or encoding == "identity":
+        data = req.get_data()
+        # an empty body is no body, newer Flask would answer 415 for its missing Content-Type
+        if mimetype != MSGPACK_MIME:
+            return req.json if data else None
+    else:
+        max_size = current_app.config["MAX_DECOMPRESSED_SIZE"]
+        try:
+            data = inflate(req.get_data(), encoding, max_size)
+        except ValueError:
+            abort(400)
+        except LookupError:
+            abort(415)
+        if len(data) > max_size:
+            abort(413)
+    if not data:
+        return None
+    try:
+        return loads(data, MSGPACK_MIME if mimetype == MSGPACK_MIME else JSON_MIME)
+    except ValueError:
+        abort(400)
+
+
+def make_wire_response(req, payload):
+    # JSON unless the caller asks for msgpack, plain browsers and curl keep getting JSON
+    mimetype = req.accept_mimetypes.best_match(available_formats(), default=JSON_MIME)
+    return Response(dumps(payload, mimetype, default=serialize), mimetype=mimetype)
+
+
+def get_identity(req):
+    """Returns the key tuple and, for certificate clients, the participant id the identity cache holds."""
+    fingerprint = get_client_fingerprint(req)
+    if fingerprint is None:
+        if current_app.config["REQUIRE_CLIENT_CERT"]:
+            return None, None
+        return get_mandatory_headers(req.headers), None
+    if current_app.config["VERIFY_CLIENT_CHAIN"] and not chain_cache.verify(fingerprint):
+        return None, None
+    identity = identity_cache.get(fingerprint)
+    if identity is None:
+        return None, None
+    study = req.headers.get("X-Study")
+    if not study:
+        return None, None
+    return (identity.project, study, identity.pct), identity.pct_id
+
+
+def get_key_tuple(req):
+    return get_identity(req)[0]
+
+
+def is_part(part):
+    # one entry of the ETag list an agent reports after a presigned multipart upload
+    return isinstance(part, dict) and isinstance(part.get("part_number"), int) and isinstance(part.get("etag"), str)
+
+
 @submission.route("", methods=["GET", "POST"])
 def submit():
-    key_tuple = get_mandatory_headers(request.header)
+    key_tuple, pct_id = get_identity(request)
     if not key_tuple:
-        return jsonify({"status": "error"})
+        return make_wire_response(request, {"status": "error"})
     if request.method == "GET":
-        return jsonify({"status": "success", "submission_list": SubmissionManager.get_all(*key_tuple)})
-    req = request.json
-    result = SubmissionManager.store_new_entry(*key_tuple, **req)
+        submission_list = SubmissionManager.get_all(request.args.get("experiment"), *key_tuple)
+        if submission_list is None:
+            return make_wire_response(request, {"status": "error"})
+        return make_wire_response(request, {"status": "success", "submission_list": submission_list})
+    req = get_request_json(request) or {}
+    if not isinstance(req, dict):
+        abort(400)
+    exp_name = req.pop("experiment", None)
+    presign = req.pop("presign", False)
+    blob_size = req.pop("blob_size", 0)
+    # from the identity, never from the body
+    req["pct_id"] = pct_id
+    result = SubmissionManager.insert_entry(exp_name, *key_tuple, **req)
     if result is None:
-        return jsonify({"status": "error"})
-    return jsonify({"status": "success", "submission": result})
+        return make_wire_response(request, {"status": "error"})
+    if presign:
+        upload = blob_store.presign_upload(result, blob_size)
+        return make_wire_response(request, {"status": "success", "submission": result, "upload": upload})
+    return make_wire_response(request, {"status": "success", "submission": result})
+
+
+@submission.route("/batch", methods=["POST"])
+def submit_batch():
+    key_tuple, pct_id = get_identity(request)
+    if not key_tuple:
+        return make_wire_response(request, {"status": "error"})
+    req = get_request_json(request) or {}
+    if not isinstance(req, dict):
+        abort(400)
+    submission_list = req.get("submission_list", [])
+    if not isinstance(submission_list, list) or not all(isinstance(entry, dict) for entry in submission_list):
+        abort(400)
+    if len(submission_list) > current_app.config["SUBMISSION_MAX_BATCH"]:
+        abort(413)
+    blob_size_list = [entry.pop("blob_size", 0) for entry in submission_list]
+    result = SubmissionManager.insert_batch(
+        req.get("experiment"), *key_tuple, pct_id=pct_id, submission_list=submission_list
+    )
+    if result is None:
+        return make_wire_response(request, {"status": "error"})
+    accepted, rejected = result
+    result_list = [{"submission": _sub} for _sub in accepted]
+    if req.get("presign"):
+        for item, blob_size in zip(result_list, blob_size_list):
+            if item["submission"].state != "uploaded":
+                item["upload"] = blob_store.presign_upload(item["submission"], blob_size)
+    return make_wire_response(request, {"status": "success", "submission_list": result_list, "rejected": rejected})
+
+
+@submission.route("/<sub_id>/blob", methods=["POST"])
+def complete_blob(sub_id):
+    key_tuple, pct_id = get_identity(request)
+    if not key_tuple:
+        return make_wire_response(request, {"status": "error"})
+    req = get_request_json(request) or {}
+    upload_id = req.get("upload_id") if isinstance(req, dict) else None
+    parts = req.get("parts", []) if upload_id else None
+    if not upload_id or not isinstance(parts, list) or not all(is_part(p) for p in parts):
+        abort(400)
+    _sub = SubmissionManager.get(sub_id)
+    # only the participant that registered the submission may complete its upload
+    if _sub is None or _sub.pct_id != get_pct_id(pct_id, *key_tuple):
+        return make_wire_response(request, {"status": "error"})
+    if not blob_store.complete_upload(_sub.blob_id, upload_id, parts):
+        return make_wire_response(request, {"status": "error"})
+    SubmissionManager.update_state(_sub.blob_id, "uploaded")
+    return make_wire_response(request, {"status": "success"})
+
+
+@submission.route("/blob/<blob_id>")
+def get_blob_url(blob_id):
+    key_tuple, pct_id = get_identity(request)
+    if not key_tuple:
+        return make_wire_response(request, {"status": "error"})
+    _sub = SubmissionManager.get_by_blob_id(blob_id)
+    if _sub is None or not SubmissionManager.can_read(_sub, get_pct_id(pct_id, *key_tuple)):
+        return make_wire_response(request, {"status": "error"})
+    return make_wire_response(request, {"status": "success", "download": blob_store.presign_download(_sub)})
 
 
 @submission.route("/<sub_id>/custom_field")
 def get_custom_field(sub_id):
     custom_field = SubmissionManager.get_custom_field(sub_id)
-    return jsonify({"status": "success", "custom_field": custom_field})
+    return make_wire_response(request, {"status": "success", "custom_field": custom_field})
 
 
 @submission.route("/<sub_id>/parent")
 def parents(sub_id):
     parent_list = SubmissionManager.get_parents(sub_id)
-    return jsonify({"status": "success", "parent_list": parent_list})
+    if parent_list is None:
+        return make_wire_response(request, {"status": "error"})
+    return make_wire_response(request, {"status": "success", "parent_list": parent_list})
 
 
 @submission.route("/<sub_id>/child")
 def children(sub_id):
     child_list = SubmissionManager.get_children(sub_id)
-    return jsonify({"status": "success", "child_list": child_list})
+    if child_list is None:
+        return make_wire_response(request, {"status": "error"})
+    return make_wire_response(request, {"status": "success", "child_list": child_list})
 
 
 @submission.route("/root")
 def get_root():
-    req = request.json
-    result = SubmissionManager.get_root(**req)
+    key_tuple = get_key_tuple(request)
+    if not key_tuple:
+        return make_wire_response(request, {"status": "error"})
+    result = SubmissionManager.get_root((get_request_json(request) or {}).get("experiment"), *key_tuple)
     if result is None:
-        return jsonify({"status": "error"})
-    return jsonify({"status": "success", "submission": result})
+        return make_wire_response(request, {"status": "error"})
+    return make_wire_response(request, {"status": "success", "submission": result})
 
 
 @admin.route("/provision", methods=["POST"])
@@ -75,30 +243,131 @@ def provision():
     req = request.json
     issuer = req.pop("issuer", None)
     subject = req.pop("subject", "")
-    result = CertManager.store_new_entry(issuer, subject, **req)
+    req.setdefault("valid_days", current_app.config["CERT_VALID_DAYS"])
+    result = CertAdm.store_new_entry(issuer, subject, **req)
     if result is None:
-        return jsonify({"status": "error"})
-    return jsonify(
+        return make_wire_response(request, {"status": "error"})
+    return make_wire_response(
+        request,
         {
             "status": "success",
-            "certificate": {"cert": result.s_crt.decode("utf-8"), "key": result.s_prv.decode("utf-8")},
-        }
+            "certificate": {"cert": result.s_crt.decode("utf-8"), "key": unwrap_key(result).decode("utf-8")},
+        },
     )
 
 
+@admin.route("/reconcile", methods=["POST"])
+def reconcile():
+    req = request.get_json(silent=True) or {}
+    if not isinstance(req, dict):
+        abort(400)
+    config = current_app.config
+    result = UploadReconciler.reconcile_once(
+        grace=req.get("grace", config["RECONCILE_GRACE"]), page_size=config["RECONCILE_PAGE_SIZE"]
+    )
+    return make_wire_response(request, {"status": "success", "result": result})
+
+
+@admin.route("/gc", methods=["POST"])
+def collect_garbage():
+    req = request.get_json(silent=True) or {}
+    if not isinstance(req, dict):
+        abort(400)
+    config = current_app.config
+    report = BlobCollector.collect(
+        dry_run=req.get("dry_run", True),
+        grace=req.get("grace", config["GC_GRACE"]),
+        registered_ttl=req.get("registered_ttl", config["GC_REGISTERED_TTL"]),
+        batch_size=config["GC_BATCH_SIZE"],
+    )
+    return make_wire_response(request, {"status": "success", "report": report})
+
+
+@admin.route("/provision/batch", methods=["POST"])
+def provision_batch():
+    req = request.json
+    issuer = req.pop("issuer", None)
+    subject_list = req.pop("subjects", [])
+    req.setdefault("valid_days", current_app.config["CERT_VALID_DAYS"])
+    result = CertAdm.store_new_batch(issuer, subject_list, max_workers=current_app.config["PROVISION_WORKERS"], **req)
+    if result is None:
+        return make_wire_response(request, {"status": "error"})
+    _issuer, cert_list = result
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(f"{_issuer.subject}.cert.pem", _issuer.s_crt)
+        for cert in cert_list:
+            zf.writestr(f"{cert.subject}.cert.pem", cert.s_crt)
+            zf.writestr(f"{cert.subject}.key.pem", unwrap_key(cert))
+    archive.seek(0)
+    return send_file(archive, mimetype="application/zip", as_attachment=True, download_name=f"{issuer}_certs.zip")
+
+
+@admin.route("/revoke", methods=["POST"])
+def revoke():
+    req = request.json
+    reason = req.get("reason", "unspecified")
+    # stored as is and read back for every CRL, an unknown one would break them all
+    if reason not in REVOKE_REASONS:
+        return make_wire_response(request, {"status": "error"})
+    result = CertAdm.revoke(subject=req.get("subject"), fingerprint=req.get("fingerprint"), reason=reason)
+    if result is None:
+        return make_wire_response(request, {"status": "error"})
+    return make_wire_response(request, {"status": "success", "revoked": [c.fingerprint for c in result]})
+
+
+@admin.route("/rotate", methods=["POST"])
+def rotate():
+    req = request.get_json(silent=True) or {}
+    if not isinstance(req, dict):
+        abort(400)
+    config = current_app.config
+    renewed = CertRotator.rotate_once(
+        window_days=req.get("window_days", config["ROTATION_WINDOW_DAYS"]),
+        batch_size=config["ROTATION_BATCH_SIZE"],
+        roles=req.get("roles", config["ROTATION_ROLES"]),
+        valid_days=config["CERT_VALID_DAYS"],
+    )
+    return make_wire_response(request, {"status": "success", "renewed": renewed})
+
+
+EXPORT_MIMETYPES = {
+    "pem": "application/x-pem-file",
+    "key": "application/x-pem-file",
+    "chain": "application/x-pem-file",
+    "der": "application/pkix-cert",
+    "pkcs12": "application/x-pkcs12",
+}
+
+
+@admin.route("/cert/<subject>/<fmt>")
+def export_cert(subject, fmt):
+    if fmt not in EXPORT_MIMETYPES:
+        return make_wire_response(request, {"status": "error"})
+    result = CertAdm.export(subject, fmt)
+    if result is None:
+        return make_wire_response(request, {"status": "error"})
+    return Response(result, mimetype=EXPORT_MIMETYPES[fmt])
+
+
+@admin.route("/wrap_keys", methods=["POST"])
+def wrap_keys():
+    return make_wire_response(request, {"status": "success", "wrapped": CertAdm.wrap_all()})
+
+
 @admin.route("/refresh")
 def refresh():
     SystemManager.init_backend()
-    return jsonify({"status": "success"})
+    return make_wire_response(request, {"status": "success"})
 
 
 @admin.route("/plan", methods=["POST"])
 def add_plan():
-    req = request.json
+    req = get_request_json(request)
     result = PlanManager.store_new_entry(**req)
     if result is None:
-        return jsonify({"status": "error"})
-    return jsonify({"status": "success", "plan": result})
+        return make_wire_response(request, {"status": "error"})
+    return make_wire_response(request, {"status": "success", "plan": result})
 
 
 @admin.route("/seed", methods=["POST"])
@@ -109,8 +378,8 @@ def seed():
     participants = req.get("participants")
     result = SeedManager.store_new_entry(project=project, study=study, participants=participants)
     if result is None:
-        return jsonify({"status": "error"})
-    return jsonify({"status": "success", "project": result})
+        return make_wire_response(request, {"status": "error"})
+    return make_wire_response(request, {"status": "success", "project": result})
 
 
 @admin.route("/study", methods=["POST"])
@@ -118,45 +387,111 @@ def add_study():
     headers = request.headers
     project = headers.get("X-Project")
     if not project:
-        return jsonify({"status": "error"})
+        return make_wire_response(request, {"status": "error"})
     req = request.json
     result = StudyManager.new_entry(project=project, **req)
     if result is None:
-        return jsonify({"status": "error"})
-    return jsonify({"status": "success", "study": result})
+        return make_wire_response(request, {"status": "error"})
+    return make_wire_response(request, {"status": "success", "study": result})
 
 
 @routine.route("/vital_sign", methods=["POST"])
 def vital_sign():
-    headers = request.headers
-    project = headers.get("X-Project")
-    if not project:
-        return jsonify({"status": "error"})
-    study = headers.get("X-Study")
-    if not study:
-        return jsonify({"status": "error"})
-    pct = headers.get("X-Pct")
-    if not pct:
-        return jsonify({"status": "error"})
-    req = request.json
-    key_tuple = (
-        project,
-        study,
-        pct,
-    )
-    result = VitalSignManager.insert_entry(*key_tuple, **req)
+    key_tuple, pct_id = get_identity(request)
+    if not key_tuple:
+        return make_wire_response(request, {"status": "error"})
+    project, study, pct = key_tuple
+    req = get_request_json(request)
+    if not isinstance(req, dict):
+        abort(400)
+    heartbeat_pacer.observe()
+    try:
+        if "vital_sign_list" in req:
+            vital_sign_list = req["vital_sign_list"]
+            if not isinstance(vital_sign_list, list) or not all(isinstance(s, dict) for s in vital_sign_list):
+                abort(400)
+            result = VitalSignManager.insert_batch(
+                *key_tuple,
+                pct_id=pct_id,
+                vital_sign_list=vital_sign_list,
+                max_batch=current_app.config["VITAL_SIGN_MAX_BATCH"],
+            )
+        else:
+            req["pct_id"] = pct_id
+            result = VitalSignManager.insert_entry(*key_tuple, **req)
+    except ValueError:
+        abort(400)
     if result is None:
-        return jsonify({"status": "error"})
+        return make_wire_response(request, {"status": "error"})
     exp = ExpAdm.get_current_exp(study, pct)
-    result = PlanAdm.get_current_plan(exp.name, study_name=study, project_name=project)
+    result = PlanAdm.get_current_plan(exp.name, study_name=study, project_name=project) if exp else None
+    heartbeat_interval = heartbeat_pacer.next_interval(result)
     if result is None:
-        return jsonify({"status": "error", "plan": None})
-    return jsonify({"status": "success", "plan": result})
+        return make_wire_response(request, {"status": "error", "plan": None, "heartbeat_interval": heartbeat_interval})
+    return make_wire_response(request, {"status": "success", "plan": result, "heartbeat_interval": heartbeat_interval})
+
+
+@routine.route("/credential")
+def credential():
+    # only a caller authenticated by its certificate can pick up the renewal of that certificate
+    fingerprint = get_client_fingerprint(request)
+    if fingerprint is None:
+        return make_wire_response(request, {"status": "error"})
+    _cert = CertAdm.get_latest(fingerprint)
+    if _cert is None:
+        return make_wire_response(request, {"status": "error"})
+    if _cert.fingerprint == fingerprint:
+        return make_wire_response(request, {"status": "success", "certificate": None})
+    return make_wire_response(
+        request,
+        {
+            "status": "success",
+            "certificate": {
+                "cert": _cert.s_crt.decode("utf-8"),
+                "key": unwrap_key(_cert).decode("utf-8"),
+                "not_valid_after": _cert.not_valid_after,
+            },
+        },
+    )
+
+
+# an upload landing after the GC gave up on its submission revives it, see BlobCollector
+LATE_UPLOAD_STATES = ("registered", "aborted")
 
 
 @s3.route("", methods=["POST"])
 def s3_done():
-    req = request.json
-    blob_id = req.get("Key").split("/")[1]
-    SubmissionManager.update_state(blob_id, "uploaded")
-    return jsonify({"status": "success"})
+    req = request.get_json(silent=True)
+    if not isinstance(req, dict):
+        abort(400)
+    blob_id_list = blob_ids_from_events([req])
+    SubmissionManager.update_state_bulk(blob_id_list, "uploaded", from_state=LATE_UPLOAD_STATES)
+    return make_wire_response(request, {"status": "success"})
+
+
+@s3.route("/batch", methods=["POST"])
+def s3_batch_done():
+    req = request.get_json(silent=True)
+    events = req if isinstance(req, list) else req.get("events") if isinstance(req, dict) else None
+    if not isinstance(events, list) or not all(isinstance(event, dict) for event in events):
+        abort(400)
+    blob_id_list = blob_ids_from_events(events)
+    updated = SubmissionManager.update_state_bulk(blob_id_list, "uploaded", from_state=LATE_UPLOAD_STATES)
+    return make_wire_response(request, {"status": "success", "received": len(blob_id_list), "updated": updated})
+
+
+@crl.route("/<issuer>")
+def get_crl(issuer):
+    encoding = request.args.get("format", "pem")
+    result = crl_cache.get(issuer, encoding=encoding)
+    if result is None:
+        return make_wire_response(request, {"status": "error"})
+    mimetype = "application/pkix-crl" if encoding == "der" else "application/x-pem-file"
+    return Response(result, mimetype=mimetype)
+
+
+@crl.route("/status/<fingerprint>")
+def cert_status(fingerprint):
+    return make_wire_response(
+        request, {"status": "success", "certificate": CertAdm.get_status(fingerprint.replace(":", "").lower())}
+    )
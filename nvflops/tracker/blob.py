@@ -0,0 +1,141 @@
+import math
+from datetime import datetime, timedelta
+from urllib.parse import unquote_plus
+
+import minio
+from minio.datatypes import Part
+from minio.deleteobjects import DeleteObject
+from minio.error import S3Error
+
+from ..participant.codec import CODEC_METADATA_KEY
+from ..participant.delta import BASE_METADATA_KEY
+
+
+class BlobStore:
+    """Tracker side access to the blob bucket.
+
+    Agents in presigned mode never talk to the S3 API themselves.  The tracker opens a multipart
+    upload per submission, hands out one presigned PUT URL per part and completes the upload once
+    the agent reports the part ETags.  Because the tracker creates the upload, it also attaches the
+    codec and delta base to the object metadata.
+    """
+
+    def __init__(self, app=None):
+        self._client = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.bucket_name = app.config["BLOB_BUCKET"]
+        self.part_size = app.config["BLOB_PART_SIZE"]
+        self.url_expiry = timedelta(seconds=app.config["BLOB_URL_EXPIRY"])
+        self._end_point = app.config["BLOB_END_POINT"]
+        self._access_key = app.config["BLOB_ACCESS_KEY"]
+        self._secret_key = app.config["BLOB_SECRET_KEY"]
+        self._secure = app.config["BLOB_SECURE"]
+        self._region = app.config["BLOB_REGION"]
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = minio.Minio(
+                self._end_point,
+                access_key=self._access_key,
+                secret_key=self._secret_key,
+                secure=self._secure,
+                region=self._region,
+            )
+        return self._client
+
+    def _expires_at(self):
+        return (datetime.utcnow() + self.url_expiry).isoformat()
+
+    def presign_upload(self, submission, blob_size):
+        metadata = {"x-amz-meta-" + CODEC_METADATA_KEY: submission.codec}
+        if submission.base_blob_id:
+            metadata["x-amz-meta-" + BASE_METADATA_KEY] = submission.base_blob_id
+        upload_id = self.client._create_multipart_upload(self.bucket_name, submission.blob_id, metadata)
+        part_count = max(1, math.ceil(blob_size / self.part_size))
+        urls = [
+            self.client.get_presigned_url(
+                "PUT",
+                self.bucket_name,
+                submission.blob_id,
+                expires=self.url_expiry,
+                extra_query_params={"partNumber": str(part_number), "uploadId": upload_id},
+            )
+            for part_number in range(1, part_count + 1)
+        ]
+        return {"upload_id": upload_id, "part_size": self.part_size, "urls": urls, "expires": self._expires_at()}
+
+    def complete_upload(self, blob_id, upload_id, parts):
+        """Completes a multipart upload, returns False after aborting it when S3 refuses the parts."""
+        part_list = [
+            Part(p["part_number"], p["etag"].strip('"')) for p in sorted(parts, key=lambda p: p["part_number"])
+        ]
+        try:
+            self.client._complete_multipart_upload(self.bucket_name, blob_id, upload_id, part_list)
+        except S3Error:
+            # the uploaded parts would otherwise be stored, and billed, until a lifecycle rule drops them
+            try:
+                self.abort_upload(blob_id, upload_id)
+            except S3Error:
+                pass
+            return False
+        return True
+
+    def abort_upload(self, blob_id, upload_id):
+        self.client._abort_multipart_upload(self.bucket_name, blob_id, upload_id)
+
+    def list_pages(self, page_size=1000, start_after=None):
+        page = list()
+        for obj in self.client.list_objects(self.bucket_name, recursive=True, start_after=start_after):
+            page.append(obj)
+            if len(page) >= page_size:
+                yield page
+                page = list()
+        if page:
+            yield page
+
+    def exists(self, blob_id):
+        try:
+            self.client.stat_object(self.bucket_name, blob_id)
+        except S3Error as e:
+            if e.code in ("NoSuchKey", "NoSuchObject"):
+                return False
+            raise
+        return True
+
+    def remove(self, blob_id_list):
+        errors = self.client.remove_objects(self.bucket_name, [DeleteObject(blob_id) for blob_id in blob_id_list])
+        # remove_objects is lazy, errors must be consumed for the deletion to happen
+        return [error.name for error in errors]
+
+    def presign_download(self, submission):
+        url = self.client.presigned_get_object(self.bucket_name, submission.blob_id, expires=self.url_expiry)
+        return {
+            "url": url,
+            "codec": submission.codec,
+            "base_blob_id": submission.base_blob_id,
+            "expires": self._expires_at(),
+        }
+
+
+def blob_ids_from_events(events):
+    """Extract object names of created objects from minio/S3 bucket notifications."""
+    blob_ids = list()
+    for event in events:
+        records = event.get("Records")
+        if records:
+            for record in records:
+                if not isinstance(record, dict):
+                    continue
+                if not record.get("eventName", "s3:ObjectCreated").startswith("s3:ObjectCreated"):
+                    continue
+                key = record.get("s3", {}).get("object", {}).get("key")
+                if key:
+                    blob_ids.append(unquote_plus(key))
+        elif event.get("Key") and event.get("EventName", "s3:ObjectCreated").startswith("s3:ObjectCreated"):
+            # minio webhook shortcut, Key is bucket/object
+            blob_ids.append(event.get("Key").split("/", 1)[-1])
+    return list(dict.fromkeys(blob_ids))
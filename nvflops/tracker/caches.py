@@ -0,0 +1,244 @@
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta
+from threading import Lock
+
+from cryptography.hazmat.primitives import hashes, serialization
+
+from ..utils.cert_utils import SimpleCert, build_crl, build_revoked_cert, load_pem_chain, verify_chain
+from . import db
+from .models import Participant, Project
+
+Identity = namedtuple("Identity", ["project", "pct", "pct_id"])
+
+
+class IssuerCache:
+    """Deserialized issuer SimpleCert objects, keyed by certificate fingerprint.
+
+    Parsing the PEM certificate and unwrapping the encrypted private key of a CA costs far more
+    than reading its row, so CertAdm reads the row and only parses it on a miss.  The cache is
+    bounded, unwrapped keys only live in memory for the CAs that are actually signing.  A rotated
+    issuer has a new fingerprint and therefore misses naturally; ``invalidate`` drops the stale
+    entries early.
+    """
+
+    def __init__(self, max_size=128):
+        self.max_size = max_size
+        self.password = None
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    @staticmethod
+    def _key(cert_row):
+        return cert_row.fingerprint or f"id:{cert_row.id}"
+
+    def get(self, cert_row):
+        key = self._key(cert_row)
+        with self._lock:
+            sc = self._entries.get(key)
+            if sc is not None:
+                self._entries.move_to_end(key)
+                return sc
+        sc = SimpleCert(cert_row.subject, s_crt=cert_row.s_crt, s_prv=cert_row.s_prv, password=self.password)
+        # children append this chain to their own certificate
+        sc.s_chain = cert_row.s_chain
+        with self._lock:
+            self._entries[key] = sc
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return sc
+
+    def invalidate(self, subject=None):
+        with self._lock:
+            if subject is None:
+                self._entries.clear()
+                return
+            for key in [k for k, sc in self._entries.items() if sc.subject == subject]:
+                del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class IdentityCache:
+    """Maps client certificate fingerprints to the participant they were issued to.
+
+    An entry remembers the certificate it was resolved through, a renewed certificate keeps
+    identifying its participant via its successor.  Revoking or renewing either one drops the
+    entry, see ``invalidate``.  Entries expire after ``ttl`` seconds so that changes made outside
+    CertAdm are picked up, and the least recently used are evicted beyond ``max_size``.
+    """
+
+    def __init__(self, max_size=10000, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, fingerprint):
+        now = datetime.utcnow()
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is not None:
+                identity, _, expires_at = entry
+                if now < expires_at:
+                    self._entries.move_to_end(fingerprint)
+                    return identity
+                del self._entries[fingerprint]
+        from .managers import CertAdm
+
+        # a renewed certificate keeps identifying its participant until it expires
+        _cert = CertAdm.get_latest(fingerprint)
+        if _cert is None:
+            return None
+        row = (
+            db.session.query(Project.name, Participant.name, Participant.id)
+            .select_from(Project)
+            .join(Participant, Participant.project_id == Project.id)
+            .filter(Participant.cert_id == _cert.id)
+            .first()
+        )
+        if row is None:
+            return None
+        identity = Identity(*row)
+        with self._lock:
+            self._entries[fingerprint] = (identity, _cert.fingerprint, now + timedelta(seconds=self.ttl))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return identity
+
+    def invalidate(self, fingerprint=None):
+        with self._lock:
+            if fingerprint is None:
+                self._entries.clear()
+                return
+            for key in [k for k, e in self._entries.items() if fingerprint in (k, e[1])]:
+                del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class _IssuerCrl:
+    def __init__(self):
+        self.revoked_cert_list = list()
+        self.watermark = (0, None)
+        self.pem = None
+        self.der = None
+        self.refresh_after = None
+
+
+class CrlCache:
+    """Signed CRL bytes per issuer, rebuilt incrementally.
+
+    Each revoked entry is built once and kept.  A cheap count/max query detects new revocations,
+    which are appended before the CRL is signed again.  Otherwise the cached bytes are served
+    until half of the CRL validity has passed.
+    """
+
+    def __init__(self, valid_days=7):
+        self.valid_days = valid_days
+        self._entries = dict()
+        self._lock = Lock()
+
+    def get(self, issuer, encoding="pem"):
+        from .managers import CertAdm
+
+        with self._lock:
+            entry = self._entries.setdefault(issuer, _IssuerCrl())
+            watermark = CertAdm.get_revocation_watermark(issuer)
+            changed = watermark != entry.watermark
+            if changed:
+                since = entry.watermark[1] if entry.watermark[0] else None
+                for _cert in CertAdm.get_revoked(issuer, since=since):
+                    entry.revoked_cert_list.append(
+                        build_revoked_cert(
+                            int(_cert.serial_number, 16), _cert.revoked_at, _cert.revocation_reason or "unspecified"
+                        )
+                    )
+                entry.watermark = watermark
+            if changed or entry.der is None or datetime.utcnow() > entry.refresh_after:
+                _issuer = CertAdm.get_cert(subject=issuer)
+                if _issuer is None:
+                    return None
+                crl = build_crl(issuer_cache.get(_issuer), entry.revoked_cert_list, int(time.time()), self.valid_days)
+                entry.pem = crl.public_bytes(serialization.Encoding.PEM)
+                entry.der = crl.public_bytes(serialization.Encoding.DER)
+                entry.refresh_after = datetime.utcnow() + timedelta(days=self.valid_days / 2)
+            return entry.der if encoding == "der" else entry.pem
+
+    def invalidate(self, issuer=None):
+        with self._lock:
+            if issuer is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(issuer, None)
+
+
+class ChainCache:
+    """Client chain verification results, keyed by leaf certificate fingerprint.
+
+    A verified chain stays valid until its earliest expiry, so a request only pays a dict lookup
+    once its certificate has been checked.  Failures are kept for ``negative_ttl`` seconds to stop
+    a bad client from forcing a signature check per request.  Revocations clear the cache.
+    """
+
+    def __init__(self, max_size=10000, negative_ttl=60):
+        self.max_size = max_size
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def verify(self, fingerprint):
+        now = datetime.utcnow()
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is not None:
+                valid, expires_at = entry
+                if now < expires_at:
+                    self._entries.move_to_end(fingerprint)
+                    return valid
+                del self._entries[fingerprint]
+        try:
+            expires_at = self._verify(fingerprint, now)
+            valid = expires_at is not None
+        except Exception:
+            valid = False
+        if not valid:
+            expires_at = now + timedelta(seconds=self.negative_ttl)
+        with self._lock:
+            self._entries[fingerprint] = (valid, expires_at)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return valid
+
+    @staticmethod
+    def _verify(fingerprint, now):
+        from .managers import CertAdm
+
+        _cert = CertAdm.get_by_fingerprint(fingerprint)
+        if _cert is None or _cert.revoked_at is not None or not _cert.s_chain:
+            return None
+        cert_list = load_pem_chain(_cert.s_chain)
+        expires_at = verify_chain(cert_list, now)
+        # the chain must end in a root this tracker issued and nothing on it may be revoked
+        fingerprint_list = [c.fingerprint(hashes.SHA1()).hex() for c in cert_list]
+        if not CertAdm.is_trusted_chain(fingerprint_list):
+            return None
+        return expires_at
+
+    def invalidate(self, fingerprint=None):
+        with self._lock:
+            if fingerprint is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(fingerprint, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+issuer_cache = IssuerCache()
+identity_cache = IdentityCache()
+crl_cache = CrlCache()
+chain_cache = ChainCache()
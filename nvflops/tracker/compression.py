@@ -0,0 +1,54 @@
+import zlib
+
+from flask import current_app, request
+
+from ..participant.codec import available_codecs, get_codec, zstandard
+from ..utils.wire import JSON_MIME, MSGPACK_MIME
+
+# bodies worth compressing, files served by send_file are left alone
+COMPRESSIBLE_MIMETYPES = frozenset([JSON_MIME, MSGPACK_MIME, "text/plain", "text/html"])
+
+
+def choose_encoding(accept_encodings, preferred):
+    # client q values decide, the order of preferred breaks ties
+    return accept_encodings.best_match([e for e in preferred if e in available_codecs()])
+
+
+def compress_response(response):
+    """after_request hook compressing large API answers in the encoding the client asked for."""
+    min_size = current_app.config["COMPRESS_MIN_SIZE"]
+    if not min_size or response.direct_passthrough or response.status_code in (204, 304):
+        return response
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES or "Content-Encoding" in response.headers:
+        return response
+    response.vary.add("Accept-Encoding")
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+    encoding = choose_encoding(request.accept_encodings, current_app.config["COMPRESS_ENCODINGS"])
+    if encoding is None:
+        return response
+    levels = current_app.config["COMPRESS_LEVELS"]
+    codec = get_codec(encoding, level=levels[encoding]) if encoding in levels else get_codec(encoding)
+    response.set_data(codec.compress(data))
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def inflate(data, encoding, max_size):
+    """Decompresses a request body, reading at most one byte past ``max_size``.
+
+    Raises ValueError on a corrupt body and LookupError on an encoding this tracker cannot read.
+    """
+    if encoding == "gzip":
+        try:
+            return zlib.decompressobj(31).decompress(data, max_size + 1)
+        except zlib.error as e:
+            raise ValueError(str(e))
+    if encoding == "zstd" and zstandard is not None:
+        try:
+            with zstandard.ZstdDecompressor().stream_reader(data) as reader:
+                return reader.read(max_size + 1)
+        except zstandard.ZstdError as e:
+            raise ValueError(str(e))
+    raise LookupError(encoding)
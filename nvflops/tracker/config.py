@@ -3,6 +3,67 @@ import os
 
 class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # client certificate identity, see apis.get_key_tuple
+    TRUST_FINGERPRINT_HEADER = os.environ.get("TRUST_FINGERPRINT_HEADER", "").lower() == "true"
+    FINGERPRINT_HEADER = "X-SSL-Client-Fingerprint"
+    REQUIRE_CLIENT_CERT = os.environ.get("REQUIRE_CLIENT_CERT", "").lower() == "true"
+    # verify client chains up to a tracker root, results are cached per fingerprint
+    VERIFY_CLIENT_CHAIN = os.environ.get("VERIFY_CLIENT_CHAIN", "true").lower() == "true"
+    CHAIN_CACHE_SIZE = 10000
+    CHAIN_NEGATIVE_TTL = 60
+    # fingerprint to participant lookups, dropped on revoke and renew and otherwise after the TTL in seconds
+    IDENTITY_CACHE_SIZE = 10000
+    IDENTITY_CACHE_TTL = 300
+    BLOB_END_POINT = os.environ.get("BLOB_END_POINT") or "localhost:9000"
+    BLOB_ACCESS_KEY = os.environ.get("BLOB_ACCESS_KEY")
+    BLOB_SECRET_KEY = os.environ.get("BLOB_SECRET_KEY")
+    BLOB_SECURE = os.environ.get("BLOB_SECURE", "").lower() == "true"
+    BLOB_BUCKET = os.environ.get("BLOB_BUCKET") or "test"
+    BLOB_REGION = os.environ.get("BLOB_REGION") or "us-east-1"
+    # presigned URLs issued to agents
+    BLOB_URL_EXPIRY = 3600
+    BLOB_PART_SIZE = 16 * 1024 * 1024
+    # seconds between bucket scans repairing submissions whose upload event was lost, 0 disables
+    RECONCILE_INTERVAL = int(os.environ.get("RECONCILE_INTERVAL") or 0)
+    RECONCILE_GRACE = 60
+    RECONCILE_PAGE_SIZE = 1000
+    # number of RSA keys kept pre-generated for provisioning, 0 disables the pool
+    KEY_POOL_SIZE = int(os.environ.get("KEY_POOL_SIZE") or 0)
+    KEY_POOL_KEY_TYPE = os.environ.get("KEY_POOL_KEY_TYPE") or "rsa"
+    KEY_POOL_WORKERS = None
+    # processes used by /admin/provision/batch, None uses all cores
+    PROVISION_WORKERS = None
+    CRL_VALID_DAYS = 7
+    # private keys are encrypted at rest under this key when set
+    TRACKER_MASTER_KEY = os.environ.get("TRACKER_MASTER_KEY")
+    ISSUER_CACHE_SIZE = 128
+    CERT_VALID_DAYS = 360
+    # renew certificates expiring within ROTATION_WINDOW_DAYS, checked every ROTATION_INTERVAL seconds (0 disables)
+    ROTATION_INTERVAL = int(os.environ.get("ROTATION_INTERVAL") or 0)
+    ROTATION_WINDOW_DAYS = 30
+    ROTATION_BATCH_SIZE = 100
+    ROTATION_ROLES = ("client", "server", "subca")
+    # heartbeat interval in seconds handed to agents, see heartbeat.HeartbeatPacer
+    HEARTBEAT_INTERVAL = 10
+    HEARTBEAT_IDLE_INTERVAL = 60
+    HEARTBEAT_FAST_INTERVAL = 2
+    HEARTBEAT_TRANSITION_WINDOW = 60
+    # heartbeats per second and worker before agents are slowed down, 0 disables
+    HEARTBEAT_TARGET_RATE = int(os.environ.get("HEARTBEAT_TARGET_RATE") or 0)
+    # submissions accepted in one /submission/batch request
+    SUBMISSION_MAX_BATCH = 100
+    # newest samples kept from one batched heartbeat
+    VITAL_SIGN_MAX_BATCH = 1000
+    # bound on compressed request bodies once inflated
+    MAX_DECOMPRESSED_SIZE = 16 * 1024 * 1024
+    # responses of at least COMPRESS_MIN_SIZE bytes are compressed when the client accepts it, 0 disables
+    COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE") or 1400)
+    COMPRESS_ENCODINGS = ("zstd", "gzip")
+    COMPRESS_LEVELS = {"gzip": 6, "zstd": 3}
+    # blob garbage collection, ages in seconds
+    GC_GRACE = 24 * 3600
+    GC_REGISTERED_TTL = 24 * 3600
+    GC_BATCH_SIZE = 1000
 
     @staticmethod
     def init_app(app):
@@ -21,7 +82,8 @@ class DevelopmentConfig(Config):
 class TestingConfig(Config):
     DEBUG = True
     TESTING = True
-    SQLALCHEMY_DATABASE_URI = os.environ.get("TEST_DATABASE_URL")
+    # in memory unless a test database is given
+    SQLALCHEMY_DATABASE_URI = os.environ.get("TEST_DATABASE_URL") or "sqlite://"
 
 
 config = {"development": DevelopmentConfig, "testing": TestingConfig, "default": DevelopmentConfig}
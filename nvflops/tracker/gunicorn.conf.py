@@ -5,6 +5,6 @@ bind = "0.0.0.0:8000"
 # do_handshake_on_connect=True
 # keyfile="overseer.key"
 timeout = 30
-# worker_class="nvflare.ha.overseer.worker.ClientAuthWorker"
+# worker_class="nvflops.tracker.worker.ClientAuthWorker"
 workers = 1
 wsgi_app = "nvflops.tracker.app:app"
@@ -0,0 +1,56 @@
+import time
+from collections import deque
+from datetime import datetime
+from threading import Lock
+
+
+class HeartbeatPacer:
+    """Picks the heartbeat interval returned to agents.
+
+    Idle participants (no plan) check in rarely, participants close to a plan's effective time check
+    in often so they pick up the transition quickly.  When this process receives heartbeats faster
+    than ``target_rate`` per second the interval is stretched in proportion.  Each tracker worker
+    paces on what it sees, so ``target_rate`` is per worker.
+    """
+
+    def __init__(self, interval=10, idle_interval=60, fast_interval=2, transition_window=60, target_rate=0, window=10):
+        self.interval = interval
+        self.idle_interval = idle_interval
+        self.fast_interval = fast_interval
+        self.transition_window = transition_window
+        self.target_rate = target_rate
+        self.window = window
+        self._buckets = deque()
+        self._lock = Lock()
+
+    def observe(self, count=1, now=None):
+        second = int(now if now is not None else time.time())
+        with self._lock:
+            if self._buckets and self._buckets[-1][0] == second:
+                self._buckets[-1][1] += count
+            else:
+                self._buckets.append([second, count])
+            while self._buckets and self._buckets[0][0] <= second - self.window:
+                self._buckets.popleft()
+
+    def rate(self, now=None):
+        second = int(now if now is not None else time.time())
+        with self._lock:
+            total = sum(count for s, count in self._buckets if s > second - self.window)
+        return total / self.window
+
+    def next_interval(self, plan=None, now=None):
+        if plan is None:
+            interval = self.idle_interval
+        elif abs((plan.effective_time - datetime.utcnow()).total_seconds()) < self.transition_window:
+            interval = self.fast_interval
+        else:
+            interval = self.interval
+        if self.target_rate:
+            rate = self.rate(now)
+            if rate > self.target_rate:
+                interval = min(max(self.idle_interval, interval), interval * rate / self.target_rate)
+        return round(interval, 1)
+
+
+heartbeat_pacer = HeartbeatPacer()
@@ -1,7 +1,17 @@
 import uuid
 from datetime import datetime
-from ..utils.cert_utils import SimpleCert
+
+from ..utils.cert_utils import (
+    SimpleCert,
+    create_certs,
+    get_key_type,
+    load_pem_chain,
+    load_pri_key,
+    serialize_pkcs12,
+    wrap_pri_key,
+)
 from . import db
+from .caches import chain_cache, identity_cache, issuer_cache
 from .models import (
     Certificate,
     Experiment,
@@ -14,8 +24,12 @@ from .models import (
     SubmissionCustomField,
     VitalSign,
     VitalSignCustomField,
+    study_participant_table,
 )
 
+# roles whose key signs other certificates
+CA_ROLES = ("root", "subca")
+
 
 def get_custom_field(model, id):
     cf_list = model.query.get(id).custom_field_list
@@ -54,32 +68,111 @@ def get_pct_by_key_tuple(*key_tuple):
     return _pct
 
 
+def get_pct_id(pct_id, *key_tuple):
+    # certificate clients come with the id the identity cache resolved, header clients are looked up
+    if pct_id is not None:
+        return pct_id
+    _pct = get_pct_by_key_tuple(*key_tuple)
+    return _pct.id if _pct else None
+
+
+def get_cert_row(issuer, cert_type, sc):
+    password = issuer_cache.password
+    cert = Certificate(
+        issuer=issuer,
+        subject=sc.subject,
+        s_crt=sc.s_crt,
+        s_prv=wrap_pri_key(sc.prv or load_pri_key(sc.s_prv), password) if password else sc.s_prv,
+        role=cert_type,
+        s_der=sc.s_der,
+        s_chain=sc.s_chain,
+        fingerprint=sc.sha1_fingerprint_str,
+        serial_number=format(sc.serial_number, "x"),
+        not_valid_after=sc.not_valid_after,
+    )
+    cert.key_pem = sc.s_prv
+    return cert
+
+
+def unwrap_key(cert):
+    # for handing a single key out, deliberately bypasses the issuer cache
+    if cert.key_pem is None:
+        cert.key_pem = SimpleCert(cert.subject, s_prv=cert.s_prv, password=issuer_cache.password).s_prv
+    return cert.key_pem
+
+
+def register_submission(
+    _exp, _pct_id, /, id=None, custom_field=None, parent_id_list=None, codec=None, base_blob_id=None, **kwargs
+):
+    if id is not None:
+        # ids picked by the agent, see participant.journal
+        try:
+            uuid.UUID(id)
+        except (AttributeError, TypeError, ValueError):
+            return None
+        _existing = Submission.query.get(id)
+        if _existing is not None:
+            # a replay whose acknowledgement was lost
+            return _existing if _existing.pct_id == _pct_id and _existing.exp_id == _exp.id else None
+    _parent_list = [Submission.query.get(parent_id) for parent_id in parent_id_list or []]
+    if None in _parent_list:
+        return None
+    submission = Submission(
+        id=id or str(uuid.uuid4()),
+        blob_id=str(uuid.uuid4()),
+        state="registered",
+        codec=codec or "none",
+        base_blob_id=base_blob_id,
+        pct_id=_pct_id,
+        exp_id=_exp.id,
+    )
+    submission.parents.extend(_parent_list)
+    for k, v in (custom_field or {}).items():
+        submission.custom_field_list.append(
+            SubmissionCustomField(key_name=k, value_type=v.__class__.__name__, value_string=str(v))
+        )
+    db.session.add(submission)
+    return submission
+
+
 class SubmissionManager:
     @staticmethod
-    def insert_entry(exp_name, *key_tuple, **kwargs):
+    def insert_entry(exp_name, *key_tuple, pct_id=None, **kwargs):
         _exp = get_exp_by_key_tuple(exp_name, *key_tuple)
         if not _exp:
             return None
-        _pct = get_pct_by_key_tuple(*key_tuple)
-        if not _pct:
+        _pct_id = get_pct_id(pct_id, *key_tuple)
+        if _pct_id is None:
+            return None
+        submission = register_submission(_exp, _pct_id, **kwargs)
+        if submission is None:
             return None
-        id = str(uuid.uuid4())
-        blob_id = str(uuid.uuid4())
-        custom_field = kwargs.pop("custom_field", {})
-        parent_id_list = kwargs.pop("parent_id_list", [])
-        submission = Submission(id=id, blob_id=blob_id, state="registered", pct_id=_pct.id, exp_id=_exp.id)
-        if parent_id_list:
-            for parent_id in parent_id_list:
-                submission.parents.append(Submission.query.get(parent_id))
-        for k, v in custom_field.items():
-            sub_cf = SubmissionCustomField(
-                key_name=k, value_type=v.__class__.__name__, value_string=str(v), submission_id=id
-            )
-            db.session.add(sub_cf)
-        db.session.add(submission)
         db.session.commit()
         return submission
 
+    @staticmethod
+    def insert_batch(exp_name, *key_tuple, pct_id=None, submission_list=None):
+        """Registers submissions in order with one commit, returns the accepted ones and the rejected id.
+
+        Stops at the first entry that cannot be registered, the entries after it may be its children.
+        """
+        _exp = get_exp_by_key_tuple(exp_name, *key_tuple)
+        if not _exp:
+            return None
+        _pct_id = get_pct_id(pct_id, *key_tuple)
+        if _pct_id is None:
+            return None
+        accepted = list()
+        rejected = None
+        for entry in submission_list or []:
+            submission = register_submission(_exp, _pct_id, **entry)
+            if submission is None:
+                rejected = entry.get("id")
+                break
+            accepted.append(submission)
+        db.session.commit()
+        return accepted, rejected
+
     @staticmethod
     def update_state(blob_id, state):
         _sub = Submission.query.filter_by(blob_id=blob_id).first()
@@ -90,26 +183,109 @@ class SubmissionManager:
         db.session.commit()
         return _sub
 
+    @staticmethod
+    def update_state_bulk(blob_id_list, state, from_state="registered", chunk_size=500):
+        # Conditional update keeps repeated or out of order notifications idempotent.
+        from_state_list = [from_state] if isinstance(from_state, str) else list(from_state)
+        _count = 0
+        for i in range(0, len(blob_id_list), chunk_size):
+            _count += (
+                Submission.query.filter(Submission.blob_id.in_(blob_id_list[i : i + chunk_size]))
+                .filter(Submission.state.in_(from_state_list))
+                .update({"state": state, "updated_at": datetime.utcnow()}, synchronize_session=False)
+            )
+        db.session.commit()
+        return _count
+
+    @staticmethod
+    def iter_blob_ids(batch_size=1000):
+        # Only the id columns are loaded, streamed in batches rather than materializing rows.
+        for blob_id, base_blob_id in (
+            db.session.query(Submission.blob_id, Submission.base_blob_id)
+            .filter(Submission.state != "aborted")
+            .yield_per(batch_size)
+        ):
+            yield blob_id
+            if base_blob_id:
+                yield base_blob_id
+        for model in (Experiment, Study):
+            for (blob_id,) in db.session.query(model.blob_id).filter(model.blob_id.isnot(None)).yield_per(batch_size):
+                yield blob_id
+
+    @staticmethod
+    def referenced_blob_ids(blob_id_list):
+        # the same references as iter_blob_ids, read again right before their blobs are deleted
+        queries = [
+            db.session.query(Submission.blob_id).filter(Submission.state != "aborted"),
+            db.session.query(Submission.base_blob_id).filter(Submission.state != "aborted"),
+            db.session.query(Experiment.blob_id),
+            db.session.query(Study.blob_id),
+        ]
+        referenced = set()
+        for query in queries:
+            column = query.column_descriptions[0]["expr"]
+            referenced.update(blob_id for (blob_id,) in query.filter(column.in_(blob_id_list)))
+        return referenced
+
+    @staticmethod
+    def iter_stale_blob_ids(state, before, batch_size=1000):
+        for (blob_id,) in (
+            db.session.query(Submission.blob_id)
+            .filter(Submission.state == state)
+            .filter(Submission.created_at < before)
+            .yield_per(batch_size)
+        ):
+            yield blob_id
+
+    @staticmethod
+    def get(sub_id):
+        _sub = Submission.query.get(sub_id)
+        return _sub
+
+    @staticmethod
+    def can_read(_sub, pct_id):
+        # its owner and the participants of its study, an aggregator reads what the clients submitted
+        if pct_id is None:
+            return False
+        if _sub.pct_id == pct_id:
+            return True
+        _row = (
+            db.session.query(Experiment.id)
+            .join(study_participant_table, study_participant_table.c.study_id == Experiment.study_id)
+            .filter(Experiment.id == _sub.exp_id)
+            .filter(study_participant_table.c.participant_id == pct_id)
+            .first()
+        )
+        return _row is not None
+
+    @staticmethod
+    def get_by_blob_id(blob_id):
+        _sub = Submission.query.filter_by(blob_id=blob_id).first()
+        return _sub
+
     @staticmethod
     def get_custom_field(sub_id):
         _custom_field = get_custom_field(Submission, sub_id)
         return _custom_field
 
     @staticmethod
-    def get_all(exp, *key_tuple):
-        _exp = Experiment.query.filter_by(name=exp, project=key_tuple[0], study=key_tuple[1]).first()
-        _all = Submission.query.filter_by(experiment=_exp).all()
+    def get_all(exp_name, *key_tuple):
+        _exp = get_exp_by_key_tuple(exp_name, *key_tuple)
+        if not _exp:
+            return None
+        _all = Submission.query.filter_by(exp_id=_exp.id).order_by(Submission.created_at).all()
         return _all
 
     @staticmethod
     def get_parents(sub_id):
-        _parent_list = Submission.query.get(sub_id).parents
-        return _parent_list
+        _sub = Submission.query.get(sub_id)
+        return _sub.parents if _sub else None
 
     @staticmethod
     def get_children(sub_id):
-        _child_list = Submission.query.get(sub_id).children
-        return _child_list
+        # unknown until a journaled submission has been drained
+        _sub = Submission.query.get(sub_id)
+        return _sub.children if _sub else None
 
     @staticmethod
     def get_root(exp_name, *key_tuple):
@@ -123,23 +299,234 @@ class SubmissionManager:
 class CertAdm:
     @staticmethod
     def store_new_entry(issuer, subject, **kwargs):
+        cert_type = kwargs.get("type", "client")
+        my_cert = SimpleCert(subject, key_type=kwargs.get("key_type", "rsa"))
         if issuer is None:
-            my_cert = SimpleCert(subject, ca=True)
+            cert_type = "root"
         else:
-            cert = CertManager.get_cert(subject=issuer)
-            root = SimpleCert(subject, ca=True, s_crt=cert.s_crt, s_prv=cert.s_prv)
-            my_cert = SimpleCert(subject)
-            my_cert.set_issuer_simple_cert(root)
-        my_cert.create_cert()
+            _issuer = CertAdm.get_cert(subject=issuer)
+            if _issuer is None:
+                return None
+            my_cert.set_issuer_simple_cert(issuer_cache.get(_issuer))
+        my_cert.create_cert(type=cert_type, valid_days=kwargs.get("valid_days", 360))
         my_cert.serialize()
-        cert = Certificate(issuer=issuer, subject=subject, s_crt=my_cert.s_crt, s_prv=my_cert.s_prv)
+        if CertAdm.get_cert(subject=subject) is not None:
+            # re-issued certificate, drop the parsed copy of the previous one
+            issuer_cache.invalidate(subject)
+        cert = get_cert_row(issuer, cert_type, my_cert)
         db.session.add(cert)
         db.session.commit()
         return cert
 
+    @staticmethod
+    def store_new_batch(issuer, subject_list, **kwargs):
+        cert_type = kwargs.get("type", "client")
+        _issuer = CertAdm.get_cert(subject=issuer)
+        if _issuer is None or not subject_list:
+            return None
+        issuer_cert = issuer_cache.get(_issuer)
+        created = create_certs(
+            issuer_cert,
+            subject_list,
+            type=cert_type,
+            key_type=kwargs.get("key_type", "rsa"),
+            valid_days=kwargs.get("valid_days", 360),
+            max_workers=kwargs.get("max_workers"),
+        )
+        cert_list = list()
+        for subject, s_crt, s_prv in created:
+            # only the certificate is parsed back, the key stays serialized
+            sc = SimpleCert(subject, s_crt=s_crt)
+            sc.s_prv = s_prv
+            sc.set_issuer_simple_cert(issuer_cert)
+            sc.serialize()
+            cert_list.append(get_cert_row(issuer, cert_type, sc))
+        db.session.add_all(cert_list)
+        db.session.commit()
+        return _issuer, cert_list
+
+    @staticmethod
+    def get_expiring(before, roles, limit, exclude_id_list=None):
+        query = (
+            Certificate.query.filter(Certificate.not_valid_after < before)
+            .filter(Certificate.revoked_at.is_(None))
+            .filter(Certificate.superseded_by.is_(None))
+            .filter(Certificate.role.in_(roles))
+        )
+        if exclude_id_list:
+            query = query.filter(Certificate.id.notin_(exclude_id_list))
+        _cert_list = query.order_by(Certificate.not_valid_after).limit(limit).all()
+        return _cert_list
+
+    @staticmethod
+    def renew(_cert, valid_days=360):
+        if _cert.role in CA_ROLES:
+            # the key is kept so every certificate it signed still verifies against the new one
+            my_cert = SimpleCert(_cert.subject, s_prv=_cert.s_prv, password=issuer_cache.password)
+        else:
+            # key type from the public key, leaf private keys are never unwrapped here
+            key_type = get_key_type(SimpleCert(_cert.subject, s_crt=_cert.s_crt).crt.public_key())
+            my_cert = SimpleCert(_cert.subject, key_type=key_type)
+        if _cert.issuer is not None:
+            _issuer = CertAdm.get_cert(subject=_cert.issuer)
+            if _issuer is None:
+                return None
+            my_cert.set_issuer_simple_cert(issuer_cache.get(_issuer))
+        my_cert.create_cert(type=_cert.role, valid_days=valid_days)
+        my_cert.serialize()
+        new_cert = get_cert_row(_cert.issuer, _cert.role, my_cert)
+        db.session.add(new_cert)
+        db.session.flush()
+        _cert.superseded_by = new_cert.id
+        for model in (Participant, Project):
+            model.query.filter_by(cert_id=_cert.id).update({"cert_id": new_cert.id}, synchronize_session=False)
+        if _cert.role in CA_ROLES:
+            CertAdm._refresh_chains(_cert.subject, new_cert.s_chain)
+            chain_cache.invalidate()
+        issuer_cache.invalidate(_cert.subject)
+        identity_cache.invalidate(_cert.fingerprint)
+        return new_cert
+
+    @staticmethod
+    def _refresh_chains(issuer, issuer_chain):
+        # stored chains would otherwise keep the superseded issuer and break once it expires
+        _cert_list = Certificate.query.filter_by(issuer=issuer, superseded_by=None, revoked_at=None).all()
+        for _cert in _cert_list:
+            _cert.s_chain = _cert.s_crt + issuer_chain
+            if _cert.role in CA_ROLES:
+                CertAdm._refresh_chains(_cert.subject, _cert.s_chain)
+
+    @staticmethod
+    def get_by_fingerprint(fingerprint):
+        return Certificate.query.filter_by(fingerprint=fingerprint).first()
+
+    @staticmethod
+    def is_trusted_chain(fingerprint_list):
+        # root last, it has to be one of ours and no link may be revoked
+        _cert_list = Certificate.query.filter(Certificate.fingerprint.in_(fingerprint_list)).all()
+        if len(_cert_list) != len(set(fingerprint_list)):
+            return False
+        if any(_cert.revoked_at is not None for _cert in _cert_list):
+            return False
+        root = next(_cert for _cert in _cert_list if _cert.fingerprint == fingerprint_list[-1])
+        return root.issuer is None
+
+    @staticmethod
+    def get_latest(fingerprint):
+        _cert = Certificate.query.filter_by(fingerprint=fingerprint).filter(Certificate.revoked_at.is_(None)).first()
+        while _cert is not None and _cert.superseded_by is not None:
+            _cert = Certificate.query.get(_cert.superseded_by)
+            # a revoked successor is never handed out in place of the certificate asked for
+            if _cert is not None and _cert.revoked_at is not None:
+                return None
+        return _cert
+
+    @staticmethod
+    def revoke(subject=None, fingerprint=None, reason="unspecified"):
+        query = Certificate.query.filter(Certificate.revoked_at.is_(None))
+        if fingerprint:
+            query = query.filter_by(fingerprint=fingerprint)
+        elif subject:
+            query = query.filter_by(subject=subject)
+        else:
+            return None
+        _cert_list = query.all()
+        if not _cert_list:
+            # unknown or already revoked
+            return None
+        now = datetime.utcnow()
+        for _cert in _cert_list:
+            _cert.revoked_at = now
+            _cert.revocation_reason = reason
+        db.session.commit()
+        for _cert in _cert_list:
+            identity_cache.invalidate(_cert.fingerprint)
+            issuer_cache.invalidate(_cert.subject)
+        # a revoked CA breaks every chain below it
+        chain_cache.invalidate()
+        return _cert_list
+
+    @staticmethod
+    def get_revoked(issuer, since=None):
+        query = Certificate.query.filter_by(issuer=issuer).filter(Certificate.revoked_at.isnot(None))
+        if since is not None:
+            query = query.filter(Certificate.revoked_at > since)
+        return query.order_by(Certificate.revoked_at).all()
+
+    @staticmethod
+    def get_revocation_watermark(issuer):
+        _count, _latest = (
+            db.session.query(db.func.count(Certificate.id), db.func.max(Certificate.revoked_at))
+            .filter(Certificate.issuer == issuer)
+            .filter(Certificate.revoked_at.isnot(None))
+            .one()
+        )
+        return _count, _latest
+
+    @staticmethod
+    def get_status(fingerprint):
+        _cert = Certificate.query.filter_by(fingerprint=fingerprint).first()
+        if _cert is None:
+            return {"status": "unknown"}
+        if _cert.revoked_at is None:
+            return {"status": "good", "subject": _cert.subject, "issuer": _cert.issuer}
+        return {
+            "status": "revoked",
+            "subject": _cert.subject,
+            "issuer": _cert.issuer,
+            "revoked_at": _cert.revoked_at,
+            "reason": _cert.revocation_reason,
+        }
+
+    @staticmethod
+    def export(subject, fmt):
+        """Serves PEM, DER and chain exports from the row, they are produced once at issue time.
+
+        PKCS#12 is the exception: the bundle carries the private key under the subject name as its
+        password, storing it would undo the encryption of s_prv at rest.  It is built per request
+        from the wrapped key instead, which costs one unwrap and is only asked for on provisioning.
+        """
+        _cert = CertAdm.get_cert(subject=subject)
+        if _cert is None:
+            return None
+        if fmt == "pkcs12":
+            sc = SimpleCert(_cert.subject, s_crt=_cert.s_crt, s_prv=_cert.s_prv, password=issuer_cache.password)
+            return serialize_pkcs12(sc.subject, sc.prv, sc.crt, load_pem_chain(_cert.s_chain)[1:])
+        return {
+            "pem": _cert.s_crt,
+            "key": unwrap_key(_cert) if fmt == "key" else None,
+            "der": _cert.s_der,
+            "chain": _cert.s_chain,
+        }.get(fmt)
+
+    @staticmethod
+    def wrap_all(batch_size=100):
+        # encrypts keys stored before TRACKER_MASTER_KEY was configured
+        password = issuer_cache.password
+        if not password:
+            return 0
+        _count = 0
+        _last_id = 0
+        while True:
+            _cert_list = (
+                Certificate.query.filter(Certificate.id > _last_id, Certificate.s_prv.isnot(None))
+                .order_by(Certificate.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not _cert_list:
+                return _count
+            for _cert in _cert_list:
+                if b"ENCRYPTED" not in _cert.s_prv:
+                    _cert.s_prv = wrap_pri_key(load_pri_key(_cert.s_prv), password)
+                    _count += 1
+            db.session.commit()
+            _last_id = _cert_list[-1].id
+
     @staticmethod
     def get_cert(subject):
-        _cert = Certificate.query.filter_by(subject=subject).first()
+        # the newest row wins once a subject has been re-issued
+        _cert = Certificate.query.filter_by(subject=subject).order_by(Certificate.id.desc()).first()
         return _cert
 
 
@@ -217,7 +604,7 @@ class ExpAdm:
 
     @staticmethod
     def get_current_exp(study, pct):
-        _study = Study.query.filter_by(name=study).join(Participant).filter(Participant.name == pct).first()
+        _study = Study.query.filter_by(name=study).filter(Study.participants.any(Participant.name == pct)).first()
         if not _study:
             return None
         _exp = Experiment.query.filter_by(study_id=_study.id).order_by(Experiment.id.asc()).first()
@@ -226,13 +613,16 @@ class ExpAdm:
 
 class VitalSignManager:
     @staticmethod
-    def insert_entry(*key_tuple, **kwargs):
-        _pct = get_pct_by_key_tuple(*key_tuple)
-        if not _pct:
+    def insert_entry(*key_tuple, pct_id=None, **kwargs):
+        _pct_id = get_pct_id(pct_id, *key_tuple)
+        if _pct_id is None:
             return None
         _custom_field = kwargs.pop("vital_sign", {})
-        _vital_sign = VitalSign(participant_id=_pct.id)
+        if not isinstance(_custom_field, dict):
+            raise ValueError(f"Malformed vital_sign {_custom_field!r}")
+        _vital_sign = VitalSign(participant_id=_pct_id)
         db.session.add(_vital_sign)
+        db.session.flush()
         for k, v in _custom_field.items():
             _cf = VitalSignCustomField(
                 key_name=k, value_type=v.__class__.__name__, value_string=str(v), vital_sign_id=_vital_sign.id
@@ -240,3 +630,33 @@ class VitalSignManager:
             db.session.add(_cf)
         db.session.commit()
         return _vital_sign
+
+    @staticmethod
+    def insert_batch(*key_tuple, pct_id=None, vital_sign_list=None, max_batch=1000):
+        """Stores samples buffered by the agent, all in one flush and one commit.
+
+        Raises ValueError, before anything is stored, when a sample carries a malformed ``created_at``
+        or ``vital_sign``.
+        """
+        _pct_id = get_pct_id(pct_id, *key_tuple)
+        if _pct_id is None:
+            return None
+        _vital_sign_list = list()
+        for sample in (vital_sign_list or [])[-max_batch:]:
+            created_at = sample.get("created_at")
+            try:
+                created_at = datetime.fromisoformat(created_at) if created_at else datetime.utcnow()
+            except TypeError:
+                raise ValueError(f"Malformed {created_at=}")
+            _custom_field = sample.get("vital_sign", {})
+            if not isinstance(_custom_field, dict):
+                raise ValueError(f"Malformed vital_sign {_custom_field!r}")
+            _vital_sign = VitalSign(participant_id=_pct_id, created_at=created_at)
+            for k, v in _custom_field.items():
+                _vital_sign.custom_field_list.append(
+                    VitalSignCustomField(key_name=k, value_type=v.__class__.__name__, value_string=str(v))
+                )
+            _vital_sign_list.append(_vital_sign)
+        db.session.add_all(_vital_sign_list)
+        db.session.commit()
+        return _vital_sign_list
@@ -1,6 +1,7 @@
 from datetime import datetime
 
 from . import db
+from .serializer import serializer_for
 
 # from sqlalchemy_mixins import AllFeaturesMixin
 
@@ -69,6 +70,8 @@ class Submission(db.Model):
     exp_id = db.Column(db.Integer, db.ForeignKey("experiment.id"), nullable=False)
     state = db.Column(db.String(10), nullable=False)
     blob_id = db.Column(db.String(40), index=True)
+    codec = db.Column(db.String(10), nullable=False, default="none")
+    base_blob_id = db.Column(db.String(40))
     parents = db.relationship(
         "Submission",
         secondary=parents_table,
@@ -82,14 +85,14 @@ class Submission(db.Model):
     updated_at = db.Column(db.DateTime, onupdate=datetime.utcnow)
 
     def asdict(self):
-        return {c.name: getattr(self, c.name) for c in self.__table__.columns}
+        return serializer_for(type(self))(self)
 
 
 class SubmissionCustomField(CustomFieldMixin, db.Model):
     sub_id = db.Column(db.Integer, db.ForeignKey("submission.id"), nullable=False)
 
     def asdict(self):
-        return {c.name: getattr(self, c.name) for c in self.__table__.columns}
+        return serializer_for(type(self))(self)
 
 
 # One project has one sub-ca cert
@@ -100,7 +103,7 @@ class Project(CommonMixin, db.Model):
     participants = db.relationship("Participant", lazy="dynamic", backref=db.backref("project", uselist=False))
 
     def asdict(self):
-        return {c.name: getattr(self, c.name) for c in self.__table__.columns}
+        return serializer_for(type(self))(self)
 
 
 class Study(CommonMixin, db.Model):
@@ -110,11 +113,10 @@ class Study(CommonMixin, db.Model):
     )
     blob_id = db.Column(db.String(40))
     experiments = db.relationship("Experiment", lazy=True, backref=db.backref("study", uselist=False))
+    serialize_related = ("participants",)
 
     def asdict(self):
-        base_dict = {c.name: getattr(self, c.name) for c in self.__table__.columns}
-        base_dict.update({"participants": self.participants})
-        return base_dict
+        return serializer_for(type(self))(self)
 
 
 class ParticipantRole(CommonMixin, db.Model):
@@ -139,7 +141,7 @@ class Participant(CommonMixin, db.Model):
     submissions = db.relationship("Submission", lazy=True, backref=db.backref("participant", uselist=False))
 
     def asdict(self):
-        return {c.name: getattr(self, c.name) for c in self.__table__.columns}
+        return serializer_for(type(self))(self)
 
 
 # Root CA does not change and must be pre-provisioned.
@@ -150,11 +152,23 @@ class Certificate(CommonMixin, db.Model):
     issuer = db.Column(db.String(25))
     subject = db.Column(db.String(25))
     s_crt = db.Column(db.String(2000))
+    # encrypted under TRACKER_MASTER_KEY when one is configured
     s_prv = db.Column(db.String(2000))
+    # encodings produced once at issue time and served as is
+    s_der = db.Column(db.LargeBinary)
+    s_chain = db.Column(db.LargeBinary)
     role = db.Column(db.String(10))
+    serial_number = db.Column(db.String(40))
+    revoked_at = db.Column(db.DateTime)
+    revocation_reason = db.Column(db.String(25))
+    not_valid_after = db.Column(db.DateTime, index=True)
+    # id of the certificate that renewed this one
+    superseded_by = db.Column(db.Integer)
+    # plaintext key of a certificate issued in the current request, never persisted
+    key_pem = None
 
     def asdict(self):
-        return {c.name: getattr(self, c.name) for c in self.__table__.columns}
+        return serializer_for(type(self))(self)
 
 
 # Plan basically is the action for one experiment,
@@ -165,14 +179,14 @@ class Plan(CommonMixin, db.Model):
     exp_id = db.Column(db.Integer, db.ForeignKey("experiment.id"), nullable=False)
 
     def asdict(self):
-        return {c.name: getattr(self, c.name) for c in self.__table__.columns}
+        return serializer_for(type(self))(self)
 
 
 class VitalSignCustomField(CustomFieldMixin, db.Model):
     vital_sign_id = db.Column(db.Integer, db.ForeignKey("vital_sign.id"), nullable=False)
 
     def asdict(self):
-        return {c.name: getattr(self, c.name) for c in self.__table__.columns}
+        return serializer_for(type(self))(self)
 
 
 class VitalSign(db.Model):
@@ -182,4 +196,4 @@ class VitalSign(db.Model):
     custom_field_list = db.relationship("VitalSignCustomField", lazy=True, backref=db.backref("vital_sign"))
 
     def asdict(self):
-        return {c.name: getattr(self, c.name) for c in self.__table__.columns}
+        return serializer_for(type(self))(self)
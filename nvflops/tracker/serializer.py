@@ -0,0 +1,47 @@
+from operator import attrgetter, itemgetter
+
+from ..utils.wire import to_builtin
+
+
+class ModelSerializer:
+    """Turns rows of one model into dicts.
+
+    The attribute names and their getters are resolved once per model instead of walking
+    ``__table__.columns`` for every row.  Loaded rows are read straight from the instance dict,
+    expired or partially loaded ones through the mapped attributes.  Relationships named in the
+    model's ``serialize_related`` are added as is and serialized in turn.
+    """
+
+    def __init__(self, model):
+        self.names = tuple(c.key for c in model.__table__.columns) + tuple(getattr(model, "serialize_related", ()))
+        self._item_getter = _tuple_getter(itemgetter, self.names)
+        self._attr_getter = _tuple_getter(attrgetter, self.names)
+
+    def __call__(self, obj):
+        try:
+            values = self._item_getter(obj.__dict__)
+        except KeyError:
+            values = self._attr_getter(obj)
+        return dict(zip(self.names, values))
+
+
+def _tuple_getter(getter_class, names):
+    getter = getter_class(*names)
+    return getter if len(names) > 1 else lambda obj: (getter(obj),)
+
+
+_serializers = dict()
+
+
+def serializer_for(model):
+    serializer = _serializers.get(model)
+    if serializer is None:
+        serializer = _serializers[model] = ModelSerializer(model)
+    return serializer
+
+
+def serialize(obj):
+    """``default`` hook for wire.dumps, rows go through the serializer of their model."""
+    if hasattr(type(obj), "__table__"):
+        return serializer_for(type(obj))(obj)
+    return to_builtin(obj)
@@ -0,0 +1,21 @@
+import hashlib
+
+from gunicorn.workers.sync import SyncWorker
+
+FINGERPRINT_HEADER = "X-SSL-CLIENT-FINGERPRINT"
+
+
+class ClientAuthWorker(SyncWorker):
+    """Sync worker passing the SHA-1 fingerprint of the TLS client certificate to the app.
+
+    Any fingerprint header sent by the client itself is dropped, so the value can be trusted
+    (TRUST_FINGERPRINT_HEADER) when gunicorn terminates TLS with cert_reqs set.
+    """
+
+    def handle_request(self, listener, req, client, addr):
+        headers = [(k, v) for k, v in req.headers if k.upper() != FINGERPRINT_HEADER]
+        der = client.getpeercert(binary_form=True) if hasattr(client, "getpeercert") else None
+        if der:
+            headers.append((FINGERPRINT_HEADER, hashlib.sha1(der).hexdigest()))
+        req.headers = headers
+        super().handle_request(listener, req, client, addr)
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta, timezone
+
+from .. import blob_store
+from ..managers import SubmissionManager
+
+
+class BlobCollector:
+    """Deletes bucket objects no longer referenced by the tracker database.
+
+    Reachable blob ids are streamed from Submission (including delta bases), Experiment and Study.
+    The bucket is then listed page by page.  Objects outside the reachable set and older than
+    ``grace`` are orphans and are removed with bulk delete calls.  Submissions still ``registered``
+    after ``registered_ttl`` are marked ``aborted`` when their blob never arrived, or repaired to
+    ``uploaded`` when it did, an upload that still lands later revives them through the S3 event.
+    References are read again right before each delete, so a blob registered meanwhile survives.
+    With ``dry_run`` nothing is modified and only the report is returned.
+    """
+
+    @staticmethod
+    def collect(dry_run=True, grace=24 * 3600, registered_ttl=24 * 3600, batch_size=1000, sample_size=100):
+        now = datetime.utcnow()
+        reachable = set(SubmissionManager.iter_blob_ids(batch_size))
+        pending = set(
+            SubmissionManager.iter_stale_blob_ids("registered", now - timedelta(seconds=registered_ttl), batch_size)
+        )
+        orphan_cutoff = now.replace(tzinfo=timezone.utc) - timedelta(seconds=grace)
+        report = {
+            "dry_run": dry_run,
+            "reachable": len(reachable),
+            "scanned": 0,
+            "orphans": 0,
+            "orphan_bytes": 0,
+            "orphan_sample": [],
+            "deleted": 0,
+            "delete_errors": [],
+            "repaired": 0,
+            "aborted": 0,
+        }
+        for page in blob_store.list_pages(batch_size):
+            report["scanned"] += len(page)
+            orphans = list()
+            uploaded = list()
+            candidates = dict()
+            for obj in page:
+                if obj.object_name in pending:
+                    pending.discard(obj.object_name)
+                    uploaded.append(obj.object_name)
+                elif obj.object_name not in reachable and obj.last_modified and obj.last_modified < orphan_cutoff:
+                    candidates[obj.object_name] = obj.size or 0
+            if candidates:
+                # submissions registered or revived since the reachable set was read keep their blob
+                referenced = SubmissionManager.referenced_blob_ids(list(candidates))
+                orphans = [blob_id for blob_id in candidates if blob_id not in referenced]
+                report["orphan_bytes"] += sum(candidates[blob_id] for blob_id in orphans)
+            report["orphans"] += len(orphans)
+            report["orphan_sample"].extend(orphans[: max(0, sample_size - len(report["orphan_sample"]))])
+            if dry_run:
+                report["repaired"] += len(uploaded)
+                continue
+            if uploaded:
+                report["repaired"] += SubmissionManager.update_state_bulk(uploaded, "uploaded")
+            if orphans:
+                errors = blob_store.remove(orphans)
+                report["deleted"] += len(orphans) - len(errors)
+                report["delete_errors"].extend(errors)
+        if dry_run:
+            report["aborted"] = len(pending)
+        elif pending:
+            report["aborted"] = SubmissionManager.update_state_bulk(list(pending), "aborted")
+        return report
@@ -0,0 +1,46 @@
+import logging
+from datetime import datetime, timedelta
+from threading import Event, Thread
+
+from .. import blob_store
+from ..managers import SubmissionManager
+
+
+class UploadReconciler(Thread):
+    """Periodically repairs ``registered`` submissions whose blob is already in the bucket."""
+
+    def __init__(self, app, interval, grace=60, page_size=1000):
+        Thread.__init__(self, daemon=True)
+        self._app = app
+        self._interval = interval
+        self._grace = grace
+        self._page_size = page_size
+        self._stop_event = Event()
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.wait(self._interval):
+            try:
+                with self._app.app_context():
+                    result = self.reconcile_once(grace=self._grace, page_size=self._page_size)
+                if result["repaired"]:
+                    self._logger.info(f"Reconciled uploads: {result}")
+            except Exception as e:
+                self._logger.warning(f"Upload reconciliation failed: {e}")
+
+    @staticmethod
+    def reconcile_once(grace=60, page_size=1000):
+        """Looks up the blob of each submission ``registered`` for longer than ``grace``, the bucket is not listed."""
+        cutoff = datetime.utcnow() - timedelta(seconds=grace)
+        stale_list = list(SubmissionManager.iter_stale_blob_ids("registered", cutoff, page_size))
+        result = {"stale": len(stale_list), "scanned": 0, "repaired": 0}
+        for i in range(0, len(stale_list), page_size):
+            page = stale_list[i : i + page_size]
+            result["scanned"] += len(page)
+            uploaded = [blob_id for blob_id in page if blob_store.exists(blob_id)]
+            if uploaded:
+                result["repaired"] += SubmissionManager.update_state_bulk(uploaded, "uploaded")
+        return result
@@ -0,0 +1,63 @@
+import logging
+from datetime import datetime, timedelta
+from threading import Event, Thread
+
+from .. import db
+from ..managers import CertAdm
+
+
+class CertRotator(Thread):
+    """Renews certificates whose ``not_valid_after`` falls inside the rotation window."""
+
+    def __init__(self, app, interval, window_days=30, batch_size=100, roles=("client", "server", "subca")):
+        Thread.__init__(self, daemon=True)
+        self._app = app
+        self._interval = interval
+        self._window_days = window_days
+        self._batch_size = batch_size
+        self._roles = roles
+        self._stop_event = Event()
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.wait(self._interval):
+            try:
+                with self._app.app_context():
+                    renewed = self.rotate_once(
+                        window_days=self._window_days,
+                        batch_size=self._batch_size,
+                        roles=self._roles,
+                        valid_days=self._app.config["CERT_VALID_DAYS"],
+                    )
+                if renewed:
+                    self._logger.info(f"Renewed {len(renewed)} certificates")
+            except Exception as e:
+                self._logger.warning(f"Certificate rotation failed: {e}")
+
+    @staticmethod
+    def rotate_once(window_days=30, batch_size=100, roles=("client", "server", "subca"), valid_days=360):
+        before = datetime.utcnow() + timedelta(days=window_days)
+        renewed = list()
+        # failed renewals and fresh certificates, the latter would match again when the window exceeds valid_days
+        skipped = list()
+        # CAs first so that their children are renewed under the new issuer certificate
+        for role_group in [[r for r in roles if r == "subca"], [r for r in roles if r != "subca"]]:
+            if not role_group:
+                continue
+            while True:
+                _cert_list = CertAdm.get_expiring(before, role_group, batch_size, exclude_id_list=skipped)
+                if not _cert_list:
+                    break
+                for _cert in _cert_list:
+                    new_cert = CertAdm.renew(_cert, valid_days=valid_days)
+                    if new_cert is None:
+                        # issuer is gone, leave it to expire
+                        skipped.append(_cert.id)
+                        continue
+                    skipped.append(new_cert.id)
+                    renewed.append((_cert.subject, new_cert.fingerprint))
+                db.session.commit()
+        return renewed
@@ -1,72 +1,232 @@
 import datetime
+from concurrent.futures import ProcessPoolExecutor
 
 from cryptography import x509
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import hashes, serialization
-from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, padding, rsa
+from cryptography.hazmat.primitives.serialization import pkcs12
 from cryptography.x509.oid import NameOID
 
+KEY_TYPES = ("rsa", "ecdsa", "ed25519")
+# CRLReason names a revocation may carry
+REVOKE_REASONS = frozenset(flag.value for flag in x509.ReasonFlags)
+
+
+def generate_private_key(key_type="rsa", key_size=2048):
+    if key_type == "rsa":
+        return rsa.generate_private_key(public_exponent=65537, key_size=key_size, backend=default_backend())
+    if key_type == "ecdsa":
+        return ec.generate_private_key(ec.SECP256R1(), backend=default_backend())
+    if key_type == "ed25519":
+        return ed25519.Ed25519PrivateKey.generate()
+    raise ValueError(f"Unable to handle {key_type=}")
+
+
+def get_key_type(key):
+    # accepts either half of the key pair
+    if isinstance(key, (ec.EllipticCurvePrivateKey, ec.EllipticCurvePublicKey)):
+        return "ecdsa"
+    if isinstance(key, (ed25519.Ed25519PrivateKey, ed25519.Ed25519PublicKey)):
+        return "ed25519"
+    return "rsa"
+
+
+def signing_hash(pri_key):
+    # EdDSA signs the message directly, a digest must not be passed
+    if isinstance(pri_key, ed25519.Ed25519PrivateKey):
+        return None
+    return hashes.SHA256()
+
 
 def serialize_pri_key(pri_key):
+    # the traditional OpenSSL format has no Ed25519 encoding
+    key_format = (
+        serialization.PrivateFormat.PKCS8
+        if isinstance(pri_key, ed25519.Ed25519PrivateKey)
+        else serialization.PrivateFormat.TraditionalOpenSSL
+    )
     return pri_key.private_bytes(
         encoding=serialization.Encoding.PEM,
-        format=serialization.PrivateFormat.TraditionalOpenSSL,
+        format=key_format,
         encryption_algorithm=serialization.NoEncryption(),
     )
 
 
+def wrap_pri_key(pri_key, password: bytes):
+    """Encrypted PKCS8 PEM of ``pri_key``, for keys at rest."""
+    return pri_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.BestAvailableEncryption(password),
+    )
+
+
+def load_pri_key(s_prv, password=None):
+    # keys stored before encryption was enabled are still plaintext
+    if b"ENCRYPTED" not in s_prv:
+        password = None
+    return serialization.load_pem_private_key(s_prv, password=password, backend=default_backend())
+
+
 def serialize_cert(cert):
     return cert.public_bytes(serialization.Encoding.PEM)
 
 
+def load_pem_chain(s_chain):
+    end_marker = b"-----END CERTIFICATE-----"
+    return [
+        x509.load_pem_x509_certificate(block.strip() + b"\n" + end_marker + b"\n", default_backend())
+        for block in s_chain.split(end_marker)
+        if block.strip()
+    ]
+
+
+def verify_signature(cert, issuer_cert):
+    # raises cryptography.exceptions.InvalidSignature on mismatch
+    pub_key = issuer_cert.public_key()
+    if isinstance(pub_key, rsa.RSAPublicKey):
+        pub_key.verify(cert.signature, cert.tbs_certificate_bytes, padding.PKCS1v15(), cert.signature_hash_algorithm)
+    elif isinstance(pub_key, ec.EllipticCurvePublicKey):
+        pub_key.verify(cert.signature, cert.tbs_certificate_bytes, ec.ECDSA(cert.signature_hash_algorithm))
+    else:
+        pub_key.verify(cert.signature, cert.tbs_certificate_bytes)
+
+
+def verify_chain(cert_list, now=None):
+    """Checks a leaf-first chain ending in a self-signed root.
+
+    Returns the earliest not_valid_after of the chain, the time the result stops being valid.
+    Raises ValueError or InvalidSignature when the chain does not verify.
+    """
+    if not cert_list:
+        raise ValueError("Empty certificate chain")
+    now = now or datetime.datetime.utcnow()
+    for i, cert in enumerate(cert_list):
+        if not cert.not_valid_before <= now <= cert.not_valid_after:
+            raise ValueError(f"Certificate {cert.subject.rfc4514_string()} is outside its validity period")
+        issuer_cert = cert_list[i + 1] if i + 1 < len(cert_list) else cert
+        if cert.issuer != issuer_cert.subject:
+            raise ValueError(f"Certificate {cert.subject.rfc4514_string()} is not issued by the next in chain")
+        if issuer_cert is not cert_list[0]:
+            basic_constraints = issuer_cert.extensions.get_extension_for_class(x509.BasicConstraints).value
+            if not basic_constraints.ca:
+                raise ValueError(f"Certificate {issuer_cert.subject.rfc4514_string()} is not a CA")
+        verify_signature(cert, issuer_cert)
+    return min(cert.not_valid_after for cert in cert_list)
+
+
+def serialize_pkcs12(subject, pri_key, cert, ca_cert_list=None):
+    # the subject doubles as the bundle password, as it always has for SimpleCert
+    return pkcs12.serialize_key_and_certificates(
+        subject.encode("utf-8"),
+        pri_key,
+        cert,
+        ca_cert_list or None,
+        serialization.BestAvailableEncryption(subject.encode("utf-8")),
+    )
+
+
+def build_revoked_cert(serial_number: int, revoked_at, reason="unspecified"):
+    return (
+        x509.RevokedCertificateBuilder()
+        .serial_number(serial_number)
+        .revocation_date(revoked_at)
+        .add_extension(x509.CRLReason(x509.ReasonFlags(reason)), critical=False)
+        .build(default_backend())
+    )
+
+
+def build_crl(issuer, revoked_cert_list, crl_number: int, valid_days=7):
+    """Sign a CRL with ``issuer`` (a SimpleCert) from prebuilt RevokedCertificate objects."""
+    now = datetime.datetime.utcnow()
+    builder = (
+        x509.CertificateRevocationListBuilder()
+        .issuer_name(issuer.crt.subject)
+        .last_update(now)
+        .next_update(now + datetime.timedelta(days=valid_days))
+        .add_extension(x509.CRLNumber(crl_number), critical=False)
+    )
+    for revoked_cert in revoked_cert_list:
+        builder = builder.add_revoked_certificate(revoked_cert)
+    return builder.sign(issuer.prv, signing_hash(issuer.prv), default_backend())
+
+
 class SimpleCert(object):
-    def __init__(self, subject: str, s_crt=None, s_prv=None):
+    # Optional KeyPool providing pre-generated private keys, see nvflops.utils.key_pool
+    key_pool = None
+
+    def __init__(self, subject: str, s_crt=None, s_prv=None, key_type="rsa", password=None):
         self.s_crt = s_crt
-        self.s_prv = s_prv
+        self.s_der = None
+        self.s_chain = None
         self.crt = x509.load_pem_x509_certificate(s_crt, default_backend()) if s_crt else None
-        self.prv = (
-            serialization.load_pem_private_key(s_prv, password=None, backend=default_backend()) if s_prv else None
-        )
+        self.prv = load_pri_key(s_prv, password) if s_prv else None
+        # s_prv always holds the plaintext PEM, an encrypted input is unwrapped here
+        self.s_prv = serialize_pri_key(self.prv) if s_prv and b"ENCRYPTED" in s_prv else s_prv
         self.pub = self.prv.public_key() if self.prv else None
+        self.key_type = get_key_type(self.prv) if self.prv else key_type
+        self.sha1_fingerprint_str = self.crt.fingerprint(hashes.SHA1()).hex() if self.crt else None
+        self.serial_number = self.crt.serial_number if self.crt else None
         self.subject = subject
         self.issuer_simple_cert = None
 
+    @property
+    def not_valid_after(self):
+        # naive UTC, matching the DateTime columns of the tracker
+        if self.crt is None:
+            return None
+        if hasattr(self.crt, "not_valid_after_utc"):
+            return self.crt.not_valid_after_utc.replace(tzinfo=None)
+        return self.crt.not_valid_after
+
     def set_issuer_simple_cert(self, issuer_simple_cert):
         self.issuer_simple_cert = issuer_simple_cert
 
-    def create_cert(self, type):
+    def create_cert(self, type, valid_days=360):
         if self.s_crt and self.s_prv:
             return
-        self.prv, self.pub = self._generate_keys()
+        # a key handed in is kept, renewing a CA must not orphan what it signed
+        if self.prv is None:
+            self.prv, self.pub = self._generate_keys()
         if type == "root":
             self.issuer = self
         elif self.issuer_simple_cert is not None:
             self.issuer = self.issuer_simple_cert
         else:
             raise RuntimeError("No issuer cert found.")
-        self.crt = self._generate_cert(self.subject, self.issuer, self.issuer.prv, type=type)
+        self.crt = self._generate_cert(self.subject, self.issuer, self.issuer.prv, type=type, valid_days=valid_days)
         self.sha1_fingerprint_str = self.crt.fingerprint(hashes.SHA1()).hex()
+        self.serial_number = self.crt.serial_number
 
-    def serialize(self, pkcs12=False):
+    def serialize(self):
+        # every encoding is produced once and kept, repeated calls are free
         if self.s_crt is None:
             self.s_crt = serialize_cert(self.crt)
         if self.s_prv is None:
             self.s_prv = serialize_pri_key(self.prv)
-        if pkcs12:
-            self.s_pfx = serialization.pkcs12.serialize_key_and_certificates(
-                self.subject.encode("utf-8"),
-                self.prv,
-                self.crt,
-                None,
-                serialization.BestAvailableEncryption(self.subject.encode("utf-8")),
-            )
+        if self.s_der is None:
+            self.s_der = self.crt.public_bytes(serialization.Encoding.DER)
+        if self.s_chain is None:
+            self.s_chain = self.s_crt + self._issuer_chain()
+
+    def _issuer_chain(self):
+        issuer = self.issuer_simple_cert
+        if issuer is None or issuer is self:
+            return b""
+        issuer.serialize()
+        return issuer.s_chain
 
     def _generate_keys(self):
-        pri_key = rsa.generate_private_key(public_exponent=65537, key_size=2048, backend=default_backend())
+        if self.key_pool is not None and self.key_pool.key_type == self.key_type:
+            return self.key_pool.get()
+        pri_key = generate_private_key(self.key_type)
         pub_key = pri_key.public_key()
         return pri_key, pub_key
 
     def _generate_cert(self, subject_name, issuer_cert, signing_pri_key, type, valid_days=360):
+        # only RSA keys can encipher a key exchange
+        key_encipherment = self.key_type == "rsa"
         x509_subject = self._x509_name(subject_name)
         x509_issuer = self._x509_name(issuer_cert.subject)
         builder = (
@@ -153,7 +313,7 @@ class SimpleCert(object):
                     x509.KeyUsage(
                         digital_signature=True,
                         content_commitment=False,
-                        key_encipherment=True,
+                        key_encipherment=key_encipherment,
                         data_encipherment=False,
                         key_agreement=False,
                         key_cert_sign=False,
@@ -185,7 +345,7 @@ class SimpleCert(object):
                     x509.KeyUsage(
                         digital_signature=True,
                         content_commitment=True,
-                        key_encipherment=True,
+                        key_encipherment=key_encipherment,
                         data_encipherment=False,
                         key_agreement=False,
                         key_cert_sign=False,
@@ -204,10 +364,40 @@ class SimpleCert(object):
             )
         else:
             raise ValueError(f"Unable to handle {type=}")
-        return builder.sign(signing_pri_key, hashes.SHA256(), default_backend())
+        return builder.sign(signing_pri_key, signing_hash(signing_pri_key), default_backend())
 
     def _x509_name(self, cn_name, org_name=None):
         name = [x509.NameAttribute(NameOID.COMMON_NAME, cn_name)]
         if org_name is not None:
             name.append(x509.NameAttribute(NameOID.ORGANIZATION_NAME, org_name))
         return x509.Name(name)
+
+
+def _init_signing_worker():
+    # a forked worker inherits the parent's key pool, whose executor is unusable here
+    SimpleCert.key_pool = None
+
+
+def _create_signed_cert(args):
+    subject, cert_type, key_type, valid_days, issuer_subject, issuer_s_crt, issuer_s_prv = args
+    issuer = SimpleCert(issuer_subject, s_crt=issuer_s_crt, s_prv=issuer_s_prv)
+    my_cert = SimpleCert(subject, key_type=key_type)
+    my_cert.set_issuer_simple_cert(issuer)
+    my_cert.create_cert(type=cert_type, valid_days=valid_days)
+    my_cert.serialize()
+    return subject, my_cert.s_crt, my_cert.s_prv
+
+
+def create_certs(issuer, subject_list, type="client", key_type="rsa", valid_days=360, max_workers=None):
+    """Generate keys and certificates signed by ``issuer`` for all subjects across a process pool.
+
+    Returns a list of (subject, s_crt, s_prv) in the order of ``subject_list``.
+    """
+    issuer.serialize()
+    jobs = [
+        (subject, type, key_type, valid_days, issuer.subject, issuer.s_crt, issuer.s_prv) for subject in subject_list
+    ]
+    if len(jobs) <= 1:
+        return [_create_signed_cert(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_signing_worker) as executor:
+        return list(executor.map(_create_signed_cert, jobs))
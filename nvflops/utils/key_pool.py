@@ -0,0 +1,86 @@
+import logging
+import queue
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import serialization
+
+from .cert_utils import generate_private_key
+
+
+def generate_key_der(key_type="rsa", key_size=2048):
+    # Runs in worker processes, key objects are not picklable so DER bytes are returned.
+    pri_key = generate_private_key(key_type, key_size)
+    return pri_key.private_bytes(
+        encoding=serialization.Encoding.DER,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    )
+
+
+def load_key_der(der):
+    return serialization.load_der_private_key(der, password=None, backend=default_backend())
+
+
+class KeyPool:
+    """Keeps ``size`` private keys pre-generated by a process pool.
+
+    ``get`` pops a ready key, and the pool refills in the background.  If the pool is drained
+    faster than it can refill, ``get`` falls back to generating the key inline.
+    """
+
+    def __init__(self, size=32, key_type="rsa", key_size=2048, max_workers=None):
+        self._size = size
+        self.key_type = key_type
+        self._key_size = key_size
+        self._keys = queue.SimpleQueue()
+        self._pending = 0
+        self._lock = Lock()
+        self._executor = None
+        self._max_workers = max_workers
+        self._closed = False
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+    def start(self):
+        self._executor = ProcessPoolExecutor(max_workers=self._max_workers)
+        self._refill()
+        return self
+
+    def available(self):
+        return self._keys.qsize()
+
+    def _refill(self):
+        with self._lock:
+            if self._closed or self._executor is None:
+                return
+            missing = self._size - self._keys.qsize() - self._pending
+            for _ in range(max(0, missing)):
+                self._pending += 1
+                self._executor.submit(generate_key_der, self.key_type, self._key_size).add_done_callback(
+                    self._on_generated
+                )
+
+    def _on_generated(self, future):
+        with self._lock:
+            self._pending -= 1
+        try:
+            self._keys.put(future.result())
+        except Exception as e:
+            self._logger.warning(f"Key generation failed: {e}")
+
+    def get(self):
+        try:
+            der = self._keys.get_nowait()
+        except queue.Empty:
+            self._logger.info("Key pool drained, generating key inline.")
+            der = generate_key_der(self.key_type, self._key_size)
+        self._refill()
+        pri_key = load_key_der(der)
+        return pri_key, pri_key.public_key()
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+        if self._executor is not None:
+            self._executor.shutdown()
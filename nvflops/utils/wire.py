@@ -0,0 +1,69 @@
+import json
+from datetime import datetime
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_MIME = "application/json"
+MSGPACK_MIME = "application/msgpack"
+
+
+def to_builtin(obj):
+    # the fallback conversions of the tracker's CustomJSONEncoder, so all formats carry the same values
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    asdict = getattr(obj, "asdict", None)
+    if asdict is not None:
+        return asdict()
+    try:
+        return list(obj)
+    except TypeError:
+        raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+def available_formats():
+    mimetypes = [JSON_MIME]
+    if msgpack is not None:
+        mimetypes.append(MSGPACK_MIME)
+    return mimetypes
+
+
+def get_mimetype(name=None):
+    """Maps ``"json"``/``"msgpack"`` (or a mimetype) to the mimetype used on the wire."""
+    if not name or name in ("json", JSON_MIME):
+        return JSON_MIME
+    if name in ("msgpack", MSGPACK_MIME):
+        if msgpack is None:
+            raise RuntimeError("msgpack wire format requires the msgpack package")
+        return MSGPACK_MIME
+    raise ValueError(f"Unknown wire format {name=}")
+
+
+def dumps(obj, mimetype=JSON_MIME, default=to_builtin) -> bytes:
+    """Encodes ``obj``, ``default`` converts what the format has no native type for."""
+    if mimetype == MSGPACK_MIME:
+        return msgpack.packb(obj, default=default, use_bin_type=True)
+    if orjson is not None:
+        # datetimes are written natively, in the same isoformat the stdlib path produces
+        return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=default, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data, mimetype=JSON_MIME):
+    if mimetype == MSGPACK_MIME:
+        return msgpack.unpackb(data, raw=False)
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def mimetype_of(content_type):
+    """Bare mimetype of a Content-Type header, parameters such as charset dropped."""
+    return (content_type or JSON_MIME).split(";", 1)[0].strip().lower()
@@ -1,4 +1,16 @@
+import json
+import os
+import tempfile
 import unittest
+from threading import Thread
+from unittest import mock
+
+from requests import ConnectionError
+
+from nvflops.participant.agent import TrackerAgent, VitalSignReporter
+from nvflops.participant.delta import apply_delta
+from nvflops.participant.retry import RetriesExhausted
+from nvflops.utils.wire import JSON_MIME, MSGPACK_MIME, available_formats, dumps
 
 
 class TestAgent(unittest.TestCase):
@@ -6,5 +18,225 @@ class TestAgent(unittest.TestCase):
         self.assertEqual(1, 1)
 
 
+class FakeResponse:
+    def __init__(self, payload, status_code=200, mimetype=JSON_MIME):
+        self.content = dumps(payload, mimetype)
+        self.headers = {"Content-Type": mimetype}
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeTracker:
+    """Stands in for the requests session, answers /submission/batch like the tracker does."""
+
+    def __init__(self, unknown=()):
+        self.batches = list()
+        self.unknown = set(unknown)
+
+    def prepare_request(self, req):
+        return req.prepare()
+
+    def send(self, prepared):
+        submission_list = json.loads(prepared.body)["submission_list"]
+        self.batches.append([e["id"] for e in submission_list])
+        answer = list()
+        for e in submission_list:
+            # like the tracker, stops at the first entry whose parent it does not know
+            if e["id"] in self.unknown or self.unknown.intersection(e["parent_id_list"]):
+                self.unknown.add(e["id"])
+                return FakeResponse({"status": "success", "submission_list": answer, "rejected": e["id"]})
+            answer.append(
+                {
+                    "submission": {
+                        "id": e["id"],
+                        "blob_id": f"blob-{e['id']}",
+                        "codec": e["codec"],
+                        "state": "registered",
+                    }
+                }
+            )
+        return FakeResponse({"status": "success", "submission_list": answer})
+
+
+class FakeBlobClient:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.objects = dict()
+
+    def put_object(self, bucket_name, object_name, data, length, metadata=None, part_size=0):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("connection reset")
+        self.objects[object_name] = data.read()
+
+
+class TestJournalDrain(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tracker = FakeTracker()
+        self.agent = TrackerAgent(
+            "http://tracker:8000/api/v1",
+            "blob:9000",
+            "bucket",
+            "site-1",
+            "client",
+            codec="none",
+            request_encoding=None,
+            journal_path=self._tmp.name,
+            journal_batch_size=2,
+        )
+        self.agent._session = self.tracker
+        self.agent._base_payload = {"experiment": "exp1"}
+        for i in range(3):
+            self.agent.submit([self.agent._last_submission_id], {"round": i}, b"weights%d" % i)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_drain_in_order(self):
+        self.agent._blob_client = FakeBlobClient()
+        sub_ids = [e["id"] for e in self.agent._journal.pending()]
+        self.assertEqual(self.agent.drain_journal(), 3)
+        self.assertEqual(self.tracker.batches, [sub_ids[:2], sub_ids[2:]])
+        self.assertEqual(self.agent._blob_client.objects[f"blob-{sub_ids[2]}"], b"weights2")
+        self.assertEqual(len(self.agent._journal), 0)
+
+    def test_delta_encoded_at_drain(self):
+        self.agent._blob_client = FakeBlobClient()
+        with mock.patch.object(self.agent, "get_blob", return_value=b"weights0") as get_blob:
+            self.agent.submit([self.agent._last_submission_id], {"round": 3}, b"weights3", base_blob_id="blob-base")
+            get_blob.assert_not_called()
+            sub_id = self.agent._last_submission_id
+            self.assertEqual(self.agent.drain_journal(), 4)
+            get_blob.assert_called_once_with("blob-base")
+        self.assertEqual(apply_delta(self.agent._blob_client.objects[f"blob-{sub_id}"], b"weights0"), b"weights3")
+
+    def test_rejected_to_dead_letters(self):
+        self.agent._blob_client = FakeBlobClient()
+        sub_ids = [e["id"] for e in self.agent._journal.pending()]
+        self.tracker.unknown.add(sub_ids[1])
+        with self.assertLogs("TrackerAgent", level="ERROR"):
+            self.assertEqual(self.agent.drain_journal(), 1)
+        self.assertEqual([d["entry"]["id"] for d in self.agent.dead_letters()], sub_ids[1:])
+        self.assertEqual(len(self.agent._journal), 0)
+
+    def test_drain_loop_survives_errors(self):
+        self.agent._blob_client = FakeBlobClient(failures=1)
+        drainer = Thread(target=self.agent._drain_loop, kwargs={"interval": 0.01}, daemon=True)
+        with self.assertLogs("TrackerAgent", level="ERROR"):
+            drainer.start()
+            for _ in range(500):
+                if not len(self.agent._journal):
+                    break
+                drainer.join(0.01)
+        self.agent._exit = True
+        drainer.join(1)
+        self.assertEqual(len(self.agent._journal), 0)
+        self.assertEqual(len(self.agent._blob_client.objects), 3)
+
+
+class FakeCredentialSession:
+    def __init__(self, response):
+        self.response = response
+        self.sent = list()
+
+    def prepare_request(self, req):
+        return req.prepare()
+
+    def send(self, prepared):
+        self.sent.append(prepared)
+        return self.response
+
+
+class TestCredentialRefresh(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.cert_path = os.path.join(self._tmp.name, "client.crt")
+        self.key_path = os.path.join(self._tmp.name, "client.key")
+        self.transport = mock.Mock()
+        self.agent = TrackerAgent(
+            "http://tracker:8000/api/v1",
+            "blob:9000",
+            "bucket",
+            "site-1",
+            "client",
+            transport=self.transport,
+            wire_format="msgpack" if MSGPACK_MIME in available_formats() else None,
+        )
+        self.agent.set_secure_context("ca.pem", self.cert_path, self.key_path)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_hot_swap(self):
+        mimetype = self.agent._mimetype
+        certificate = {"cert": "CERT", "key": "KEY", "not_valid_after": "2027-01-01T00:00:00"}
+        self.agent._session = FakeCredentialSession(FakeResponse({"certificate": certificate}, mimetype=mimetype))
+        self.assertTrue(self.agent.refresh_credentials())
+        self.assertEqual(self.agent._session.sent[0].headers["Accept"], mimetype)
+        with open(self.cert_path) as f:
+            self.assertEqual(f.read(), "CERT")
+        self.assertEqual(os.stat(self.key_path).st_mode & 0o777, 0o600)
+        self.transport.set_secure_context.assert_called_once_with("ca.pem", self.cert_path, self.key_path)
+        self.transport.reset_connections.assert_called_once_with()
+
+    def test_error_answer_keeps_credentials(self):
+        self.agent._session = FakeCredentialSession(FakeResponse({"status": "error"}, status_code=403))
+        self.assertFalse(self.agent.refresh_credentials())
+        self.assertFalse(os.path.exists(self.cert_path))
+        self.transport.reset_connections.assert_not_called()
+
+    def test_refresh_loop_survives_errors(self):
+        calls = list()
+
+        def refresh():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RetriesExhausted(FakeResponse({}, status_code=503))
+            self.agent._exit = True
+
+        with mock.patch.object(self.agent, "refresh_credentials", side_effect=refresh):
+            self.agent.start_credential_refresh(interval=0.01)
+            self.agent._credential_refresher.join(1)
+        self.assertEqual(len(calls), 2)
+
+
+class FlakySession(FakeCredentialSession):
+    def __init__(self, response, failures):
+        super().__init__(response)
+        self.failures = failures
+
+    def send(self, prepared):
+        self.sent.append(prepared)
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("tracker down")
+        return self.response
+
+
+class TestVitalSignReporter(unittest.TestCase):
+    @mock.patch("nvflops.participant.retry.time.sleep")
+    def test_buffer_while_tracker_down(self, sleep):
+        reporter = VitalSignReporter(
+            "http://tracker:8000/api/v1/routine/vital_sign", "site-1", {}, request_encoding=None, buffer_size=3
+        )
+        reporter._get_vital_signs = lambda: {"cpu": 1}
+        reporter._session = FlakySession(FakeResponse({"status": "success", "heartbeat_interval": 7}), failures=2)
+        for _ in range(2):
+            reporter._sample()
+            reporter._sample()
+            reporter._send_one_heartbeat()
+        # one attempt per heartbeat, no backoff, the newest samples kept
+        self.assertEqual(len(reporter._session.sent), 2)
+        sleep.assert_not_called()
+        self.assertEqual(len(reporter._samples), 3)
+        reporter._send_one_heartbeat()
+        self.assertEqual(len(json.loads(reporter._session.sent[-1].body)["vital_sign_list"]), 3)
+        self.assertEqual(len(reporter._samples), 0)
+        self.assertEqual(reporter._heartbeat_interval, 7)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import unittest
+from unittest import mock
+
+from nvflops.participant import async_agent
+from nvflops.participant.async_agent import AsyncTrackerAgent
+from nvflops.participant.codec import get_codec
+from nvflops.participant.delta import encode_delta
+from nvflops.participant.host import AgentHost
+
+
+class FakeContent:
+    def __init__(self, data):
+        self.data = data
+
+    async def iter_chunked(self, size):
+        for i in range(0, len(self.data), size):
+            yield self.data[i : i + size]
+
+
+class FakeResponse:
+    def __init__(self, payload=None, data=b""):
+        self.status = 200
+        self.payload = payload
+        self.content = FakeContent(data)
+
+    def raise_for_status(self):
+        pass
+
+    async def json(self):
+        return self.payload
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
+
+
+class FakeSession:
+    """Stands in for aiohttp.ClientSession, serves blobs and their download entries."""
+
+    def __init__(self, blobs):
+        self.blobs = blobs
+        self.get = mock.Mock(side_effect=lambda url: FakeResponse(data=self.blobs[url]["data"]))
+
+    def request(self, method, url, json=None, headers=None, **kwargs):
+        blob_id = url.rsplit("/", 1)[-1]
+        download = dict(self.blobs[blob_id], url=blob_id)
+        download.pop("data")
+        return FakeResponse({"status": "success", "download": download})
+
+
+@unittest.skipIf(async_agent.aiohttp is None, "aiohttp not installed")
+class TestAsyncAgent(unittest.IsolatedAsyncioTestCase):
+    async def test_get_blob_off_loop(self):
+        codec = get_codec("gzip")
+        base = bytes(range(256)) * 400
+        target = bytearray(base)
+        target[1000:1010] = b"0123456789"
+        target = bytes(target)
+        session = FakeSession(
+            {
+                "base": {"codec": "gzip", "data": codec.compress(base)},
+                "target": {"codec": "gzip", "data": codec.compress(encode_delta(target, base)), "base_blob_id": "base"},
+            }
+        )
+        agent = AsyncTrackerAgent("http://tracker:8000/api/v1", "site-1", "client")
+        await agent.prepare_connection(session)
+        threads = list()
+        decompress = AsyncTrackerAgent._decompress
+
+        def _decompress(chunk_list, codec):
+            threads.append(threading.current_thread())
+            return decompress(chunk_list, codec)
+
+        with mock.patch.object(AsyncTrackerAgent, "_decompress", staticmethod(_decompress)):
+            self.assertEqual(await agent.get_blob("target"), target)
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(threading.main_thread(), threads)
+        # served from the cache the second time
+        self.assertEqual(await agent.get_blob("target"), target)
+        self.assertEqual(session.get.call_count, 2)
+
+
+@unittest.skipIf(async_agent.aiohttp is None, "aiohttp not installed")
+class TestAgentHost(unittest.IsolatedAsyncioTestCase):
+    async def test_close_cancels_heartbeats(self):
+        host = AgentHost("http://tracker:8000/api/v1", heartbeat_interval=0.01)
+        agent = host.add_participant("site-1", "trainer")
+        started = asyncio.Event()
+        session_closed_on_cancel = list()
+
+        async def send_one_heartbeat(vital_sign=None):
+            started.set()
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                session_closed_on_cancel.append(host._session.closed)
+                raise
+
+        agent.send_one_heartbeat = send_one_heartbeat
+        await host.start()
+        session = host._session
+        await asyncio.wait_for(started.wait(), 5)
+        await host.close()
+        self.assertEqual(session_closed_on_cancel, [False])
+        self.assertTrue(session.closed)
+        self.assertEqual(len(host._heartbeat_sends), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from nvflops.tracker import create_app, db
+from nvflops.tracker.caches import IdentityCache, IssuerCache, identity_cache
+from nvflops.tracker.managers import CertAdm
+from nvflops.tracker.models import Participant, Project
+from nvflops.utils.cert_utils import SimpleCert, wrap_pri_key
+
+
+class TestIdentityCache(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app("testing")
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        root = CertAdm.store_new_entry(None, "root")
+        self.leaf_list = [CertAdm.store_new_entry("root", name, key_type="ecdsa") for name in ("site1", "site2")]
+        project = Project(name="proj1", cert_id=root.id)
+        db.session.add(project)
+        db.session.flush()
+        db.session.add_all([Participant(name=c.subject, cert_id=c.id, project_id=project.id) for c in self.leaf_list])
+        db.session.commit()
+        self.fingerprint = self.leaf_list[0].fingerprint
+        identity_cache.invalidate()
+
+    def tearDown(self):
+        identity_cache.invalidate()
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_hit_and_lru_bound(self):
+        cache = IdentityCache(max_size=1)
+        self.assertEqual(cache.get(self.fingerprint).pct, "site1")
+        with mock.patch.object(CertAdm, "get_latest") as get_latest:
+            self.assertEqual(cache.get(self.fingerprint).pct, "site1")
+            get_latest.assert_not_called()
+        self.assertEqual(cache.get(self.leaf_list[1].fingerprint).pct, "site2")
+        self.assertEqual(len(cache), 1)
+        with mock.patch.object(CertAdm, "get_latest", wraps=CertAdm.get_latest) as get_latest:
+            cache.get(self.fingerprint)
+            get_latest.assert_called_once_with(self.fingerprint)
+
+    def test_ttl(self):
+        cache = IdentityCache(ttl=0)
+        cache.get(self.fingerprint)
+        with mock.patch.object(CertAdm, "get_latest", wraps=CertAdm.get_latest) as get_latest:
+            self.assertEqual(cache.get(self.fingerprint).pct, "site1")
+            get_latest.assert_called_once_with(self.fingerprint)
+
+    def test_revoke_invalidates(self):
+        self.assertIsNotNone(identity_cache.get(self.fingerprint))
+        CertAdm.revoke(fingerprint=self.fingerprint)
+        self.assertIsNone(identity_cache.get(self.fingerprint))
+
+    def test_renew_invalidates(self):
+        self.assertIsNotNone(identity_cache.get(self.fingerprint))
+        new_cert = CertAdm.renew(self.leaf_list[0])
+        db.session.commit()
+        self.assertEqual(len(identity_cache), 0)
+        # resolved through the successor, revoking it drops the entry of the old fingerprint as well
+        self.assertEqual(identity_cache.get(self.fingerprint).pct, "site1")
+        CertAdm.revoke(fingerprint=new_cert.fingerprint)
+        self.assertIsNone(identity_cache.get(self.fingerprint))
+
+
+def cert_row(id, subject, password=None):
+    sc = SimpleCert(subject, key_type="ecdsa")
+    sc.create_cert(type="root")
+    sc.serialize()
+    s_prv = wrap_pri_key(sc.prv, password) if password else sc.s_prv
+    return SimpleNamespace(
+        id=id, subject=subject, fingerprint=sc.sha1_fingerprint_str, s_crt=sc.s_crt, s_prv=s_prv, s_chain=sc.s_chain
+    )
+
+
+class TestIssuerCache(unittest.TestCase):
+    def test_hit_and_lru_bound(self):
+        cache = IssuerCache(max_size=2)
+        row_list = [cert_row(i, f"ca{i}") for i in range(3)]
+        sc = cache.get(row_list[0])
+        self.assertIs(cache.get(row_list[0]), sc)
+        self.assertEqual(sc.s_chain, row_list[0].s_chain)
+        cache.get(row_list[1])
+        cache.get(row_list[0])
+        cache.get(row_list[2])
+        # ca1 was the least recently used
+        self.assertEqual(len(cache), 2)
+        with mock.patch("nvflops.tracker.caches.SimpleCert", wraps=SimpleCert) as simple_cert:
+            self.assertIs(cache.get(row_list[0]), sc)
+            simple_cert.assert_not_called()
+            cache.get(row_list[1])
+            simple_cert.assert_called_once()
+
+    def test_invalidate(self):
+        cache = IssuerCache()
+        row_list = [cert_row(i, f"ca{i}") for i in range(2)]
+        sc_list = [cache.get(row) for row in row_list]
+        cache.invalidate("ca0")
+        self.assertIsNot(cache.get(row_list[0]), sc_list[0])
+        self.assertIs(cache.get(row_list[1]), sc_list[1])
+        cache.invalidate()
+        self.assertEqual(len(cache), 0)
+
+    def test_unwraps_once(self):
+        cache = IssuerCache()
+        cache.password = b"master"
+        row = cert_row(1, "ca", password=cache.password)
+        sc = cache.get(row)
+        self.assertEqual(sc.prv.public_key().public_numbers(), sc.crt.public_key().public_numbers())
+        with mock.patch("nvflops.tracker.caches.SimpleCert") as simple_cert:
+            self.assertIs(cache.get(row), sc)
+            simple_cert.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
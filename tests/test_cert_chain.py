@@ -0,0 +1,159 @@
+import unittest
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.serialization import pkcs12
+
+from nvflops.tracker import create_app, db
+from nvflops.tracker.caches import crl_cache
+from nvflops.tracker.managers import CertAdm
+from nvflops.utils.cert_utils import (
+    SimpleCert,
+    load_pem_chain,
+    load_pri_key,
+    serialize_pri_key,
+    verify_chain,
+    wrap_pri_key,
+)
+
+
+def issue(subject, issuer, type, key_type="rsa"):
+    sc = SimpleCert(subject, key_type=key_type)
+    if issuer is not None:
+        sc.set_issuer_simple_cert(issuer)
+    sc.create_cert(type=type)
+    sc.serialize()
+    return sc
+
+
+class TestCertChain(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.root = issue("root", None, "root")
+        cls.subca = issue("subca", cls.root, "subca", key_type="ecdsa")
+        cls.client = issue("site1", cls.subca, "client", key_type="ed25519")
+
+    def test_valid_chain(self):
+        cert_list = load_pem_chain(self.client.s_chain)
+        self.assertEqual(len(cert_list), 3)
+        self.assertEqual(verify_chain(cert_list), min(c.not_valid_after for c in cert_list))
+
+    def test_foreign_issuer(self):
+        other = issue("subca", issue("root", None, "root"), "subca")
+        with self.assertRaises(Exception):
+            verify_chain([self.client.crt, other.crt, self.root.crt])
+
+    def test_leaf_is_not_ca(self):
+        leaf = issue("site2", self.client, "client")
+        with self.assertRaises(ValueError):
+            verify_chain(load_pem_chain(leaf.s_chain))
+
+
+class TestKeyWrap(unittest.TestCase):
+    def test_round_trip(self):
+        for key_type in ("rsa", "ecdsa", "ed25519"):
+            sc = issue("site1", None, "root", key_type=key_type)
+            s_prv = wrap_pri_key(sc.prv, b"master")
+            self.assertIn(b"ENCRYPTED", s_prv)
+            self.assertEqual(serialize_pri_key(load_pri_key(s_prv, b"master")), sc.s_prv)
+            # what SimpleCert holds after unwrapping, the plaintext PEM
+            self.assertEqual(SimpleCert("site1", s_crt=sc.s_crt, s_prv=s_prv, password=b"master").s_prv, sc.s_prv)
+
+    def test_wrong_key(self):
+        s_prv = wrap_pri_key(issue("site1", None, "root", key_type="ecdsa").prv, b"master")
+        with self.assertRaises(ValueError):
+            load_pri_key(s_prv, b"other")
+        with self.assertRaises(TypeError):
+            load_pri_key(s_prv)
+
+    def test_plaintext_ignores_password(self):
+        sc = issue("site1", None, "root", key_type="ecdsa")
+        self.assertEqual(serialize_pri_key(load_pri_key(sc.s_prv, b"master")), sc.s_prv)
+
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app("testing")
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        CertAdm.store_new_entry(None, "root")
+        self.subca = CertAdm.store_new_entry("root", "subca", type="subca")
+        self.leaf = CertAdm.store_new_entry("subca", "site-1")
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_stored_formats(self):
+        self.assertEqual(CertAdm.export("site-1", "pem"), self.leaf.s_crt)
+        self.assertEqual(CertAdm.export("site-1", "der"), self.leaf.s_der)
+        self.assertEqual(CertAdm.export("site-1", "chain"), self.leaf.s_chain)
+        self.assertIsNone(CertAdm.export("site-1", "p7b"))
+        self.assertIsNone(CertAdm.export("unknown", "pem"))
+
+    def test_pkcs12_built_on_export(self):
+        key, cert, ca_cert_list = pkcs12.load_key_and_certificates(CertAdm.export("site-1", "pkcs12"), b"site-1")
+        self.assertEqual(cert.fingerprint(hashes.SHA1()).hex(), self.leaf.fingerprint)
+        self.assertEqual([c.fingerprint(hashes.SHA1()).hex() for c in ca_cert_list][:1], [self.subca.fingerprint])
+        public_bytes = key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+        self.assertEqual(
+            public_bytes,
+            cert.public_key().public_bytes(serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo),
+        )
+
+
+class TestRevocation(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app("testing")
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        CertAdm.store_new_entry(None, "root")
+        self.subca = CertAdm.store_new_entry("root", "subca", type="subca")
+        self.leaf = CertAdm.store_new_entry("subca", "site-1", key_type="ecdsa")
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def revoke(self, **kwargs):
+        return self.client.post("/api/v1/admin/revoke", json=kwargs).json
+
+    def status(self, fingerprint):
+        return self.client.get(f"/api/v1/crl/status/{fingerprint}").json["certificate"]
+
+    def test_revoke_unknown(self):
+        self.assertEqual(self.revoke(subject="unknown")["status"], "error")
+        self.assertEqual(self.revoke(fingerprint="00" * 20)["status"], "error")
+        self.assertEqual(self.revoke(subject="site-1", reason="bored")["status"], "error")
+        self.assertEqual(self.revoke(subject="site-1"), {"status": "success", "revoked": [self.leaf.fingerprint]})
+        # already revoked
+        self.assertEqual(self.revoke(subject="site-1")["status"], "error")
+
+    def test_crl(self):
+        crl_cache.invalidate()
+        self.assertEqual(len(x509.load_der_x509_crl(crl_cache.get("subca", encoding="der"))), 0)
+        self.revoke(fingerprint=self.leaf.fingerprint, reason="keyCompromise")
+        resp = self.client.get("/api/v1/crl/subca?format=der")
+        self.assertEqual(resp.mimetype, "application/pkix-crl")
+        crl = x509.load_der_x509_crl(resp.data)
+        self.assertTrue(crl.is_signature_valid(SimpleCert("subca", s_crt=self.subca.s_crt).crt.public_key()))
+        revoked = crl.get_revoked_certificate_by_serial_number(int(self.leaf.serial_number, 16))
+        self.assertEqual(revoked.extensions.get_extension_for_class(x509.CRLReason).value.reason.name, "key_compromise")
+        pem = self.client.get("/api/v1/crl/subca").data
+        self.assertEqual(len(x509.load_pem_x509_crl(pem)), 1)
+
+    def test_status(self):
+        self.assertEqual(self.status(self.leaf.fingerprint)["status"], "good")
+        self.assertEqual(self.status("00" * 20), {"status": "unknown"})
+        self.revoke(subject="site-1", reason="superseded")
+        colons = ":".join(self.leaf.fingerprint[i : i + 2] for i in range(0, 40, 2)).upper()
+        certificate = self.status(colons)
+        self.assertEqual((certificate["status"], certificate["reason"]), ("revoked", "superseded"))
+        self.assertEqual(self.status(self.subca.fingerprint)["status"], "good")
@@ -0,0 +1,27 @@
+import io
+import unittest
+
+from nvflops.participant.codec import CompressedReader, available_codecs, decompress_stream, get_codec
+
+
+class TestCodec(unittest.TestCase):
+    def test_round_trip(self):
+        payload = b"\x00" * 300000 + bytes(range(256)) * 100
+        for name in available_codecs():
+            codec = get_codec(name)
+            reader = CompressedReader(io.BytesIO(payload), codec, chunk_size=4096)
+            chunks = iter(lambda: reader.read(1000), b"")
+            self.assertEqual(decompress_stream(chunks, codec), payload)
+            self.assertEqual(reader.raw_bytes, len(payload))
+
+    def test_gzip_compresses(self):
+        payload = b"\x00" * 100000
+        self.assertLess(len(get_codec("gzip").compress(payload)), len(payload) // 10)
+
+    def test_unknown_codec(self):
+        with self.assertRaises(ValueError):
+            get_codec("snappy")
+
+
+if __name__ == "__main__":
+    unittest.main()
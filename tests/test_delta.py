@@ -0,0 +1,34 @@
+import unittest
+
+from nvflops.participant.delta import BlobCache, apply_delta, encode_delta, is_delta
+
+
+class TestDelta(unittest.TestCase):
+    def test_round_trip(self):
+        base = bytes(range(256)) * 40
+        target = bytearray(base)
+        target[100:110] = b"0123456789"
+        for t in (bytes(target), bytes(target) + b"tail", bytes(target[:500])):
+            delta = encode_delta(t, base)
+            self.assertTrue(is_delta(delta))
+            self.assertEqual(apply_delta(delta, base), t)
+
+    def test_wrong_base(self):
+        delta = encode_delta(b"abcdef", b"abcxyz")
+        with self.assertRaises(ValueError):
+            apply_delta(delta, b"zzzzzz")
+
+    def test_cache_eviction(self):
+        cache = BlobCache(max_bytes=10)
+        cache.put("a", b"12345")
+        cache.put("b", b"12345")
+        cache.get("a")
+        cache.put("c", b"12345")
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        cache.put("huge", b"x" * 11)
+        self.assertNotIn("huge", cache)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from nvflops.tracker import blob_store, create_app, db
+from nvflops.tracker.managers import ExpAdm, SubmissionManager
+from nvflops.tracker.models import Certificate, Participant, Project, Study, Submission
+from nvflops.tracker.workflow.gc import BlobCollector
+
+HEADERS = {"X-Project": "proj1", "X-Study": "study1", "X-Pct": "site1"}
+
+BlobObject = namedtuple("BlobObject", ["object_name", "last_modified", "size"])
+
+
+class TestBlobCollector(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app("testing")
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        cert = Certificate()
+        db.session.add(cert)
+        db.session.flush()
+        project = Project(name="proj1", cert_id=cert.id)
+        db.session.add(project)
+        db.session.flush()
+        study = Study(name="study1", project_id=project.id)
+        pct = Participant(name="site1", cert_id=cert.id, project_id=project.id)
+        db.session.add_all([study, pct])
+        db.session.flush()
+        study.participants.append(pct)
+        db.session.commit()
+        self.exp = ExpAdm.insert_entry("exp1", "study1", "proj1", participants={"site1": "aggregator"})
+        self.client = self.app.test_client()
+        self.old = datetime.now(timezone.utc) - timedelta(days=2)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def submit(self, state="uploaded", age=None):
+        sub = SubmissionManager.insert_entry("exp1", *HEADERS.values())
+        sub.state = state
+        if age is not None:
+            sub.created_at = datetime.utcnow() - age
+        db.session.commit()
+        return sub.blob_id
+
+    def collect(self, objects, dry_run=False):
+        with mock.patch.object(blob_store, "list_pages", return_value=[objects]):
+            with mock.patch.object(blob_store, "remove", return_value=[]) as remove:
+                report = BlobCollector.collect(dry_run=dry_run, grace=3600, registered_ttl=3600)
+        return report, remove
+
+    def test_orphans_and_stale_registrations(self):
+        kept = self.submit()
+        arrived = self.submit("registered", age=timedelta(days=2))
+        missing = self.submit("registered", age=timedelta(days=2))
+        objects = [BlobObject(name, self.old, 10) for name in (kept, arrived, "orphan", self.exp.blob_id)]
+        objects.append(BlobObject("fresh", datetime.now(timezone.utc), 10))
+        report, remove = self.collect(objects, dry_run=True)
+        self.assertEqual((report["orphans"], report["repaired"], report["aborted"]), (1, 1, 1))
+        remove.assert_not_called()
+        report, remove = self.collect(objects)
+        remove.assert_called_once_with(["orphan"])
+        self.assertEqual(SubmissionManager.get_by_blob_id(arrived).state, "uploaded")
+        self.assertEqual(SubmissionManager.get_by_blob_id(missing).state, "aborted")
+        # the upload lands after all, the S3 event revives the submission
+        event = {"Records": [{"s3": {"object": {"key": missing}}}]}
+        self.assertEqual(self.client.post("/api/v1/s3/batch", json=[event]).json["updated"], 1)
+        self.assertEqual(SubmissionManager.get_by_blob_id(missing).state, "uploaded")
+
+    def test_recheck_before_delete(self):
+        blob_id = self.submit()
+        # the reachable set was read before the submission was registered
+        with mock.patch.object(SubmissionManager, "iter_blob_ids", return_value=iter([])):
+            report, remove = self.collect([BlobObject(blob_id, self.old, 10)])
+        remove.assert_not_called()
+        self.assertEqual(report["orphans"], 0)
+        Submission.query.filter_by(blob_id=blob_id).update({"state": "aborted"})
+        db.session.commit()
+        report, remove = self.collect([BlobObject(blob_id, self.old, 10)])
+        remove.assert_called_once_with([blob_id])
+
+    def test_gc_without_body(self):
+        with mock.patch.object(blob_store, "list_pages", return_value=[]):
+            resp = self.client.post("/api/v1/admin/gc")
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.json["report"]["dry_run"])
+
+
+if __name__ == "__main__":
+    unittest.main()
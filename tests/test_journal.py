@@ -0,0 +1,66 @@
+import os
+import tempfile
+import unittest
+
+from nvflops.participant.journal import SubmissionJournal
+
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = self._tmp.name
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_pending_in_append_order(self):
+        journal = SubmissionJournal(self.path)
+        for i in range(3):
+            journal.append({"id": f"sub{i}", "parent_id_list": [f"sub{i - 1}"] if i else []}, b"blob%d" % i)
+        journal.ack("sub0")
+        self.assertEqual([e["id"] for e in journal.pending()], ["sub1", "sub2"])
+        self.assertEqual([e["id"] for e in journal.pending(1)], ["sub1"])
+        self.assertEqual(journal.read_blob("sub2"), b"blob2")
+        self.assertFalse(os.path.exists(os.path.join(self.path, "blobs", "sub0")))
+
+    def test_reload_ignores_torn_line(self):
+        journal = SubmissionJournal(self.path)
+        journal.append({"id": "a"}, b"1")
+        journal.append({"id": "b"}, b"2")
+        journal.ack("a")
+        journal.close()
+        with open(os.path.join(self.path, SubmissionJournal.LOG_NAME), "a") as f:
+            f.write('{"op": "add", "ent')
+        reloaded = SubmissionJournal(self.path)
+        self.assertEqual([e["id"] for e in reloaded.pending()], ["b"])
+
+    def test_compact(self):
+        journal = SubmissionJournal(self.path)
+        journal.append({"id": "a"}, b"1")
+        journal.append({"id": "b"}, b"2")
+        journal.ack("a")
+        with open(os.path.join(self.path, "blobs", "orphan"), "wb") as f:
+            f.write(b"3")
+        journal.compact()
+        journal.append({"id": "c"}, b"4")
+        self.assertEqual(sorted(os.listdir(os.path.join(self.path, "blobs"))), ["b", "c"])
+        journal.close()
+        self.assertEqual([e["id"] for e in SubmissionJournal(self.path).pending()], ["b", "c"])
+
+    def test_dead_letter(self):
+        journal = SubmissionJournal(self.path)
+        journal.append({"id": "a"}, b"1")
+        journal.append({"id": "b"}, b"2")
+        journal.dead_letter("a", reason="rejected")
+        journal.compact()
+        journal.close()
+        reloaded = SubmissionJournal(self.path)
+        self.assertEqual([e["id"] for e in reloaded.pending()], ["b"])
+        self.assertEqual(reloaded.dead_letters(), [{"entry": {"id": "a"}, "reason": "rejected"}])
+        with open(os.path.join(self.path, "dead", "a"), "rb") as f:
+            self.assertEqual(f.read(), b"1")
+        self.assertEqual(os.listdir(os.path.join(self.path, "blobs")), ["b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
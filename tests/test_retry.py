@@ -0,0 +1,103 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from nvflops.participant.retry import CircuitBreaker, CircuitOpenError, RetriesExhausted, RetryBudget, RetryPolicy
+
+
+class Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class TestRetry(unittest.TestCase):
+    def test_full_jitter_bounds(self):
+        policy = RetryPolicy(base_delay=1, max_delay=8)
+        for attempt in range(10):
+            delay = policy.backoff(attempt)
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, min(8, 2**attempt))
+
+    @mock.patch("nvflops.participant.retry.time.sleep")
+    def test_retries_then_succeeds(self, sleep):
+        calls = iter([ConnectionError(), Response(503), Response(200)])
+
+        def func():
+            result = next(calls)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        policy = RetryPolicy(max_retries=5)
+        self.assertEqual(policy.call(func, "http://tracker:8000/api/v1/submission").status_code, 200)
+        self.assertEqual(sleep.call_count, 2)
+
+    @mock.patch("nvflops.participant.retry.time.sleep")
+    def test_gives_up(self, sleep):
+        policy = RetryPolicy(max_retries=2, breaker_threshold=100)
+        with self.assertRaises(RetriesExhausted) as cm:
+            policy.call(lambda: Response(502), "http://tracker:8000")
+        self.assertEqual(cm.exception.response.status_code, 502)
+        self.assertEqual(sleep.call_count, 2)
+        with self.assertRaises(ValueError):
+            policy.call(mock.Mock(side_effect=ValueError), "http://tracker:8000", retry_on=(ConnectionError,))
+
+    @mock.patch("nvflops.participant.retry.time.sleep")
+    def test_budget(self, sleep):
+        policy = RetryPolicy(max_retries=100, breaker_threshold=100, budget=RetryBudget(ratio=0.5, min_tokens=3))
+        with self.assertRaises(ConnectionError):
+            policy.call(mock.Mock(side_effect=ConnectionError), "http://tracker:8000")
+        self.assertEqual(sleep.call_count, 3)
+
+    def test_breaker_per_endpoint(self):
+        policy = RetryPolicy(max_retries=0, breaker_threshold=2, breaker_reset=30)
+        failing = mock.Mock(side_effect=ConnectionError)
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                policy.call(failing, "http://tracker:8000/api/v1/routine/vital_sign")
+        with self.assertRaises(CircuitOpenError):
+            policy.call(failing, "http://tracker:8000/api/v1/submission")
+        self.assertEqual(failing.call_count, 2)
+        self.assertEqual(policy.call(lambda: Response(200), "http://blob:9000/bucket/x").status_code, 200)
+
+    def test_half_open(self):
+        breaker = CircuitBreaker(threshold=1, reset_timeout=10)
+        with mock.patch("nvflops.participant.retry.time.monotonic", return_value=100):
+            breaker.record_failure()
+            self.assertEqual(breaker.state, "open")
+            self.assertGreater(breaker.allow(), 0)
+        with mock.patch("nvflops.participant.retry.time.monotonic", return_value=111):
+            self.assertEqual(breaker.allow(), 0)
+            # only one trial at a time
+            self.assertGreater(breaker.allow(), 0)
+            breaker.record_success()
+            self.assertEqual(breaker.state, "closed")
+
+    def test_half_open_trial_released(self):
+        policy = RetryPolicy(max_retries=0, breaker_threshold=1, breaker_reset=10)
+        with mock.patch("nvflops.participant.retry.time.monotonic", return_value=100):
+            with self.assertRaises(ConnectionError):
+                policy.call(mock.Mock(side_effect=ConnectionError), "http://tracker:8000")
+        with mock.patch("nvflops.participant.retry.time.monotonic", return_value=111):
+            with self.assertRaises(ValueError):
+                policy.call(mock.Mock(side_effect=ValueError), "http://tracker:8000", retry_on=(ConnectionError,))
+            self.assertEqual(policy.call(lambda: Response(200), "http://tracker:8000").status_code, 200)
+        self.assertEqual(policy.breaker("http://tracker:8000").state, "closed")
+
+    def test_half_open_trial_released_async(self):
+        policy = RetryPolicy(max_retries=0, breaker_threshold=1, breaker_reset=10)
+        breaker = policy.breaker("http://tracker:8000")
+
+        async def fail():
+            raise ValueError
+
+        with mock.patch("nvflops.participant.retry.time.monotonic", return_value=100):
+            breaker.record_failure()
+        with mock.patch("nvflops.participant.retry.time.monotonic", return_value=111):
+            with self.assertRaises(ValueError):
+                asyncio.run(policy.acall(fail, "http://tracker:8000", retry_on=(ConnectionError,)))
+            self.assertEqual(breaker.allow(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+
+from cryptography.hazmat.primitives import hashes
+
+from nvflops.tracker import create_app, db
+from nvflops.tracker.managers import CertAdm
+from nvflops.tracker.workflow.rotation import CertRotator
+from nvflops.utils.cert_utils import SimpleCert, load_pem_chain, verify_chain
+
+
+class TestRotation(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app("testing")
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        CertAdm.store_new_entry(None, "root")
+        self.subca = CertAdm.store_new_entry("root", "subca", type="subca")
+        self.leaf = CertAdm.store_new_entry("subca", "site-1", key_type="ecdsa")
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_rotate_once(self):
+        # a window past valid_days matches the fresh certificates too, each is renewed once
+        renewed = CertRotator.rotate_once(window_days=400, roles=("client", "subca"), valid_days=360)
+        self.assertEqual([subject for subject, _ in renewed], ["subca", "site-1"])
+        self.assertEqual(CertRotator.rotate_once(window_days=1, roles=("client", "subca")), [])
+        leaf = CertAdm.get_latest(self.leaf.fingerprint)
+        self.assertEqual(leaf.fingerprint, renewed[1][1])
+        self.assertIsNotNone(verify_chain(load_pem_chain(leaf.s_chain)))
+
+    def test_renew_subca_keeps_key(self):
+        leaf_fingerprint, subca_fingerprint = self.leaf.fingerprint, self.subca.fingerprint
+        new_subca = CertAdm.renew(self.subca)
+        db.session.commit()
+        self.assertNotEqual(new_subca.fingerprint, subca_fingerprint)
+        old_key = SimpleCert("subca", s_crt=self.subca.s_crt).crt.public_key().public_numbers()
+        new_key = SimpleCert("subca", s_crt=new_subca.s_crt).crt.public_key().public_numbers()
+        self.assertEqual(old_key, new_key)
+        # the leaf is not renewed, its stored chain now carries the new subca certificate
+        leaf = CertAdm.get_by_fingerprint(leaf_fingerprint)
+        cert_list = load_pem_chain(leaf.s_chain)
+        self.assertEqual(cert_list[1].fingerprint(hashes.SHA1()).hex(), new_subca.fingerprint)
+        self.assertIsNotNone(verify_chain(cert_list))
+        self.assertEqual(CertAdm.get_latest(subca_fingerprint).id, new_subca.id)
+
+    def test_get_latest_skips_revoked(self):
+        fingerprint = self.leaf.fingerprint
+        self.assertEqual(CertAdm.get_latest(fingerprint).id, self.leaf.id)
+        new_leaf = CertAdm.renew(self.leaf)
+        db.session.commit()
+        self.assertEqual(CertAdm.get_latest(fingerprint).id, new_leaf.id)
+        CertAdm.revoke(fingerprint=new_leaf.fingerprint)
+        self.assertIsNone(CertAdm.get_latest(fingerprint))
+        self.assertIsNone(CertAdm.get_latest("unknown"))
+
+
+if __name__ == "__main__":
+    unittest.main()
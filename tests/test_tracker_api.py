@@ -0,0 +1,182 @@
+import gzip
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from minio.error import S3Error
+
+from nvflops.tracker import blob_store, create_app, db
+from nvflops.tracker.blob import BlobStore
+from nvflops.tracker.managers import ExpAdm, SubmissionManager
+from nvflops.tracker.models import Certificate, Participant, Project, Study, Submission, VitalSign
+from nvflops.tracker.workflow.reconciler import UploadReconciler
+from nvflops.utils.wire import MSGPACK_MIME, available_formats, loads
+
+HEADERS = {"X-Project": "proj1", "X-Study": "study1", "X-Pct": "site1"}
+OTHER_HEADERS = dict(HEADERS, **{"X-Pct": "site2"})
+
+
+def s3_error(code):
+    # keywords, minio changed the positional order
+    return S3Error(code=code, message="", resource="", request_id="", host_id="", response=None)
+
+
+class TestSubmissionApi(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app("testing")
+        self.app.config.update(TRUST_FINGERPRINT_HEADER=False)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        cert = Certificate()
+        db.session.add(cert)
+        db.session.flush()
+        project = Project(name="proj1", cert_id=cert.id)
+        db.session.add(project)
+        db.session.flush()
+        study = Study(name="study1", project_id=project.id)
+        pct_list = [Participant(name=name, cert_id=cert.id, project_id=project.id) for name in ("site1", "site2")]
+        db.session.add_all([study] + pct_list)
+        db.session.flush()
+        # site2 is in the project but not in the study
+        study.participants.append(pct_list[0])
+        db.session.commit()
+        for exp_name in ("exp1", "exp2"):
+            ExpAdm.insert_entry(exp_name, "study1", "proj1", participants={"site1": "aggregator"})
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def submit(self, exp_name, count):
+        for i in range(count):
+            resp = self.client.post(
+                "/api/v1/submission", headers=HEADERS, json={"experiment": exp_name, "custom_field": {"round": i}}
+            )
+            self.assertEqual(resp.json["status"], "success")
+        return resp.json["submission"]
+
+    def test_list_by_experiment(self):
+        self.submit("exp1", 2)
+        self.submit("exp2", 1)
+        resp = self.client.get("/api/v1/submission?experiment=exp1", headers=HEADERS)
+        self.assertEqual(resp.json["status"], "success")
+        self.assertEqual(len(resp.json["submission_list"]), 2)
+        resp = self.client.get("/api/v1/submission?experiment=unknown", headers=HEADERS)
+        self.assertEqual(resp.json["status"], "error")
+
+    def test_list_compressed(self):
+        self.submit("exp1", 40)
+        headers = dict(HEADERS, **{"Accept-Encoding": "gzip"})
+        resp = self.client.get("/api/v1/submission?experiment=exp1", headers=headers)
+        self.assertEqual(resp.headers["Content-Encoding"], "gzip")
+        self.assertEqual(len(loads(gzip.decompress(resp.data))["submission_list"]), 40)
+
+    @unittest.skipUnless(MSGPACK_MIME in available_formats(), "msgpack not installed")
+    def test_list_msgpack(self):
+        self.submit("exp1", 3)
+        headers = dict(HEADERS, Accept=MSGPACK_MIME)
+        resp = self.client.get("/api/v1/submission?experiment=exp1", headers=headers)
+        self.assertEqual(resp.mimetype, MSGPACK_MIME)
+        submission_list = loads(resp.data, MSGPACK_MIME)["submission_list"]
+        self.assertEqual([s["state"] for s in submission_list], ["registered"] * 3)
+
+    def test_submit_rejects_non_dict(self):
+        for url in ("/api/v1/submission", "/api/v1/submission/batch"):
+            for body in ([1], "exp1", 5):
+                self.assertEqual(self.client.post(url, headers=HEADERS, json=body).status_code, 400, (url, body))
+        self.assertEqual(self.client.post("/api/v1/submission", headers=HEADERS).json["status"], "error")
+        self.assertEqual(Submission.query.count(), 0)
+
+    def test_complete_blob(self):
+        sub = self.submit("exp1", 1)
+        url = f"/api/v1/submission/{sub['id']}/blob"
+        body = {"upload_id": "u1", "parts": [{"part_number": 1, "etag": '"e1"'}]}
+        self.assertEqual(self.client.post(url, headers=HEADERS).status_code, 400)
+        self.assertEqual(self.client.post(url, headers=HEADERS, json={"parts": []}).status_code, 400)
+        self.assertEqual(self.client.post(url, headers=HEADERS, json=dict(body, parts=[1])).status_code, 400)
+        with mock.patch.object(blob_store, "complete_upload", return_value=True) as complete_upload:
+            self.assertEqual(self.client.post(url, json=body).json["status"], "error")
+            self.assertEqual(self.client.post(url, headers=OTHER_HEADERS, json=body).json["status"], "error")
+            complete_upload.assert_not_called()
+            self.assertEqual(self.client.post(url, headers=HEADERS, json=body).json["status"], "success")
+        self.assertEqual(SubmissionManager.get(sub["id"]).state, "uploaded")
+        with mock.patch.object(blob_store, "complete_upload", return_value=False):
+            self.assertEqual(self.client.post(url, headers=HEADERS, json=body).json["status"], "error")
+
+    def test_blob_url(self):
+        sub = self.submit("exp1", 1)
+        url = f"/api/v1/submission/blob/{sub['blob_id']}"
+        with mock.patch.object(blob_store, "presign_download", return_value={"url": "http://blob"}):
+            self.assertEqual(self.client.get(url).json["status"], "error")
+            self.assertEqual(self.client.get(url, headers=OTHER_HEADERS).json["status"], "error")
+            self.assertEqual(self.client.get(url, headers=HEADERS).json["download"], {"url": "http://blob"})
+
+    def test_vital_sign_batch(self):
+        url = "/api/v1/routine/vital_sign"
+        batch = [{"created_at": "2026-01-01T00:00:00", "vital_sign": {"cpu": 1.5}}, {"vital_sign": {"cpu": 2}}]
+        self.assertEqual(self.client.post(url, headers=HEADERS, json={"vital_sign_list": batch}).status_code, 200)
+        self.assertEqual(VitalSign.query.count(), 2)
+        for body in (
+            None,
+            [1],
+            {"vital_sign_list": [1]},
+            {"vital_sign_list": [{"vital_sign": [1]}]},
+            {"vital_sign_list": [{"created_at": "yesterday"}]},
+            {"vital_sign_list": [{"created_at": 5}]},
+            {"vital_sign": [1]},
+        ):
+            self.assertEqual(self.client.post(url, headers=HEADERS, json=body).status_code, 400, body)
+        self.assertEqual(VitalSign.query.count(), 2)
+
+    def test_s3_events(self):
+        sub = self.submit("exp1", 1)
+        for url in ("/api/v1/s3", "/api/v1/s3/batch"):
+            self.assertEqual(self.client.post(url).status_code, 400)
+            self.assertEqual(self.client.post(url, json=[1]).status_code, 400)
+        self.assertEqual(self.client.post("/api/v1/s3/batch", json={"events": [1]}).status_code, 400)
+        event = {"Records": [{"eventName": "s3:ObjectCreated:Put", "s3": {"object": {"key": sub["blob_id"]}}}]}
+        resp = self.client.post("/api/v1/s3/batch", json=[event])
+        self.assertEqual(resp.json["updated"], 1)
+
+    def test_reconcile_only_stale(self):
+        sub_list = [self.submit("exp1", 1) for _ in range(3)]
+        Submission.query.filter(Submission.id != sub_list[2]["id"]).update(
+            {"created_at": datetime.utcnow() - timedelta(hours=1)}, synchronize_session=False
+        )
+        db.session.commit()
+        with mock.patch.object(blob_store, "exists", side_effect=lambda blob_id: blob_id == sub_list[0]["blob_id"]):
+            with mock.patch.object(blob_store, "list_pages") as list_pages:
+                result = UploadReconciler.reconcile_once(grace=60, page_size=1)
+            list_pages.assert_not_called()
+        self.assertEqual(result, {"stale": 2, "scanned": 2, "repaired": 1})
+        self.assertEqual(
+            [SubmissionManager.get(s["id"]).state for s in sub_list], ["uploaded", "registered", "registered"]
+        )
+
+
+class TestBlobStore(unittest.TestCase):
+    def test_complete_upload_aborts_on_error(self):
+        store = BlobStore()
+        store.bucket_name = "bucket"
+        store._client = mock.Mock()
+        store._client._complete_multipart_upload.side_effect = s3_error("InvalidPart")
+        self.assertFalse(store.complete_upload("blob1", "u1", [{"part_number": 1, "etag": "e1"}]))
+        store._client._abort_multipart_upload.assert_called_once_with("bucket", "blob1", "u1")
+
+    def test_exists(self):
+        store = BlobStore()
+        store.bucket_name = "bucket"
+        store._client = mock.Mock()
+        self.assertTrue(store.exists("blob1"))
+        store._client.stat_object.side_effect = s3_error("NoSuchKey")
+        self.assertFalse(store.exists("blob1"))
+        store._client.stat_object.side_effect = s3_error("AccessDenied")
+        with self.assertRaises(S3Error):
+            store.exists("blob1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+from datetime import datetime
+
+from nvflops.utils.wire import JSON_MIME, MSGPACK_MIME, available_formats, dumps, get_mimetype, loads, mimetype_of
+
+
+class Row:
+    def __init__(self, **kwargs):
+        self._kwargs = kwargs
+
+    def asdict(self):
+        return self._kwargs
+
+
+class TestWire(unittest.TestCase):
+    def test_round_trip(self):
+        created_at = datetime(2022, 3, 1, 12, 30)
+        payload = {"status": "success", "child_list": [Row(id="a", created_at=created_at, parents={"b"})]}
+        expected = {
+            "status": "success",
+            "child_list": [{"id": "a", "created_at": created_at.isoformat(), "parents": ["b"]}],
+        }
+        for mimetype in available_formats():
+            self.assertEqual(loads(dumps(payload, mimetype), mimetype), expected)
+
+    @unittest.skipUnless(MSGPACK_MIME in available_formats(), "msgpack not installed")
+    def test_msgpack_is_smaller(self):
+        payload = {"submission_list": [{"id": f"{i:040d}", "state": "uploaded", "pct_id": i} for i in range(100)]}
+        self.assertLess(len(dumps(payload, MSGPACK_MIME)), len(dumps(payload, JSON_MIME)))
+
+    def test_mimetype(self):
+        self.assertEqual(get_mimetype(None), JSON_MIME)
+        self.assertEqual(mimetype_of("application/json; charset=utf-8"), JSON_MIME)
+        with self.assertRaises(ValueError):
+            get_mimetype("cbor")
+
+
+if __name__ == "__main__":
+    unittest.main()